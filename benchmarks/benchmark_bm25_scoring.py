@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк BM25: rank_bm25.BM25Okapi.get_scores против SparseBM25.get_scores (SciPy CSR)
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from legal_rag.pipelines.chunks import CHUNK_DIR, load_chunks
+from legal_rag.rag.sparse_bm25 import SparseBM25
+
+QUERIES = [
+    "Что такое гражданское право?",
+    "Какие права имеет собственник имущества?",
+    "Как заключается договор купли-продажи?",
+    "Что такое трудовой договор?",
+    "Какие права имеет работник при увольнении?",
+    "Что говорит статья 1 ГК РК?",
+]
+
+
+def time_scorer(get_scores: Callable[[List[str]], np.ndarray], queries: List[List[str]], repeats: int) -> Dict[str, float]:
+    """Per-query latency statistics in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        for query in queries:
+            started = time.perf_counter()
+            get_scores(query)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare BM25Okapi and SparseBM25 scoring latency")
+    parser.add_argument("--chunk-dir", default=CHUNK_DIR)
+    parser.add_argument("--docs", type=int, default=0, help="limit corpus size (0 = all chunks)")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    texts, _ = load_chunks(args.chunk_dir)
+    if args.docs:
+        texts = texts[:args.docs]
+    corpus = [text.lower().split() for text in texts]
+    queries = [query.lower().split() for query in QUERIES]
+
+    print(f"📚 Корпус: {len(corpus)} документов, {len(queries)} запросов x {args.repeats} повторов")
+
+    started = time.perf_counter()
+    okapi = BM25Okapi(corpus)
+    okapi_build_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    sparse_bm25 = SparseBM25(corpus)
+    sparse_build_ms = (time.perf_counter() - started) * 1000
+
+    max_diff = max(float(np.max(np.abs(okapi.get_scores(q) - sparse_bm25.get_scores(q)))) for q in queries)
+
+    okapi_stats = time_scorer(okapi.get_scores, queries, args.repeats)
+    sparse_stats = time_scorer(sparse_bm25.get_scores, queries, args.repeats)
+
+    print(f"\n{'':<12}{'build ms':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'BM25Okapi':<12}{okapi_build_ms:>10.2f}{okapi_stats['mean_ms']:>10.3f}{okapi_stats['p50_ms']:>10.3f}{okapi_stats['p95_ms']:>10.3f}")
+    print(f"{'SparseBM25':<12}{sparse_build_ms:>10.2f}{sparse_stats['mean_ms']:>10.3f}{sparse_stats['p50_ms']:>10.3f}{sparse_stats['p95_ms']:>10.3f}")
+    print(f"\n⚡ Ускорение get_scores: x{okapi_stats['mean_ms'] / max(sparse_stats['mean_ms'], 1e-9):.1f}")
+    print(f"🎯 Максимальное расхождение оценок: {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -151,6 +151,7 @@ class EngineComparison:
                     "Avg Query Time (s)": perf.get("avg_query_time", 0),
                     "Min Query Time (s)": perf.get("min_query_time", 0),
                     "Max Query Time (s)": perf.get("max_query_time", 0),
+                    "Avg TTFT (s)": perf.get("avg_ttft", 0),
                     "Success Rate": perf.get("avg_success_rate", 0),
                     "Keyword Score": qual.get("avg_keyword_score", 0),
                     "Source Score": qual.get("avg_source_score", 0),
@@ -76,15 +76,17 @@ class RAGBenchmark:
     def measure_query_performance(self, rag_system, question: str, iterations: int = 3) -> Dict[str, Any]:
         """Измеряет производительность одного запроса"""
         times = []
+        ttfts = []
         results = []
         
         for _ in range(iterations):
             start_time = time.time()
             try:
-                result = rag_system.query(question)
+                result, ttft = self.run_streaming_query(rag_system, question)
                 end_time = time.time()
                 
                 times.append(end_time - start_time)
+                ttfts.append(ttft)
                 results.append(result)
                 
             except Exception as e:
@@ -98,10 +100,23 @@ class RAGBenchmark:
             "min_time": min(times),
             "max_time": max(times),
             "std_time": statistics.stdev(times) if len(times) > 1 else 0,
+            "avg_ttft": statistics.mean(ttfts) if ttfts else float('inf'),
             "success_rate": len([r for r in results if r is not None]) / len(results),
             "results": results[0] if results[0] else None
         }
 
+    def run_streaming_query(self, rag_system, question: str) -> Tuple[Dict[str, Any], float]:
+        """Выполняет запрос через query_stream: (результат, время до первого токена в секундах)"""
+        start_time = time.time()
+        ttft = None
+        result: Dict[str, Any] = {}
+        for event in rag_system.query_stream(question):
+            if event["type"] == "token" and ttft is None:
+                ttft = time.time() - start_time
+            elif event["type"] == "done":
+                result = event["result"]
+        return result, ttft if ttft is not None else time.time() - start_time
+
     def measure_system_stats(self, rag_system) -> Dict[str, Any]:
         """Измеряет статистику системы"""
         try:
@@ -180,6 +195,7 @@ class RAGBenchmark:
         
         # Вычисляем общую статистику
         avg_times = [r["avg_time"] for r in performance_results if r["avg_time"] != float('inf')]
+        avg_ttfts = [r["avg_ttft"] for r in performance_results if r["avg_ttft"] != float('inf')]
         success_rates = [r["success_rate"] for r in performance_results]
         
         benchmark_result = {
@@ -190,6 +206,8 @@ class RAGBenchmark:
             "avg_query_time": statistics.mean(avg_times) if avg_times else 0,
             "min_query_time": min(avg_times) if avg_times else 0,
             "max_query_time": max(avg_times) if avg_times else 0,
+            "avg_ttft": statistics.mean(avg_ttfts) if avg_ttfts else 0,
+            "max_ttft": max(avg_ttfts) if avg_ttfts else 0,
             "avg_success_rate": statistics.mean(success_rates),
             "performance_results": performance_results
         }
@@ -385,6 +403,7 @@ class RAGBenchmark:
             summary_data.append({
                 "Engine": engine,
                 "Avg Query Time (s)": perf.get("avg_query_time", 0),
+                "Avg TTFT (s)": perf.get("avg_ttft", 0),
                 "Success Rate": perf.get("avg_success_rate", 0),
                 "Keyword Score": qual.get("avg_keyword_score", 0),
                 "Source Score": qual.get("avg_source_score", 0),
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк каскадного переранжирования: bi-encoder (косинус по векторам чанков) → bge-reranker-v2-m3.
+Для каждого N показывает задержку и полноту этапов относительно полного переранжирования.
+"""
+
+import argparse
+import json
+import statistics
+from dataclasses import replace
+from typing import Dict, List
+
+import numpy as np
+
+from legal_rag.rag.caches import ScoreCache
+from legal_rag.rag.rag_system import EnhancedRAGSystem, SearchResult
+from legal_rag.rag.rerank import cosine_prefilter, stage_recall, summarize_stages
+
+
+def rerank(rag: EnhancedRAGSystem, question: str, candidates: List[SearchResult], top_n: int, traces: List) -> List[str]:
+    """Final ids of one rerank run on fresh copies of the candidates"""
+    trace: List[Dict] = []
+    results = rag.rerank_results(question, [replace(c) for c in candidates], cascade_top_n=top_n, trace=trace)
+    traces.append(trace)
+    return [result.id for result in results]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tune the bi-encoder → cross-encoder rerank cascade")
+    parser.add_argument("--dataset", default="benchmarks/benchmark_dataset.json")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--top-n", type=int, nargs="+", default=[5, 8, 12], help="bi-encoder survivors to try")
+    args = parser.parse_args()
+
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)][:args.limit]
+
+    rag = EnhancedRAGSystem()
+    # Score cache off: every run pays the real cross-encoder cost
+    rag.score_cache = ScoreCache(rag.reranker_model_name, max_entries=0)
+
+    candidates = {q: rag.hybrid_search(q, rag.top_k_initial) for q in questions}
+    print(f"📚 Вопросов: {len(questions)}, кандидатов на вопрос: {rag.top_k_initial}")
+
+    full_traces: List = []
+    reference = {q: rerank(rag, q, candidates[q], 0, full_traces) for q in questions}
+    full_ms = statistics.mean(sum(entry["latency_ms"] for entry in trace) for trace in full_traces)
+    print(f"\n{'N':>4}{'bi-enc ms':>11}{'cross ms':>10}{'total ms':>10}{'recall@bi':>11}{'recall@final':>14}")
+    print(f"{'all':>4}{'-':>11}{full_ms:>10.1f}{full_ms:>10.1f}{1.0:>11.2f}{1.0:>14.2f}")
+
+    for top_n in args.top_n:
+        traces: List = []
+        bi_recall, final_recall = [], []
+        for q in questions:
+            query_vector = np.asarray(rag.get_embedding(q), dtype=np.float32)
+            keep = cosine_prefilter(query_vector, rag.passage_vectors([c.id for c in candidates[q]]), top_n)
+            bi_recall.append(stage_recall(reference[q], [candidates[q][i].id for i in keep.tolist()]))
+            final_recall.append(stage_recall(reference[q], rerank(rag, q, candidates[q], top_n, traces)))
+
+        stages = summarize_stages(traces)
+        bi_ms = stages.get("bi_encoder", {}).get("latency_ms", 0.0)
+        cross_ms = stages.get("cross_encoder", {}).get("latency_ms", 0.0)
+        print(f"{top_n:>4}{bi_ms:>11.1f}{cross_ms:>10.1f}{bi_ms + cross_ms:>10.1f}"
+              f"{statistics.mean(bi_recall):>11.2f}{statistics.mean(final_recall):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,9 +26,10 @@ def run_rag(questions: List[Dict[str, Any]], limit: int | None = None) -> List[D
     results: List[Dict[str, Any]] = []
     subset = questions if limit is None else questions[:limit]
 
-    for item in subset:
+    # Questions are independent: answer them as one batch (no conversation history between them)
+    responses = engine.query_batch([item["question"] for item in subset], use_hybrid_search=True, use_reranking=True)
+    for item, rag_response in zip(subset, responses):
         q = item["question"]
-        rag_response = engine.query(q, use_hybrid_search=True, use_reranking=True)
         contexts = [c.get("text", "") for c in rag_response.get("search_results", [])]
         results.append(
             {
@@ -0,0 +1,61 @@
+from typing import List, Dict, Any, Iterator
+
+RAG_ERROR_ANSWER = "Извините, произошла ошибка при поиске юридической информации."
+
+
+class RAGChatStream:
+    """Events of one streamed RAG chat turn, shared by the CLI and web chat bots.
+
+    Iterating yields the engine's query_stream events tagged with mode "legal_rag"; the
+    final "done" event is flattened to the answer and its counters. Afterwards (or after
+    the consumer stopped early) `text` is the answer so far and `completed` tells whether
+    the engine finished the turn, which means it has also recorded it in the session.
+    """
+
+    def __init__(self, rag_system: Any, message: str, **options: Any) -> None:
+        self.rag_system = rag_system
+        self.message = message
+        self.options = options
+        self.answer = ""
+        self.pieces: List[str] = []
+        self.sources: List[str] = []
+        self.completed = False
+
+    @property
+    def text(self) -> str:
+        return self.answer or "".join(self.pieces)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        try:
+            for event in self.rag_system.query_stream(self.message, **self.options):
+                if event["type"] == "token":
+                    self.pieces.append(event["content"])
+                elif event["type"] == "done":
+                    self.completed = True
+                    result = event["result"]
+                    self.answer = result["answer"]
+                    event = {
+                        "type": "done",
+                        "answer": self.answer,
+                        "mode": "legal_rag",
+                        "results_count": result.get("results_count", 0),
+                        "context_length": result.get("context_length", 0),
+                        "ttft_ms": event.get("ttft_ms"),
+                        "total_ms": event.get("total_ms")
+                    }
+                elif event["type"] == "sources":
+                    self.sources = event.get("sources", [])
+                    event = dict(event, mode="legal_rag")
+                yield event
+        except Exception as e:
+            print(f"Error in RAG query: {e}")
+            self.answer = RAG_ERROR_ANSWER
+            yield {"type": "token", "content": self.answer}
+            yield {"type": "done", "answer": self.answer, "mode": "legal_rag", "ttft_ms": None, "total_ms": None}
+
+
+def general_events(answer: str) -> Iterator[Dict[str, Any]]:
+    """A complete general (non-RAG) answer as chat stream events"""
+    yield {"type": "sources", "sources": [], "search_results": [], "mode": "general"}
+    yield {"type": "token", "content": answer}
+    yield {"type": "done", "answer": answer, "mode": "general", "ttft_ms": None, "total_ms": None}
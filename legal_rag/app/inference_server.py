@@ -0,0 +1,194 @@
+"""
+Сервис инференса: bge-m3 и реранкер загружаются один раз и отдаются по HTTP всем процессам.
+
+    python -m legal_rag.app.inference_server [--host 127.0.0.1] [--port 8088]
+
+POST /embed   {"texts": [...], "prompt": str | null, "normalize": bool} -> {"embeddings": <base64 float32>}
+POST /rerank  {"pairs": [[query, passage], ...]}                         -> {"scores": [...]}
+GET  /health  модели, размерность эмбеддингов и статистика батчинга
+
+Одновременные запросы объединяются в общие батчи (MicroBatcher). Клиенты — EnhancedRAGSystem
+и пайплайны индексации с INFERENCE_URL=http://host:port.
+"""
+
+import os
+import json
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from legal_rag.rag.batching import MicroBatcher
+from legal_rag.rag.inference import encode_array
+
+RERANKER_MODEL_NAME = "BAAI/bge-reranker-v2-m3"
+# Upper bound on texts / pairs in one HTTP request
+MAX_REQUEST_ITEMS = 1024
+
+
+class InferenceService:
+    """Embedding and reranking models behind micro-batchers"""
+
+    def __init__(self, embedding_model: Any, cross_encoder: Any, embedding_model_name: str,
+                 reranker_model_name: str, max_batch: int = 64, max_wait_ms: float = 5.0, max_queue: int = 1024) -> None:
+        self.embedding_model = embedding_model
+        self.cross_encoder = cross_encoder
+        self.embedding_model_name = embedding_model_name
+        self.reranker_model_name = reranker_model_name
+        self.dimension = int(embedding_model.get_sentence_embedding_dimension())
+        self.max_batch = max_batch
+        self.embed_batcher = MicroBatcher(self._encode_items, max_batch=max_batch, max_wait_ms=max_wait_ms,
+                                          max_queue=max_queue, name="embed-batcher")
+        self.rerank_batcher = MicroBatcher(self._predict_pairs, max_batch=max_batch, max_wait_ms=max_wait_ms,
+                                           max_queue=max_queue, name="rerank-batcher")
+
+    def _encode_items(self, items: List[Tuple[str, Optional[str], bool]]) -> List[np.ndarray]:
+        """One encode call per (prompt, normalize) group of the coalesced batch"""
+        groups: Dict[Tuple[Optional[str], bool], List[int]] = {}
+        for i, (_, prompt, normalize) in enumerate(items):
+            groups.setdefault((prompt, normalize), []).append(i)
+        vectors: List[Optional[np.ndarray]] = [None] * len(items)
+        for (prompt, normalize), positions in groups.items():
+            encoded = self.embedding_model.encode(
+                [items[i][0] for i in positions],
+                normalize_embeddings=normalize,
+                prompt=prompt,
+                batch_size=self.max_batch
+            )
+            for i, vector in zip(positions, encoded):
+                vectors[i] = vector
+        return vectors  # type: ignore
+
+    def _predict_pairs(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        return [float(score) for score in self.cross_encoder.predict(pairs, batch_size=self.max_batch)]
+
+    def embed(self, texts: List[str], prompt: Optional[str] = None, normalize: bool = True) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        vectors = self.embed_batcher.submit([(text, prompt or None, normalize) for text in texts])
+        return np.vstack(vectors).astype(np.float32)
+
+    def rerank(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        return self.rerank_batcher.submit(pairs)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "embedding_model": self.embedding_model_name,
+            "reranker_model": self.reranker_model_name,
+            "dimension": self.dimension,
+            "batching": {
+                "embed": self.embed_batcher.stats(),
+                "rerank": self.rerank_batcher.stats()
+            }
+        }
+
+    def close(self) -> None:
+        self.embed_batcher.close()
+        self.rerank_batcher.close()
+
+
+def parse_texts(payload: Dict[str, Any]) -> List[str]:
+    texts = payload.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise ValueError("Expected 'texts': list of strings")
+    if len(texts) > MAX_REQUEST_ITEMS:
+        raise ValueError(f"At most {MAX_REQUEST_ITEMS} texts per request")
+    return texts
+
+
+def parse_pairs(payload: Dict[str, Any]) -> List[Tuple[str, str]]:
+    pairs = payload.get("pairs")
+    if not isinstance(pairs, list) or not all(
+        isinstance(pair, list) and len(pair) == 2 and all(isinstance(part, str) for part in pair) for pair in pairs
+    ):
+        raise ValueError("Expected 'pairs': list of [query, passage]")
+    if len(pairs) > MAX_REQUEST_ITEMS:
+        raise ValueError(f"At most {MAX_REQUEST_ITEMS} pairs per request")
+    return [(query, passage) for query, passage in pairs]
+
+
+def make_handler(service: InferenceService) -> type:
+    class InferenceHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def send_json(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self.send_json(200, service.info())
+            else:
+                self.send_json(404, {"error": "Not found"})
+
+        def do_POST(self) -> None:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/embed":
+                    vectors = service.embed(parse_texts(payload), payload.get("prompt"), bool(payload.get("normalize", True)))
+                    self.send_json(200, {"embeddings": encode_array(vectors)})
+                elif self.path == "/rerank":
+                    self.send_json(200, {"scores": service.rerank(parse_pairs(payload))})
+                else:
+                    self.send_json(404, {"error": "Not found"})
+            except (ValueError, json.JSONDecodeError) as e:
+                self.send_json(400, {"error": str(e)})
+            except RuntimeError as e:
+                # Batcher queue full (load shedding) or a model runtime failure: retryable
+                self.send_json(503, {"error": str(e)})
+            except Exception as e:
+                print(f"Error in inference request: {e}")
+                self.send_json(500, {"error": str(e)})
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return InferenceHandler
+
+
+def make_server(service: InferenceService, host: str = "127.0.0.1", port: int = 8088) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve embedding and reranking models over HTTP")
+    parser.add_argument("--host", default=os.getenv("INFERENCE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("INFERENCE_PORT", 8088)))
+    parser.add_argument("--max-batch", type=int, default=int(os.getenv("INFERENCE_MAX_BATCH", 64)))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("INFERENCE_MAX_WAIT_MS", 5)))
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer, CrossEncoder
+
+    embedding_model_name = os.getenv("EMBEDDING_MODEL_NAME") or "BAAI/bge-m3"
+    print(f"📥 Загрузка моделей: {embedding_model_name}, {RERANKER_MODEL_NAME}")
+    service = InferenceService(
+        SentenceTransformer(embedding_model_name),
+        CrossEncoder(RERANKER_MODEL_NAME),
+        embedding_model_name,
+        RERANKER_MODEL_NAME,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms
+    )
+    server = make_server(service, args.host, args.port)
+    print(f"🚀 Сервис инференса: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
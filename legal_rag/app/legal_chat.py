@@ -1,11 +1,12 @@
 import os
 import json
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 
 import openai
 from dotenv import load_dotenv
 
+from legal_rag.app.chat_stream import RAGChatStream, general_events
 from legal_rag.rag.rag_factory import get_rag_engine
 
 load_dotenv()
@@ -101,6 +102,24 @@ class LegalChatBot:
                 "mode": "general"
             }
     
+    def chat_stream(self, message: str, use_rag: bool = True) -> Iterator[Dict[str, Any]]:
+        """Streaming chat: sources first, then answer pieces, then a final "done" event"""
+        self.add_message("user", message)
+        
+        if not use_rag:
+            answer = self.get_general_answer(message)
+            self.add_message("assistant", answer)
+            yield from general_events(answer)
+            return
+        
+        stream = RAGChatStream(self.rag_system, message)
+        try:
+            yield from stream
+        finally:
+            # Keep the partial answer when the stream is interrupted
+            if stream.text:
+                self.add_message("assistant", stream.text)
+    
     def clear_history(self):
         """Clear conversation history"""
         self.conversation_history = []
@@ -173,13 +192,22 @@ def main():
             
             # Get response
             if is_legal_question:
-                result = chatbot.chat(user_input, use_rag=True)
-                print(result["answer"])
+                # Print the answer as it is generated
+                sources: List[str] = []
+                results_count = 0
+                for event in chatbot.chat_stream(user_input, use_rag=True):
+                    if event["type"] == "sources":
+                        sources = event.get("sources", [])
+                    elif event["type"] == "token":
+                        print(event["content"], end="", flush=True)
+                    elif event["type"] == "done":
+                        results_count = event.get("results_count", 0)
+                print()
                 
-                if result["sources"]:
-                    print(f"\n📚 Источники: {', '.join(result['sources'])}")
-                if result["results_count"] > 0:
-                    print(f"🔍 Найдено релевантных документов: {result['results_count']}")
+                if sources:
+                    print(f"\n📚 Источники: {', '.join(sources)}")
+                if results_count > 0:
+                    print(f"🔍 Найдено релевантных документов: {results_count}")
             else:
                 result = chatbot.chat(user_input, use_rag=False)
                 print(result["answer"])
@@ -1,40 +1,42 @@
 import os
+import re
 import json
+import uuid
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 import openai
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
 
+from legal_rag.app.chat_stream import RAGChatStream, general_events
 from legal_rag.rag.rag_factory import get_rag_engine
+from legal_rag.rag.sessions import DEFAULT_SESSION
 
 load_dotenv()
 
 app = Flask(__name__)
 
+SESSION_COOKIE = "legal_chat_session"
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
 class WebLegalChatBot:
     def __init__(self, model: str = "gpt-4"):
         """Initialize the legal chatbot with RAG system"""
         self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.model = model
+        # Chat history per browser session lives in the engine's session store (see SESSION_* settings)
         self.rag_system = get_rag_engine()
-        self.conversation_history: List[Dict[str, str]] = []
-        self.max_history_length = 10
-        
-    def add_message(self, role: str, content: str):
-        """Add a message to conversation history"""
-        self.conversation_history.append({"role": role, "content": content})
         
-        # Keep conversation history within limit
-        if len(self.conversation_history) > self.max_history_length * 2:
-            self.conversation_history = self.conversation_history[-self.max_history_length * 2:]
+    def add_turn(self, session_id: str, message: str, answer: str, sources: Optional[List[str]] = None):
+        """Add a question/answer pair the engine did not record itself (general answers, interrupted streams)"""
+        self.rag_system.sessions.append(session_id, message, answer, sources=sources or [])
     
-    def get_legal_answer(self, question: str) -> Dict[str, Any]:
+    def get_legal_answer(self, question: str, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """Get legal answer using RAG system"""
         try:
             # Use RAG system to get answer
-            result = self.rag_system.query(question)
+            result = self.rag_system.query(question, session_id=session_id)
             return result
         except Exception as e:
             print(f"Error in RAG query: {e}")
@@ -44,15 +46,11 @@ class WebLegalChatBot:
                 "search_results": []
             }
     
-    def get_general_answer(self, question: str) -> str:
+    def get_general_answer(self, question: str, session_id: str = DEFAULT_SESSION) -> str:
         """Get general answer using OpenAI (without RAG)"""
         try:
             # Convert conversation history to proper format
-            messages = []
-            for msg in self.conversation_history:
-                if msg["role"] in ["user", "assistant", "system"]:
-                    messages.append({"role": msg["role"], "content": msg["content"]})
-            
+            messages = self.get_history(session_id)
             messages.append({"role": "user", "content": question})
             
             response = self.openai_client.chat.completions.create(
@@ -69,19 +67,13 @@ class WebLegalChatBot:
             print(f"Error getting general answer: {e}")
             return "Извините, произошла ошибка при генерации ответа."
     
-    def chat(self, message: str, use_rag: bool = True) -> Dict[str, Any]:
+    def chat(self, message: str, use_rag: bool = True, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """Main chat method"""
-        # Add user message to history
-        self.add_message("user", message)
-        
         if use_rag:
-            # Use RAG for legal questions
-            result = self.get_legal_answer(message)
+            # Use RAG for legal questions; the engine adds the exchange to the session history
+            result = self.get_legal_answer(message, session_id)
             answer = result["answer"]
             
-            # Add assistant response to history
-            self.add_message("assistant", answer)
-            
             return {
                 "answer": answer,
                 "sources": result.get("sources", []),
@@ -92,10 +84,10 @@ class WebLegalChatBot:
             }
         else:
             # Use general OpenAI for non-legal questions
-            answer = self.get_general_answer(message)
+            answer = self.get_general_answer(message, session_id)
             
-            # Add assistant response to history
-            self.add_message("assistant", answer)
+            # Add the exchange to history
+            self.add_turn(session_id, message, answer)
             
             return {
                 "answer": answer,
@@ -104,14 +96,33 @@ class WebLegalChatBot:
                 "mode": "general"
             }
     
-    def clear_history(self):
+    def chat_stream(self, message: str, use_rag: bool = True, session_id: str = DEFAULT_SESSION) -> Iterator[Dict[str, Any]]:
+        """Streaming chat: sources first, then answer pieces, then a final "done" event"""
+        if not use_rag:
+            answer = self.get_general_answer(message, session_id)
+            self.add_turn(session_id, message, answer)
+            yield from general_events(answer)
+            return
+        
+        stream = RAGChatStream(self.rag_system, message, session_id=session_id)
+        try:
+            yield from stream
+        finally:
+            # A finished stream was recorded by the engine; keep the partial answer when the client disconnects
+            if stream.text and not stream.completed:
+                self.add_turn(session_id, message, stream.text, stream.sources)
+    
+    def clear_history(self, session_id: str = DEFAULT_SESSION):
         """Clear conversation history"""
-        self.conversation_history = []
-        self.rag_system.clear_conversation_history()
+        self.rag_system.clear_conversation_history(session_id)
     
-    def get_history(self) -> List[Dict[str, str]]:
-        """Get conversation history"""
-        return self.conversation_history
+    def get_history(self, session_id: str = DEFAULT_SESSION) -> List[Dict[str, str]]:
+        """Get conversation history as chat messages"""
+        messages: List[Dict[str, str]] = []
+        for turn in self.rag_system.sessions.history(session_id):
+            messages.append({"role": "user", "content": turn.user_query})
+            messages.append({"role": "assistant", "content": turn.generated_response})
+        return messages
     
     def get_system_stats(self) -> Dict[str, Any]:
         """Get system statistics"""
@@ -120,12 +131,53 @@ class WebLegalChatBot:
 # Global chatbot instance
 chatbot = WebLegalChatBot()
 
+def resolve_session_id() -> Tuple[str, bool]:
+    """(session id, newly issued): from the X-Session-Id header or the session cookie, else a new one"""
+    for candidate in (request.headers.get("X-Session-Id"), request.cookies.get(SESSION_COOKIE)):
+        if candidate and SESSION_ID_PATTERN.fullmatch(candidate):
+            return candidate, False
+    return uuid.uuid4().hex, True
+
+@app.before_request
+def load_session():
+    g.session_id, g.new_session = resolve_session_id()
+
+@app.after_request
+def save_session(response: Response) -> Response:
+    if g.get("new_session"):
+        response.set_cookie(SESSION_COOKIE, g.session_id, httponly=True, samesite="Lax")
+    if g.get("session_id"):
+        response.headers["X-Session-Id"] = g.session_id
+    return response
+
 @app.route('/')
 def index():
     """Main page"""
     stats = chatbot.get_system_stats()
     return render_template('legal_chat.html', stats=stats)
 
+def resolve_mode(message: str, mode: str) -> Tuple[bool, bool]:
+    """(use RAG, looks like a legal question) for the requested mode: legal | general | auto"""
+    # Determine if this is a legal question
+    legal_keywords = [
+        'закон', 'право', 'статья', 'кодекс', 'договор', 'суд', 'иск',
+        'ответственность', 'обязательство', 'собственность', 'наследство',
+        'брак', 'развод', 'алименты', 'трудовой', 'налог', 'административный',
+        'уголовный', 'гражданский', 'конституция', 'постановление', 'приказ'
+    ]
+    
+    is_legal_question = any(keyword in message.lower() for keyword in legal_keywords)
+    
+    if mode == 'legal':
+        return True, is_legal_question
+    if mode == 'general':
+        return False, is_legal_question
+    return is_legal_question, is_legal_question
+
+def sse_event(event: Dict[str, Any]) -> str:
+    """One Server-Sent Events message carrying a JSON event"""
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Chat endpoint"""
@@ -137,25 +189,10 @@ def chat():
         if not message:
             return jsonify({'error': 'Message is required'}), 400
         
-        # Determine if this is a legal question
-        legal_keywords = [
-            'закон', 'право', 'статья', 'кодекс', 'договор', 'суд', 'иск',
-            'ответственность', 'обязательство', 'собственность', 'наследство',
-            'брак', 'развод', 'алименты', 'трудовой', 'налог', 'административный',
-            'уголовный', 'гражданский', 'конституция', 'постановление', 'приказ'
-        ]
-        
-        is_legal_question = any(keyword in message.lower() for keyword in legal_keywords)
-
-        if mode == 'legal':
-            use_rag = True
-        elif mode == 'general':
-            use_rag = False
-        else:
-            use_rag = is_legal_question
+        use_rag, is_legal_question = resolve_mode(message, mode)
         
         # Get response
-        result = chatbot.chat(message, use_rag=use_rag)
+        result = chatbot.chat(message, use_rag=use_rag, session_id=g.session_id)
         
         return jsonify({
             'answer': result['answer'],
@@ -171,11 +208,40 @@ def chat():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat endpoint streaming Server-Sent Events: sources, answer tokens, done"""
+    data = request.get_json(silent=True) or {}
+    message = data.get('message', '').strip()
+    mode = data.get('mode', 'auto')  # legal | general | auto
+    
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    use_rag, is_legal_question = resolve_mode(message, mode)
+    session_id = g.session_id
+    
+    def generate() -> Iterator[str]:
+        try:
+            for event in chatbot.chat_stream(message, use_rag=use_rag, session_id=session_id):
+                if event["type"] == "sources":
+                    event = dict(event, requested_mode=mode, detected_mode='legal' if is_legal_question else 'general')
+                yield sse_event(event)
+        except Exception as e:
+            # Headers are already sent: report the failure in-band
+            yield sse_event({"type": "error", "error": str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/clear', methods=['POST'])
 def clear_history():
     """Clear conversation history"""
     try:
-        chatbot.clear_history()
+        chatbot.clear_history(g.session_id)
         return jsonify({'message': 'History cleared successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -193,7 +259,7 @@ def get_stats():
 def get_history():
     """Get conversation history"""
     try:
-        history = chatbot.get_history()
+        history = chatbot.get_history(g.session_id)
         return jsonify({'history': history})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,80 @@
+"""
+Сборка локальных артефактов поиска: полные тексты чанков, BM25-индекс по всему корпусу
+и векторы для VECTOR_BACKEND=local.
+
+    python -m legal_rag.pipelines.build_local_index [--chunk-dir data/chunks] [--index-dir data/index]
+    python -m legal_rag.pipelines.build_local_index --skip-embeddings   # без векторов (для Pinecone)
+"""
+
+import argparse
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+from legal_rag.pipelines.chunks import CHUNK_DIR, chunk_id, index_metadata, load_chunks
+from legal_rag.rag.article_lookup import ArticleIndex
+from legal_rag.rag.bm25_index import BM25Index
+from legal_rag.rag.chunk_store import ChunkStore
+from legal_rag.rag.vector_store import get_index_dir, save_local_index
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME") or "BAAI/bge-m3"
+EMBEDDING_PASSAGE_PROMPT = os.getenv("EMBEDDING_PASSAGE_PROMPT") or "Represent this passage for retrieval: "
+
+
+def embed_passages(texts, batch_size: int = 32) -> np.ndarray:
+    """Encode passages with the same model and prompt as embed_and_index_fixed"""
+    from legal_rag.rag.inference import load_embedding_model
+
+    sentence_model = load_embedding_model(EMBEDDING_MODEL_NAME)
+    embeddings = sentence_model.encode(
+        [text.replace("\n", " ") for text in texts],
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        prompt=EMBEDDING_PASSAGE_PROMPT,
+        show_progress_bar=True
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build on-disk artifacts for local retrieval")
+    parser.add_argument("--chunk-dir", default=CHUNK_DIR)
+    parser.add_argument("--index-dir", default=get_index_dir())
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--skip-embeddings", action="store_true", help="build only the chunk store and BM25 index")
+    args = parser.parse_args()
+
+    print(f"📖 Загрузка чанков из {args.chunk_dir}...")
+    texts, metadatas = load_chunks(args.chunk_dir, verbose=True)
+    if not texts:
+        print("❌ No texts loaded! Exiting.")
+        raise SystemExit(1)
+
+    ids = [chunk_id(i) for i in range(len(texts))]
+    index_metadatas = [index_metadata(text, metadata, EMBEDDING_MODEL_NAME) for text, metadata in zip(texts, metadatas)]
+
+    ChunkStore.build(args.index_dir, ids, texts, index_metadatas)
+    print(f"✅ Тексты чанков сохранены в {args.index_dir}")
+
+    article_index = ArticleIndex.from_metadata(ids, index_metadatas)
+    article_index.save(args.index_dir)
+    print(f"✅ Индекс статей сохранён: {article_index.describe()}")
+
+    bm25_index = BM25Index.build(texts, ids)
+    bm25_index.save(args.index_dir)
+    print(f"✅ BM25-индекс сохранён в {args.index_dir}: {bm25_index.describe()}")
+
+    if args.skip_embeddings:
+        return
+
+    print(f"🧮 Векторизация {len(texts)} чанков моделью {EMBEDDING_MODEL_NAME}...")
+    vectors = embed_passages(texts, batch_size=args.batch_size)
+    save_local_index(args.index_dir, vectors, ids, index_metadatas)
+    print(f"✅ Векторы сохранены в {args.index_dir} ({vectors.shape[0]} x {vectors.shape[1]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+from typing import Any, Dict, List, Tuple
+
+CHUNK_DIR = "data/chunks"
+MIN_CHUNK_LENGTH = 10
+
+
+def read_chunk_metadata(meta_path: str) -> Dict[str, str]:
+    """Parse a `key:value` metadata file written by preprocess_articles"""
+    metadata: Dict[str, str] = {}
+    if not os.path.exists(meta_path):
+        return metadata
+    with open(meta_path, "r", encoding="utf-8") as mf:
+        for line in mf:
+            if ":" in line:
+                key, value = line.strip().split(":", 1)
+                metadata[key] = value
+    return metadata
+
+
+def load_chunks(chunk_dir: str = CHUNK_DIR, verbose: bool = False) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Load chunk texts and metadata in a stable (sorted) order.
+
+    Vector ids are assigned as `doc-{position}` over the returned lists, so every
+    index built from the same chunk directory (Pinecone or local) agrees on ids.
+    """
+    texts: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+
+    chunk_files = sorted(f for f in os.listdir(chunk_dir) if f.endswith(".txt") and not f.endswith("_meta.txt"))
+    if verbose:
+        print(f"📁 Found {len(chunk_files)} chunk files")
+
+    for filename in chunk_files:
+        path = os.path.join(chunk_dir, filename)
+        meta_path = os.path.join(chunk_dir, filename.replace(".txt", "_meta.txt"))
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read().strip()
+
+            if len(text) < MIN_CHUNK_LENGTH:
+                if verbose:
+                    print(f"⚠️  Skipping {filename}: too short ({len(text)} chars)")
+                continue
+
+            metadata: Dict[str, Any] = {"filename": filename, "text": text[:200] + "..." if len(text) > 200 else text}
+            metadata.update(read_chunk_metadata(meta_path))
+
+            texts.append(text)
+            metadatas.append(metadata)
+        except Exception as e:
+            print(f"❌ Error loading {filename}: {e}")
+            continue
+
+    return texts, metadatas
+
+
+def chunk_id(position: int) -> str:
+    """Vector id for the chunk at `position` in `load_chunks` order"""
+    return f"doc-{position}"
+
+
+def index_metadata(text: str, metadata: Dict[str, Any], embedding_model: str) -> Dict[str, Any]:
+    """Build vector metadata restricted to Pinecone-compatible value types"""
+    enhanced_metadata: Dict[str, Any] = {
+        "filename": metadata.get("filename", ""),
+        "text_preview": metadata.get("text", "")[:500],  # Limit text preview
+        "text_length": len(text),
+        "embedding_model": embedding_model,
+        "has_local_embedding": True
+    }
+
+    for key, value in metadata.items():
+        if key not in enhanced_metadata:
+            # Only add if it's a string, number, or boolean
+            if isinstance(value, (str, int, float, bool)):
+                enhanced_metadata[key] = value
+            elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+                enhanced_metadata[key] = value
+
+    return enhanced_metadata
@@ -3,7 +3,13 @@ import json
 from dotenv import load_dotenv
 from pinecone import Pinecone, ServerlessSpec
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer
+
+from legal_rag.pipelines.chunks import CHUNK_DIR, chunk_id, index_metadata, load_chunks
+from legal_rag.rag.article_lookup import ArticleIndex
+from legal_rag.rag.bm25_index import BM25Index
+from legal_rag.rag.chunk_store import ChunkStore
+from legal_rag.rag.inference import load_embedding_model
+from legal_rag.rag.vector_store import get_index_dir
 
 # === Шаг 1: Загрузка ключей ===
 load_dotenv()
@@ -22,8 +28,8 @@ print(f"   EMBEDDING_MODEL: {EMBEDDING_MODEL_NAME}")
 # === Шаг 2: Настройка клиентов ===
 pc = Pinecone(api_key=PINECONE_API_KEY)
 
-# Initialize sentence transformer for multilingual legal embeddings (ru/kz friendly)
-sentence_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+# Initialize sentence transformer for multilingual legal embeddings (ru/kz friendly); INFERENCE_URL uses the sidecar
+sentence_model = load_embedding_model(EMBEDDING_MODEL_NAME)
 EMBEDDING_DIM = sentence_model.get_sentence_embedding_dimension()
 
 # === Шаг 3: Создание индекса, если не существует ===
@@ -51,43 +57,11 @@ except Exception as e:
     exit(1)
 
 # === Шаг 4: Загрузка текстов чанков с метаданными ===
-chunk_dir = "data/chunks"
-texts = []
-metadatas = []
+chunk_dir = CHUNK_DIR
 
 print(f"\n📖 Загрузка чанков из {chunk_dir}...")
 
-chunk_files = [f for f in os.listdir(chunk_dir) if f.endswith(".txt") and not f.endswith("_meta.txt")]
-print(f"📁 Found {len(chunk_files)} chunk files")
-
-for filename in chunk_files:
-    path = os.path.join(chunk_dir, filename)
-    meta_path = os.path.join(chunk_dir, filename.replace(".txt", "_meta.txt"))
-    
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            text = f.read().strip()
-        
-        if len(text) < 10:
-            print(f"⚠️  Skipping {filename}: too short ({len(text)} chars)")
-            continue
-            
-        # Load metadata if available
-        metadata = {"filename": filename, "text": text[:200] + "..." if len(text) > 200 else text}
-        
-        if os.path.exists(meta_path):
-            with open(meta_path, "r", encoding="utf-8") as mf:
-                for line in mf:
-                    if ":" in line:
-                        key, value = line.strip().split(":", 1)
-                        metadata[key] = value
-        
-        texts.append(text)
-        metadatas.append(metadata)
-        
-    except Exception as e:
-        print(f"❌ Error loading {filename}: {e}")
-        continue
+texts, metadatas = load_chunks(chunk_dir, verbose=True)
 
 print(f"📊 Загружено {len(texts)} чанков")
 
@@ -137,25 +111,10 @@ for i in tqdm(range(0, len(texts), batch_size), desc="📦 Индексация
                 continue
             
             # Enhanced metadata - only include Pinecone-compatible types
-            enhanced_metadata = {
-                "filename": metadata.get("filename", ""),
-                "text_preview": metadata.get("text", "")[:500],  # Limit text preview
-                "text_length": len(text),
-                "embedding_model": EMBEDDING_MODEL_NAME,
-                "has_local_embedding": True
-            }
-            
-            # Add other metadata fields if they exist and are compatible
-            for key, value in metadata.items():
-                if key not in enhanced_metadata:
-                    # Only add if it's a string, number, or boolean
-                    if isinstance(value, (str, int, float, bool)):
-                        enhanced_metadata[key] = value
-                    elif isinstance(value, list) and all(isinstance(item, str) for item in value):
-                        enhanced_metadata[key] = value
+            enhanced_metadata = index_metadata(text, metadata, EMBEDDING_MODEL_NAME)
             
             vectors_to_upsert.append({
-                "id": f"doc-{i + j}",
+                "id": chunk_id(i + j),
                 "values": embedding,
                 "metadata": enhanced_metadata
             })
@@ -202,4 +161,15 @@ stats = {
 with open("index_stats.json", "w") as f:
     json.dump(stats, f, indent=2)
 
-print("📈 Статистика сохранена в index_stats.json") 
+print("📈 Статистика сохранена в index_stats.json")
+
+# === Шаг 7: Локальные артефакты: полные тексты чанков и BM25-индекс по всему корпусу ===
+chunk_ids = [chunk_id(i) for i in range(len(texts))]
+chunk_metadatas = [index_metadata(text, metadata, EMBEDDING_MODEL_NAME) for text, metadata in zip(texts, metadatas)]
+ChunkStore.build(get_index_dir(), chunk_ids, texts, chunk_metadatas)
+ArticleIndex.from_metadata(chunk_ids, chunk_metadatas).save(get_index_dir())
+print(f"🗂️  Тексты чанков и индекс статей сохранены в {get_index_dir()}")
+
+bm25_index = BM25Index.build(texts, chunk_ids)
+bm25_index.save(get_index_dir())
+print(f"📚 BM25-индекс сохранён в {get_index_dir()}: {bm25_index.describe()}")
@@ -0,0 +1,151 @@
+import os
+import json
+import numpy as np
+from typing import Dict, Any, Optional, Tuple
+
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+IVF_ROWS_FILE = "ivf_rows.npy"
+IVF_VECTORS_FILE = "ivf_vectors.npy"
+IVF_CONFIG_FILE = "ivf_config.json"
+
+DEFAULT_NPROBE = 8
+
+
+def default_nlist(n_vectors: int) -> int:
+    """Rule of thumb: about 4 * sqrt(N) inverted lists"""
+    return max(1, min(n_vectors, int(4 * np.sqrt(max(n_vectors, 1)))))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+    """Nearest centroid (by inner product) for every row, computed in batches"""
+    assignments = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], batch_size):
+        block = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+        assignments[start:start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """Train unit-norm centroids for cosine similarity"""
+    rng = np.random.default_rng(seed)
+    data = np.asarray(vectors, dtype=np.float32)
+    centroids = data[rng.choice(data.shape[0], size=n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = _assign(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        counts = np.bincount(assignments, minlength=n_clusters)
+
+        # Re-seed empty clusters with random points so every list stays usable
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            sums[empty] = data[rng.choice(data.shape[0], size=empty.size, replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file ANN index: k-means coarse quantizer plus list-ordered vectors.
+
+    Vectors are stored grouped by list so each probed list is one contiguous
+    slice of the memory-mapped matrix; `rows` maps back to the original row ids.
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray, vectors: np.ndarray,
+                 source_fingerprint: Optional[str] = None) -> None:
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.vectors = vectors
+        # Fingerprint of the flat index the lists were built from (see vector_store.MANIFEST_FILE)
+        self.source_fingerprint = source_fingerprint
+        self.nprobe = DEFAULT_NPROBE
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: Optional[int] = None, n_iter: int = 20,
+              train_size: Optional[int] = None, seed: int = 0) -> "IVFIndex":
+        n_vectors = vectors.shape[0]
+        nlist = min(nlist or default_nlist(n_vectors), n_vectors)
+
+        # Train on a sample; 256 points per list is plenty for a stable quantizer
+        train_size = min(n_vectors, train_size or 256 * nlist)
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(n_vectors, size=train_size, replace=False))
+        centroids = spherical_kmeans(np.asarray(vectors[sample_rows]), nlist, n_iter=n_iter, seed=seed)
+
+        assignments = _assign(vectors, centroids)
+        rows = np.argsort(assignments, kind="stable").astype(np.int32)
+        counts = np.bincount(assignments, minlength=nlist)
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        ordered_vectors = np.ascontiguousarray(np.asarray(vectors)[rows], dtype=np.float32)
+        return cls(centroids, offsets, rows, ordered_vectors)
+
+    def search(self, query: np.ndarray, top_k: int, nprobe: Optional[int] = None,
+               allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (original rows, scores) of the approximate top-k, best first.
+
+        `allowed` is an optional boolean mask over original rows (metadata filter).
+        """
+        probe_count = max(1, min(nprobe or self.nprobe, self.nlist))
+        order = np.argsort(-(self.centroids @ query))
+
+        # Probe the closest lists, widening until at least top_k (allowed) candidates exist
+        while True:
+            probed = order[:probe_count]
+            candidates = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in probed])
+            if allowed is not None:
+                candidates = candidates[allowed[self.rows[candidates]]]
+            if candidates.size >= top_k or probe_count >= self.nlist:
+                break
+            probe_count = min(self.nlist, probe_count * 2)
+
+        if candidates.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = np.asarray(self.vectors[candidates]) @ query
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k] if k < scores.shape[0] else np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return self.rows[candidates[top]].astype(np.int64), scores[top]
+
+    def save(self, index_dir: str) -> None:
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, IVF_CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(index_dir, IVF_OFFSETS_FILE), self.offsets)
+        np.save(os.path.join(index_dir, IVF_ROWS_FILE), self.rows)
+        np.save(os.path.join(index_dir, IVF_VECTORS_FILE), self.vectors)
+        with open(os.path.join(index_dir, IVF_CONFIG_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "type": "ivf",
+                "nlist": self.nlist,
+                "n_vectors": int(self.rows.shape[0]),
+                "source_fingerprint": self.source_fingerprint
+            }, f)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "IVFIndex":
+        with open(os.path.join(index_dir, IVF_CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(
+            centroids=np.load(os.path.join(index_dir, IVF_CENTROIDS_FILE)),
+            offsets=np.load(os.path.join(index_dir, IVF_OFFSETS_FILE)),
+            rows=np.load(os.path.join(index_dir, IVF_ROWS_FILE), mmap_mode="r"),
+            vectors=np.load(os.path.join(index_dir, IVF_VECTORS_FILE), mmap_mode="r"),
+            source_fingerprint=config.get("source_fingerprint")
+        )
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, IVF_CONFIG_FILE))
+
+    def describe(self) -> Dict[str, Any]:
+        return {"type": "ivf", "nlist": self.nlist, "nprobe": self.nprobe}
@@ -0,0 +1,103 @@
+import os
+import re
+import json
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+
+ARTICLE_INDEX_FILE = "article_index.json"
+
+# Source document (the `source` field written by preprocess_articles) -> patterns naming it in a query
+CODE_PATTERNS: Dict[str, List[str]] = {
+    "civil_code_kz.txt": [r"\bгк\b", r"гражданск\w*\s+кодекс", r"азаматтық"],
+    "labor_code_kz.txt": [r"\bтк\b", r"трудов\w*\s+кодекс", r"еңбек\s+кодекс"],
+    "constitution_kz.txt": [r"конституци\w*"],
+}
+
+_NUMBER = r"\d+(?:-\d+)?"
+_NUMBER_LIST = rf"{_NUMBER}(?:\s*(?:,|и|and)\s*{_NUMBER})*"
+_ARTICLE_RE = re.compile(rf"(?:стать\w*|ст\.|article)\s*№?\s*({_NUMBER_LIST})", re.IGNORECASE)
+_KZ_ARTICLE_RE = re.compile(rf"({_NUMBER})\s*-\s*бап", re.IGNORECASE)
+_PART_SUFFIX_RE = re.compile(r"-part\d+$")
+
+
+@dataclass(frozen=True)
+class ArticleReference:
+    """Articles of one code referenced by a query"""
+    source: str
+    numbers: Tuple[str, ...]
+
+
+def detect_code(query: str) -> Optional[str]:
+    """Source document named in the query, if exactly one code is mentioned"""
+    lowered = query.lower()
+    found = [source for source, patterns in CODE_PATTERNS.items() if any(re.search(p, lowered) for p in patterns)]
+    return found[0] if len(found) == 1 else None
+
+
+def parse_article_reference(query: str) -> Optional[ArticleReference]:
+    """Detect 'статья N ГК/ТК/Конституции' style references; None unless both article and code are explicit"""
+    source = detect_code(query)
+    if source is None:
+        return None
+
+    numbers: List[str] = []
+    for match in _ARTICLE_RE.finditer(query):
+        numbers.extend(re.findall(_NUMBER, match.group(1)))
+    for match in _KZ_ARTICLE_RE.finditer(query):
+        numbers.append(match.group(1))
+    if not numbers:
+        return None
+    return ArticleReference(source=source, numbers=tuple(dict.fromkeys(numbers)))
+
+
+def _base_number(article_number: str) -> str:
+    """'12-part3' -> '12'; real numbers such as '128-1' are kept"""
+    return _PART_SUFFIX_RE.sub("", article_number.strip())
+
+
+class ArticleIndex:
+    """(source, article number) -> chunk ids, including every part of split articles."""
+
+    def __init__(self, entries: Dict[str, List[str]]) -> None:
+        self.entries = entries
+
+    @staticmethod
+    def _key(source: str, number: str) -> str:
+        return f"{source}#{number}"
+
+    @classmethod
+    def from_metadata(cls, ids: List[str], metadatas: List[Dict[str, Any]]) -> "ArticleIndex":
+        entries: Dict[str, List[str]] = {}
+        for doc_id, metadata in zip(ids, metadatas):
+            source = metadata.get("source")
+            number = metadata.get("article_number")
+            if not source or not number or metadata.get("article_type") == "paragraph":
+                continue
+            entries.setdefault(cls._key(source, _base_number(number)), []).append(doc_id)
+        return cls(entries)
+
+    def lookup(self, reference: ArticleReference) -> List[str]:
+        ids: List[str] = []
+        for number in reference.numbers:
+            ids.extend(self.entries.get(self._key(reference.source, number), []))
+        return ids
+
+    def save(self, index_dir: str) -> None:
+        os.makedirs(index_dir, exist_ok=True)
+        with open(os.path.join(index_dir, ARTICLE_INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "ArticleIndex":
+        with open(os.path.join(index_dir, ARTICLE_INDEX_FILE), "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def describe(self) -> Dict[str, Any]:
+        return {"articles": len(self.entries)}
+
+
+def load_article_index(index_dir: str) -> Optional[ArticleIndex]:
+    """Load the persisted article index, or None when it has not been built"""
+    if not os.path.exists(os.path.join(index_dir, ARTICLE_INDEX_FILE)):
+        return None
+    return ArticleIndex.load(index_dir)
@@ -0,0 +1,123 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Any, Callable, Optional, Sequence
+
+
+class _Request:
+    __slots__ = ("items", "future")
+
+    def __init__(self, items: List[Any]) -> None:
+        self.items = items
+        self.future: Future = Future()
+
+
+class MicroBatcher:
+    """Coalesces work from concurrent callers into batched calls of `batch_fn`.
+
+    A background worker takes the first queued request, keeps collecting requests
+    for up to `max_wait_ms` or until `max_batch` items are gathered, runs `batch_fn`
+    once on all items and hands each caller its slice of the output. At most
+    `max_queue` requests may wait; beyond that `submit` fails fast instead of
+    building an unbounded backlog.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Sequence[Any]], max_batch: int = 32,
+                 max_wait_ms: float = 5.0, max_queue: int = 256, name: str = "batcher") -> None:
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.name = name
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue(maxsize=max_queue)
+        self._pending: Optional[_Request] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.rejected = 0
+        # Batch size histogram in power-of-two buckets: {1: n, 2: n, 4: n, ...}
+        self.size_histogram: Dict[int, int] = {}
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, items: List[Any], timeout: Optional[float] = None) -> List[Any]:
+        """Results for `items`, in order; blocks until their batch has run"""
+        if not items:
+            return []
+        request = _Request(list(items))
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise RuntimeError(f"{self.name}: queue is full ({self.max_queue} waiting requests)")
+        return request.future.result(timeout=timeout)
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        requests = [first]
+        size = len(first.items)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)  # keep the shutdown signal for the main loop
+                break
+            if size + len(request.items) > self.max_batch:
+                self._pending = request  # starts the next batch
+                break
+            requests.append(request)
+            size += len(request.items)
+        return requests
+
+    def _run(self) -> None:
+        while True:
+            first = self._pending if self._pending is not None else self._queue.get()
+            self._pending = None
+            if first is None:
+                return
+            requests = self._collect(first)
+            items = [item for request in requests for item in request.items]
+            try:
+                outputs = self.batch_fn(items)
+            except Exception as e:
+                for request in requests:
+                    request.future.set_exception(e)
+                continue
+
+            with self._lock:
+                self.batches += 1
+                self.items += len(items)
+                self.max_batch_seen = max(self.max_batch_seen, len(items))
+                bucket = 1 << (len(items) - 1).bit_length()
+                self.size_histogram[bucket] = self.size_histogram.get(bucket, 0) + 1
+            start = 0
+            for request in requests:
+                end = start + len(request.items)
+                request.future.set_result(list(outputs[start:end]))
+                start = end
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._worker.join(timeout=1.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "batch_size_histogram": dict(sorted(self.size_histogram.items())),
+            "queue_depth": self._queue.qsize(),
+            "rejected": self.rejected,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0
+        }
+
@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import numpy as np
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+
+BM25_VOCAB_FILE = "bm25_vocab.json"
+BM25_IDS_FILE = "bm25_ids.json"
+BM25_OFFSETS_FILE = "bm25_offsets.npy"
+BM25_DOCS_FILE = "bm25_docs.npy"
+BM25_TFS_FILE = "bm25_tfs.npy"
+BM25_DOC_LEN_FILE = "bm25_doc_len.npy"
+BM25_IDF_FILE = "bm25_idf.npy"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; punctuation is dropped so 'статья 1.' matches 'статья 1'"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def bm25_idf(n_docs: int, doc_freq: np.ndarray) -> np.ndarray:
+    """Non-negative BM25 IDF log(1 + (N - n + 0.5) / (n + 0.5)) of terms with document frequency n"""
+    doc_freq = np.asarray(doc_freq, dtype=np.float64)
+    return np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+class BM25Index:
+    """Corpus-wide BM25 inverted index.
+
+    Postings are stored CSR-style: `offsets[t]:offsets[t + 1]` slices `docs` and
+    `tfs` for term id `t`. All arrays are plain .npy files loaded with mmap.
+    IDF uses the non-negative form log(1 + (N - n + 0.5) / (n + 0.5)).
+    """
+
+    def __init__(self, vocab: Dict[str, int], ids: List[str], offsets: np.ndarray, docs: np.ndarray,
+                 tfs: np.ndarray, doc_len: np.ndarray, idf: np.ndarray, k1: float = 1.5, b: float = 0.75) -> None:
+        self.vocab = vocab
+        self.ids = ids
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.idf = idf
+        self.k1 = k1
+        self.b = b
+        self.avgdl = float(np.mean(doc_len)) if len(doc_len) else 0.0
+        # Per-document length normalisation, precomputed once: k1 * (1 - b + b * dl / avgdl)
+        self._norm = (k1 * (1 - b + b * np.asarray(doc_len, dtype=np.float32) / max(self.avgdl, 1e-8))).astype(np.float32)
+        self.id_to_row = {doc_id: row for row, doc_id in enumerate(ids)}
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, texts: List[str], ids: List[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        if len(texts) != len(ids):
+            raise ValueError("texts and ids must have the same length")
+
+        vocab: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        doc_len = np.zeros(len(texts), dtype=np.int32)
+
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len[row] = sum(counts.values())
+            for term, tf in counts.items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((row, tf))
+
+        lengths = np.array([len(p) for p in postings], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        docs = np.fromiter((row for p in postings for row, _ in p), dtype=np.int32, count=int(offsets[-1]))
+        tfs = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(offsets[-1]))
+
+        n_docs = len(texts)
+        idf = bm25_idf(n_docs, lengths).astype(np.float32)
+        return cls(vocab, list(ids), offsets, docs, tfs, doc_len, idf, k1=k1, b=b)
+
+    def _term_ids(self, query_tokens: List[str]) -> List[int]:
+        return [self.vocab[token] for token in query_tokens if token in self.vocab]
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """BM25 score of every document for the tokenized query"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        term_ids = self._term_ids(query_tokens)
+        if not term_ids:
+            return scores
+
+        slices = [(self.offsets[t], self.offsets[t + 1]) for t in term_ids]
+        docs = np.concatenate([self.docs[start:end] for start, end in slices])
+        tfs = np.concatenate([self.tfs[start:end] for start, end in slices])
+        idf = np.repeat(self.idf[term_ids], [end - start for start, end in slices])
+
+        contributions = idf * tfs * (self.k1 + 1) / (tfs + self._norm[docs])
+        return np.bincount(docs, weights=contributions, minlength=self.n_docs).astype(np.float32)
+
+    def search(self, query: str, top_k: int, allowed: Optional[np.ndarray] = None) -> Tuple[List[str], np.ndarray]:
+        """Lexical top-k as (ids, scores), best first; documents with zero score are dropped.
+
+        `allowed` is an optional boolean mask over index rows (metadata filter).
+        """
+        scores = self.get_scores(tokenize(query))
+        matched = np.flatnonzero((scores > 0) & allowed) if allowed is not None else np.flatnonzero(scores > 0)
+        if matched.size == 0 or top_k <= 0:
+            return [], np.empty(0, dtype=np.float32)
+        if matched.size > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [self.ids[row] for row in matched.tolist()], scores[matched]
+
+    def save(self, index_dir: str) -> None:
+        os.makedirs(index_dir, exist_ok=True)
+        with open(os.path.join(index_dir, BM25_VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": self.vocab}, f, ensure_ascii=False)
+        with open(os.path.join(index_dir, BM25_IDS_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+        np.save(os.path.join(index_dir, BM25_OFFSETS_FILE), np.asarray(self.offsets, dtype=np.int64))
+        np.save(os.path.join(index_dir, BM25_DOCS_FILE), np.asarray(self.docs, dtype=np.int32))
+        np.save(os.path.join(index_dir, BM25_TFS_FILE), np.asarray(self.tfs, dtype=np.float32))
+        np.save(os.path.join(index_dir, BM25_DOC_LEN_FILE), np.asarray(self.doc_len, dtype=np.int32))
+        np.save(os.path.join(index_dir, BM25_IDF_FILE), np.asarray(self.idf, dtype=np.float32))
+
+    @classmethod
+    def load(cls, index_dir: str) -> "BM25Index":
+        with open(os.path.join(index_dir, BM25_VOCAB_FILE), "r", encoding="utf-8") as f:
+            vocab_data = json.load(f)
+        with open(os.path.join(index_dir, BM25_IDS_FILE), "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        return cls(
+            vocab=vocab_data["terms"],
+            ids=ids,
+            offsets=np.load(os.path.join(index_dir, BM25_OFFSETS_FILE), mmap_mode="r"),
+            docs=np.load(os.path.join(index_dir, BM25_DOCS_FILE), mmap_mode="r"),
+            tfs=np.load(os.path.join(index_dir, BM25_TFS_FILE), mmap_mode="r"),
+            doc_len=np.load(os.path.join(index_dir, BM25_DOC_LEN_FILE), mmap_mode="r"),
+            idf=np.load(os.path.join(index_dir, BM25_IDF_FILE)),
+            k1=vocab_data.get("k1", 1.5),
+            b=vocab_data.get("b", 0.75)
+        )
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, BM25_VOCAB_FILE))
+
+    def describe(self) -> Dict[str, Any]:
+        return {"documents": self.n_docs, "terms": len(self.vocab), "postings": int(self.offsets[-1])}
+
+
+def load_bm25_index(index_dir: str) -> Optional[BM25Index]:
+    """Load the persisted corpus index, or None when it has not been built"""
+    if not BM25Index.exists(index_dir):
+        return None
+    return BM25Index.load(index_dir)
@@ -0,0 +1,489 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form of a query used in cache keys"""
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
+
+
+def make_key(*parts: Any) -> str:
+    """Stable sha256 key over the given parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU with optional TTL and hit/miss counters."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            stored_at, value = item
+            if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class SQLiteCache:
+    """Persistent bytes cache in a SQLite file, safe to share between worker processes.
+
+    WAL journaling lets readers in other processes proceed while one process writes.
+    Entries beyond `max_entries` are evicted least-recently-used first.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, ttl_seconds: Optional[float] = None,
+                 table: str = "cache") -> None:
+        if not re.fullmatch(r"\w+", table):
+            raise ValueError(f"Invalid cache table name '{table}'")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.table = table
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created = row
+            if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return bytes(value)
+
+    def set(self, key: str, value: bytes) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), now, now)
+            )
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY accessed ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class EmbeddingCache:
+    """Query embeddings keyed by (model, instruction prompt, normalized text).
+
+    A bounded in-memory LRU sits in front of an optional SQLite tier that survives
+    restarts and is shared by worker processes; disk hits are promoted to memory.
+    """
+
+    def __init__(self, model_name: str, prompt: str, max_entries: int = 1024,
+                 persist_path: Optional[str] = None, max_persistent_entries: int = 100_000) -> None:
+        self.model_name = model_name
+        self.prompt = prompt
+        self.memory = LRUCache(max_entries)
+        self.disk = SQLiteCache(persist_path, max_persistent_entries, table="embeddings") if persist_path else None
+
+    def key(self, text: str) -> str:
+        return make_key(self.model_name, self.prompt, normalize_query(text))
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.key(text)
+        vector = self.memory.get(key)
+        if vector is not None:
+            return vector
+        if self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                vector = np.frombuffer(data, dtype=np.float32)
+                self.memory.set(key, vector)
+                return vector
+        return None
+
+    def set(self, text: str, vector: np.ndarray) -> None:
+        key = self.key(text)
+        vector = np.asarray(vector, dtype=np.float32)
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            self.disk.set(key, vector.tobytes())
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        disk = self.disk.stats() if self.disk is not None else None
+        hits = memory["hits"] + (disk["hits"] if disk else 0)
+        requests = memory["hits"] + memory["misses"]
+        return {
+            "hits": hits,
+            "misses": requests - hits,
+            "hit_rate": hits / requests if requests else 0.0,
+            "memory": memory,
+            "persistent": disk
+        }
+
+
+class SemanticCache:
+    """Answers of previously seen questions, matched by cosine similarity of query embeddings.
+
+    Entries live in a preallocated (max_entries, dim) matrix so a lookup is a single
+    matrix-vector product. A hit requires the same `namespace` (request options), an
+    unexpired entry and similarity >= `threshold`; when the least recently used slot
+    is full it is overwritten. All entries are dropped when the index version changes.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: Optional[float] = 86400,
+                 max_entries: int = 1000, version: str = "") -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version = version
+        self._vectors: Optional[np.ndarray] = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._namespaces: List[Optional[str]] = [None] * max_entries
+        self._payloads: List[Any] = [None] * max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def set_version(self, version: str) -> None:
+        """Drop every entry if the index version changed"""
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._valid[:] = False
+                self._payloads = [None] * self.max_entries
+                self.invalidations += 1
+
+    def lookup(self, vector: np.ndarray, namespace: str = "") -> Optional[Tuple[Any, float]]:
+        """(payload, similarity) of the closest cached question, or None"""
+        now = time.time()
+        with self._lock:
+            if self._vectors is None or not self._valid.any():
+                self.misses += 1
+                return None
+            if self.ttl_seconds is not None:
+                self._valid &= (now - self._created) <= self.ttl_seconds
+            candidates = np.flatnonzero(self._valid)
+            candidates = candidates[[self._namespaces[slot] == namespace for slot in candidates.tolist()]]
+            if candidates.size == 0:
+                self.misses += 1
+                return None
+            similarities = self._vectors[candidates] @ np.asarray(vector, dtype=np.float32)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            slot = int(candidates[best])
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._payloads[slot], float(similarities[best])
+
+    def store(self, vector: np.ndarray, payload: Any, namespace: str = "", version: Optional[str] = None) -> None:
+        """Remember a payload; skipped when computed against a `version` the cache has since moved on from"""
+        if self.max_entries <= 0:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            free = np.flatnonzero(~self._valid)
+            slot = int(free[0]) if free.size else int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._namespaces[slot] = namespace
+            self._payloads[slot] = payload
+
+    def clear(self) -> None:
+        with self._lock:
+            self._valid[:] = False
+            self._payloads = [None] * self.max_entries
+
+    def __len__(self) -> int:
+        return int(self._valid.sum())
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "index_version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class RedisCache:
+    """Bytes cache on Redis or any server speaking its protocol (KeyDB, Dragonfly, ...).
+
+    TTLs map to key expiry. The size bound is kept by the client: a sorted set under
+    `<prefix>__lru__` scores every key by its last access, and `set` trims it (and the keys)
+    to the `max_entries` most recently used, so the bound holds whatever the server's
+    maxmemory policy is. The `redis` package (requirements.txt) is imported on first use.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", ttl_seconds: Optional[float] = None,
+                 prefix: str = "legal_rag:", client: Any = None, max_entries: int = 100_000) -> None:
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.lru_key = prefix + "__lru__"
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.client.zadd(self.lru_key, {self.prefix + key: time.time()})
+        self.hits += 1
+        return bytes(value)
+
+    def set(self, key: str, value: bytes) -> None:
+        expiry = max(1, int(self.ttl_seconds)) if self.ttl_seconds is not None else None
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, value, ex=expiry)
+        pipe.zadd(self.lru_key, {self.prefix + key: time.time()})
+        pipe.zcard(self.lru_key)
+        count = pipe.execute()[-1]
+        if count > self.max_entries:
+            # Least recently used first; expired keys are still listed and go first as well
+            stale = self.client.zrange(self.lru_key, 0, count - self.max_entries - 1)
+            if stale:
+                pipe = self.client.pipeline()
+                pipe.delete(*stale)
+                pipe.zrem(self.lru_key, *stale)
+                pipe.execute()
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+        self.client.zrem(self.lru_key, self.prefix + key)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+    def __len__(self) -> int:
+        return int(self.client.zcard(self.lru_key))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "url": self.url,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+def get_cache_backend(backend: str, max_entries: int = 1024, ttl_seconds: Optional[float] = None,
+                      path: Optional[str] = None, url: Optional[str] = None, table: str = "cache") -> Any:
+    """Key-value backend by name: memory | sqlite | redis; 'none' disables caching (returns None)"""
+    backend = backend.strip().lower()
+    if backend in ("", "none", "off"):
+        return None
+    if backend == "memory":
+        return LRUCache(max_entries, ttl_seconds)
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("A file path is required for the 'sqlite' cache backend")
+        return SQLiteCache(path, max_entries, ttl_seconds, table=table)
+    if backend == "redis":
+        return RedisCache(url or "redis://localhost:6379/0", ttl_seconds, prefix=f"legal_rag:{table}:", max_entries=max_entries)
+    raise ValueError(f"Unknown cache backend '{backend}' (expected memory, sqlite, redis or none)")
+
+
+class ResponseCache:
+    """Generated answers keyed by everything the generation depends on.
+
+    The key hashes the normalized query, the ordered chunk ids sent as context, the
+    index version those ids refer to, the system prompt version, the chat model and
+    a digest of the conversation history included in the prompt.
+    """
+
+    def __init__(self, backend: Any) -> None:
+        self.backend = backend
+
+    @staticmethod
+    def key(query: str, chunk_ids: List[str], prompt_version: str, model: str,
+            history_digest: str = "", index_version: str = "") -> str:
+        return make_key(normalize_query(query), "\x1e".join(chunk_ids), prompt_version, model,
+                        history_digest, index_version)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.backend.get(key)
+        if value is None:
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key: str, answer: str) -> None:
+        self.backend.set(key, answer.encode("utf-8"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self.backend).__name__, **self.backend.stats()}
+
+
+class ScoreCache:
+    """Cross-encoder scores keyed by (normalized query hash, chunk id, reranker model).
+
+    Chunk ids are positional, so all scores are dropped when the index version changes.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 20000, version: str = "") -> None:
+        self.model_name = model_name
+        self.version = version
+        self.scores = LRUCache(max_entries)
+        self._lock = threading.Lock()
+
+    def set_version(self, version: str) -> None:
+        """Drop every score if the index version changed"""
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self.scores.clear()
+
+    def _key(self, query_hash: str, chunk_id: str) -> str:
+        return f"{query_hash}:{chunk_id}"
+
+    def query_hash(self, query: str) -> str:
+        return make_key(self.model_name, normalize_query(query))
+
+    def get_many(self, query: str, chunk_ids: List[str]) -> List[Optional[float]]:
+        query_hash = self.query_hash(query)
+        return [self.scores.get(self._key(query_hash, chunk_id)) for chunk_id in chunk_ids]
+
+    def set_many(self, query: str, chunk_ids: List[str], scores: Any, version: Optional[str] = None) -> None:
+        """Remember scores; skipped when they were computed against an older `version`"""
+        if version is not None and version != self.version:
+            return
+        query_hash = self.query_hash(query)
+        for chunk_id, score in zip(chunk_ids, scores):
+            self.scores.set(self._key(query_hash, chunk_id), float(score))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"model": self.model_name, **self.scores.stats()}
@@ -0,0 +1,115 @@
+import os
+import mmap
+import json
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+CHUNK_BLOB_FILE = "chunk_texts.bin"
+CHUNK_OFFSETS_FILE = "chunk_offsets.npy"
+CHUNK_META_FILE = "chunk_meta.json"
+
+# Metadata kept alongside the text; previews are redundant once full text is local
+_SKIPPED_METADATA = ("text", "text_preview", "embedding_model", "has_local_embedding")
+# Metadata that identifies the chunk behind an id in both the store and the vector index
+ALIGNMENT_KEYS = ("filename", "text_length")
+
+
+def _alignment_value(value: Any) -> str:
+    # Pinecone returns numeric metadata as floats
+    return str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+
+
+class ChunkStore:
+    """Full chunk texts keyed by vector id.
+
+    Texts are concatenated UTF-8 in one memory-mapped blob; `offsets[row]:offsets[row + 1]`
+    delimits each chunk, so a lookup is a dict hit plus a slice of the mapping.
+    """
+
+    def __init__(self, index_dir: str) -> None:
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, CHUNK_META_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.ids: List[str] = data["ids"]
+        self.metadatas: List[Dict[str, Any]] = data["metadata"]
+        self.offsets = np.load(os.path.join(index_dir, CHUNK_OFFSETS_FILE), mmap_mode="r")
+        self.id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+        self._file = open(os.path.join(index_dir, CHUNK_BLOB_FILE), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._view = memoryview(self._blob)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.id_to_row
+
+    def get_bytes(self, doc_id: str) -> Optional[memoryview]:
+        """Zero-copy view of the UTF-8 encoded chunk"""
+        row = self.id_to_row.get(doc_id)
+        if row is None:
+            return None
+        return self._view[int(self.offsets[row]):int(self.offsets[row + 1])]
+
+    def get_text(self, doc_id: str) -> Optional[str]:
+        data = self.get_bytes(doc_id)
+        return str(data, "utf-8") if data is not None else None
+
+    def get_metadata(self, doc_id: str) -> Dict[str, Any]:
+        row = self.id_to_row.get(doc_id)
+        return self.metadatas[row] if row is not None else {}
+
+    def sample_ids(self, size: int) -> List[str]:
+        """Up to `size` ids spread evenly over the store"""
+        if size <= 0 or not self.ids:
+            return []
+        rows = np.unique(np.linspace(0, len(self.ids) - 1, num=min(size, len(self.ids))).astype(np.int64))
+        return [self.ids[row] for row in rows.tolist()]
+
+    def mismatched(self, fetched: List[Dict[str, Any]]) -> List[str]:
+        """Ids of fetched vector records (`id`, `metadata`) whose ALIGNMENT_KEYS disagree with the stored chunk,
+        i.e. the vector index maps the id to another chunk (it was built from a different chunk order)"""
+        mismatched = []
+        for item in fetched:
+            stored = self.get_metadata(item["id"])
+            remote = item.get("metadata") or {}
+            for key in ALIGNMENT_KEYS:
+                if key in stored and key in remote and _alignment_value(stored[key]) != _alignment_value(remote[key]):
+                    mismatched.append(item["id"])
+                    break
+        return mismatched
+
+    @staticmethod
+    def build(index_dir: str, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Write the blob, offsets table and metadata for `ids`"""
+        if not (len(ids) == len(texts) == len(metadatas)):
+            raise ValueError("ids, texts and metadatas must have the same length")
+        os.makedirs(index_dir, exist_ok=True)
+
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        with open(os.path.join(index_dir, CHUNK_BLOB_FILE), "wb") as f:
+            for row, text in enumerate(texts):
+                encoded = text.encode("utf-8")
+                f.write(encoded)
+                offsets[row + 1] = offsets[row] + len(encoded)
+        np.save(os.path.join(index_dir, CHUNK_OFFSETS_FILE), offsets)
+
+        compact = [{k: v for k, v in metadata.items() if k not in _SKIPPED_METADATA} for metadata in metadatas]
+        with open(os.path.join(index_dir, CHUNK_META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"ids": list(ids), "metadata": compact}, f, ensure_ascii=False)
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return all(os.path.exists(os.path.join(index_dir, name)) for name in (CHUNK_BLOB_FILE, CHUNK_OFFSETS_FILE, CHUNK_META_FILE))
+
+    def describe(self) -> Dict[str, Any]:
+        return {"chunks": len(self.ids), "bytes": int(self.offsets[-1]) if len(self.offsets) else 0}
+
+
+def load_chunk_store(index_dir: str) -> Optional[ChunkStore]:
+    """Open the local chunk store, or None when it has not been built"""
+    if not ChunkStore.exists(index_dir):
+        return None
+    return ChunkStore(index_dir)
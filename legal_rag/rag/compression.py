@@ -0,0 +1,90 @@
+import re
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Dict, Callable, Tuple
+
+from legal_rag.rag.context_packer import split_sentences
+
+# "Статья 12. Title" / "Article 12" first line of an article chunk
+ARTICLE_HEADER = re.compile(r"^\s*(?:Статья|Article)\s+\d", re.IGNORECASE)
+OMISSION = " … "
+
+
+@dataclass(frozen=True)
+class CompressionConfig:
+    """Extractive compression of retrieved chunks.
+
+    Per chunk, the `top_sentences` sentences most similar to the query are kept if they reach
+    `min_similarity` (the best one is always kept); chunks with fewer than `min_sentences`
+    sentences stay whole.
+    """
+    top_sentences: int = 4
+    min_similarity: float = 0.35
+    min_sentences: int = 4
+
+    def __post_init__(self) -> None:
+        if self.top_sentences < 1:
+            raise ValueError("Expected top_sentences >= 1")
+
+
+def split_header(text: str) -> Tuple[str, str]:
+    """(article header line or "", body)"""
+    first, _, rest = text.partition("\n")
+    if ARTICLE_HEADER.match(first):
+        return first.strip(), rest
+    return "", text
+
+
+def select_sentences(scores: np.ndarray, owners: np.ndarray, config: CompressionConfig) -> np.ndarray:
+    """Boolean keep-mask over sentences; `owners` holds each sentence's chunk number (non-decreasing)"""
+    order = np.lexsort((-scores, owners))  # grouped by chunk, best first within a chunk
+    sorted_owners = owners[order]
+    rank = np.arange(order.size) - np.searchsorted(sorted_owners, sorted_owners, side="left")
+    keep = np.zeros(order.size, dtype=bool)
+    keep[order] = (rank < config.top_sentences) & ((scores[order] >= config.min_similarity) | (rank == 0))
+    return keep
+
+
+def join_kept(header: str, sentences: List[str], keep: np.ndarray) -> str:
+    """Header plus kept sentences in document order, gaps marked with an ellipsis"""
+    parts: List[str] = []
+    previous = -1
+    for i in np.flatnonzero(keep).tolist():
+        if parts:
+            parts.append(" " if i == previous + 1 else OMISSION)
+        parts.append(sentences[i])
+        previous = i
+    body = "".join(parts)
+    return f"{header}\n{body}" if header else body
+
+
+def compress_chunks(query_vector: np.ndarray, texts: List[str], embed: Callable[[List[str]], np.ndarray],
+                    config: CompressionConfig) -> Tuple[List[str], Dict[str, int]]:
+    """Compressed chunk texts and sentence counts.
+
+    `embed` returns unit vectors for a list of sentences; all sentences of all chunks are
+    embedded in one call and scored against the (unit) query vector in one product.
+    """
+    stats = {"chunks": len(texts), "compressed_chunks": 0, "sentences": 0, "kept_sentences": 0}
+    if not texts or not np.any(query_vector):
+        return list(texts), stats
+
+    parts = [split_header(text) for text in texts]
+    sentences = [split_sentences(body) for _, body in parts]
+    candidates = [i for i, chunk in enumerate(sentences) if len(chunk) >= config.min_sentences]
+    flat = [sentence for i in candidates for sentence in sentences[i]]
+    if not flat:
+        return list(texts), stats
+
+    owners = np.repeat(np.arange(len(candidates)), [len(sentences[i]) for i in candidates])
+    scores = np.asarray(embed(flat), dtype=np.float32) @ np.asarray(query_vector, dtype=np.float32)
+    keep = select_sentences(scores, owners, config)
+
+    compressed = list(texts)
+    offset = 0
+    for i in candidates:
+        count = len(sentences[i])
+        compressed[i] = join_kept(parts[i][0], sentences[i], keep[offset:offset + count])
+        offset += count
+    stats.update(compressed_chunks=len(candidates), sentences=len(flat), kept_sentences=int(keep.sum()))
+    return compressed, stats
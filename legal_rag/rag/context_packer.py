@@ -0,0 +1,162 @@
+import re
+import math
+from dataclasses import dataclass, field, replace
+from typing import List, Dict, Any, Callable, Optional, Sequence
+
+from legal_rag.rag.caches import LRUCache, make_key
+
+# Sentence ends (. ! ? ; followed by whitespace) and line breaks between numbered points
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def sentence_ends(text: str) -> List[int]:
+    """Offsets just past each sentence of `text`, in order; the last one is len(text)"""
+    ends = [match.start() for match in SENTENCE_BOUNDARY.finditer(text) if match.start() > 0]
+    if not ends or ends[-1] < len(text.rstrip()):
+        ends.append(len(text.rstrip()))
+    return ends
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+
+def load_tokenizer(model: str) -> Optional[Callable[[str], List[int]]]:
+    """tiktoken encoder of the chat model, or None when tiktoken is unavailable"""
+    try:
+        import tiktoken
+    except ImportError:
+        print("tiktoken is not installed; context size falls back to estimated token counts")
+        return None
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+    return encoding.encode
+
+
+class TokenCounter:
+    """Token counts in the chat model's tokenizer; chunk counts are cached by text digest"""
+
+    # Chat format overhead per message and for the reply primer (OpenAI cookbook)
+    TOKENS_PER_MESSAGE = 3
+    TOKENS_PER_REPLY = 3
+
+    def __init__(self, model: str, max_entries: int = 20000,
+                 encode: Optional[Callable[[str], List[int]]] = None) -> None:
+        self.model = model
+        self.encode = encode if encode is not None else load_tokenizer(model)
+        self.cache = LRUCache(max_entries)
+
+    @property
+    def exact(self) -> bool:
+        return self.encode is not None
+
+    def count(self, text: str) -> int:
+        if self.encode is None:
+            return math.ceil(len(text.split()) * 1.3)
+        return len(self.encode(text))
+
+    def count_cached(self, text: str) -> int:
+        key = make_key(text)
+        tokens = self.cache.get(key)
+        if tokens is None:
+            tokens = self.count(text)
+            self.cache.set(key, tokens)
+        return tokens
+
+    def count_messages(self, messages: Sequence[Dict[str, str]]) -> int:
+        """Prompt tokens of a chat request"""
+        return sum(self.TOKENS_PER_MESSAGE + self.count(message["content"]) for message in messages) + self.TOKENS_PER_REPLY
+
+    def stats(self) -> Dict[str, Any]:
+        return {"model": self.model, "exact": self.exact, **self.cache.stats()}
+
+
+@dataclass(frozen=True)
+class ContextBlock:
+    """One retrieved chunk as it goes into the prompt: header line, then body"""
+    id: str
+    header: str
+    body: str
+    relevance: float
+
+    @property
+    def text(self) -> str:
+        return f"{self.header}\n{self.body}" if self.header else self.body
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int  # exact size of `text`
+    budget: int
+    included: List[str] = field(default_factory=list)  # block ids in prompt order
+    trimmed: Optional[str] = None  # id of the block cut at a sentence boundary
+    dropped: List[str] = field(default_factory=list)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "included": len(self.included),
+            "trimmed": self.trimmed,
+            "dropped": len(self.dropped)
+        }
+
+
+def trim_block(block: ContextBlock, max_tokens: int, counter: TokenCounter) -> Optional[str]:
+    """Header plus the most leading body sentences within `max_tokens`; None if not even one fits"""
+    ends = sentence_ends(block.body)
+    low, high, best = 0, len(ends) - 1, None
+    while low <= high:
+        middle = (low + high) // 2
+        text = replace(block, body=block.body[:ends[middle]]).text
+        if counter.count(text) <= max_tokens:
+            best, low = text, middle + 1
+        else:
+            high = middle - 1
+    return best
+
+
+def pack_context(blocks: Sequence[ContextBlock], budget: int, counter: TokenCounter,
+                 separator: str = "\n\n", min_trim_tokens: int = 32) -> PackedContext:
+    """Pack blocks, given best first, into `budget` tokens.
+
+    Blocks are chosen greedily by relevance per token, except that the top-ranked block is
+    always considered first. The first block that does not fit whole keeps its header and
+    the longest run of leading body sentences that fits, when at least `min_trim_tokens`
+    are left. Chosen blocks keep their rank order in the prompt.
+    """
+    if not blocks:
+        return PackedContext(text="", tokens=0, budget=budget)
+    separator_tokens = counter.count(separator)
+    sizes = [counter.count_cached(block.text) for block in blocks]
+    density = [max(block.relevance, 0.0) / max(size, 1) for block, size in zip(blocks, sizes)]
+    order = [0] + sorted(range(1, len(blocks)), key=lambda i: density[i], reverse=True)
+
+    chosen: Dict[int, str] = {}
+    trimmed: Optional[int] = None
+    remaining = budget
+    for i in order:
+        room = remaining - (separator_tokens if chosen else 0)
+        if sizes[i] <= room:
+            chosen[i] = blocks[i].text
+            remaining = room - sizes[i]
+        elif trimmed is None and room >= min_trim_tokens:
+            text = trim_block(blocks[i], room, counter)
+            if text is not None:
+                chosen[i] = text
+                trimmed = i
+                remaining = room - counter.count(text)
+
+    included = sorted(chosen)
+    text = separator.join(chosen[i] for i in included)
+    return PackedContext(
+        text=text,
+        tokens=counter.count(text),
+        budget=budget,
+        included=[blocks[i].id for i in included],
+        trimmed=blocks[trimmed].id if trimmed is not None else None,
+        dropped=[block.id for i, block in enumerate(blocks) if i not in chosen]
+    )
@@ -0,0 +1,92 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+from legal_rag.rag.article_lookup import detect_code
+
+# SearchFilter field -> chunk metadata key
+FILTER_FIELDS = {"sources": "source", "article_types": "article_type"}
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """Restrict retrieval to chunks whose metadata matches; empty fields do not restrict.
+
+    Values within a field are OR-ed, fields are AND-ed.
+    """
+    sources: Tuple[str, ...] = ()
+    article_types: Tuple[str, ...] = ()
+
+    def is_empty(self) -> bool:
+        return not self.sources and not self.article_types
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        for field, key in FILTER_FIELDS.items():
+            values = getattr(self, field)
+            if values and metadata.get(key) not in values:
+                return False
+        return True
+
+    def to_pinecone(self) -> Dict[str, Any]:
+        """Pinecone metadata filter expression"""
+        return {
+            key: {"$in": list(getattr(self, field))}
+            for field, key in FILTER_FIELDS.items()
+            if getattr(self, field)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Union[str, List[str]]]) -> "SearchFilter":
+        """Accept `source`/`sources` and `article_type`/`article_types`, as strings or lists"""
+        def values(*keys: str) -> Tuple[str, ...]:
+            for key in keys:
+                value = data.get(key)
+                if value:
+                    return (value,) if isinstance(value, str) else tuple(value)
+            return ()
+        return cls(sources=values("sources", "source"), article_types=values("article_types", "article_type"))
+
+
+def detect_search_filter(query: str) -> Optional[SearchFilter]:
+    """Infer the target code from the query text ("ТК РК", "Конституции", ...)"""
+    source = detect_code(query)
+    return SearchFilter(sources=(source,)) if source else None
+
+
+class MetadataBitmaps:
+    """Precomputed per-value row bitmaps over a metadata list, for filter push-down into local indexes."""
+
+    def __init__(self, metadatas: List[Dict[str, Any]]) -> None:
+        self.size = len(metadatas)
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        for key in FILTER_FIELDS.values():
+            column = np.array([str(metadata.get(key, "")) for metadata in metadatas], dtype=object)
+            self.bitmaps[key] = {value: column == value for value in set(column.tolist()) if value}
+        self._masks: Dict[SearchFilter, np.ndarray] = {}
+        self._rows: Dict[SearchFilter, np.ndarray] = {}
+
+    def mask(self, search_filter: SearchFilter) -> np.ndarray:
+        """Boolean row mask for the filter (cached per distinct filter)"""
+        cached = self._masks.get(search_filter)
+        if cached is not None:
+            return cached
+        mask = np.ones(self.size, dtype=bool)
+        for field, key in FILTER_FIELDS.items():
+            values = getattr(search_filter, field)
+            if values:
+                field_mask = np.zeros(self.size, dtype=bool)
+                for value in values:
+                    bitmap = self.bitmaps[key].get(value)
+                    if bitmap is not None:
+                        field_mask |= bitmap
+                mask &= field_mask
+        self._masks[search_filter] = mask
+        return mask
+
+    def rows(self, search_filter: SearchFilter) -> np.ndarray:
+        """Matching row numbers, ascending"""
+        cached = self._rows.get(search_filter)
+        if cached is None:
+            cached = np.flatnonzero(self.mask(search_filter))
+            self._rows[search_filter] = cached
+        return cached
@@ -0,0 +1,98 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+FUSION_METHODS = ("weighted", "rrf")
+
+
+@dataclass(frozen=True)
+class FusionConfig:
+    """How dense and lexical candidate lists are merged.
+
+    `weighted`: dense_weight * dense_score + lexical_weight * minmax(lexical_score);
+    dense cosine scores are already bounded and are used as-is.
+    `rrf`: sum of weight / (rrf_k + rank) over the lists a candidate appears in.
+    """
+    method: str = "weighted"
+    dense_weight: float = 0.75
+    lexical_weight: float = 0.25
+    rrf_k: int = 60
+
+    def __post_init__(self) -> None:
+        if self.method not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method '{self.method}', expected one of {FUSION_METHODS}")
+
+
+def _minmax(scores: np.ndarray) -> np.ndarray:
+    if scores.size == 0:
+        return scores
+    spread = float(scores.max() - scores.min())
+    if spread <= 0:
+        return np.zeros_like(scores)
+    return (scores - scores.min()) / (spread + 1e-8)
+
+
+def _union(id_lists: Sequence[Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Unique ids across lists and, for every input position, its index into the unique ids"""
+    all_ids = np.asarray([doc_id for ids in id_lists for doc_id in ids], dtype=object)
+    if all_ids.size == 0:
+        return np.empty(0, dtype=object), np.empty(0, dtype=np.int64)
+    unique_ids, inverse = np.unique(all_ids, return_inverse=True)
+    return unique_ids, inverse.ravel()
+
+
+def _ranked(unique_ids: np.ndarray, fused: np.ndarray, top_k: Optional[int]) -> Tuple[List[str], np.ndarray]:
+    order = np.argsort(-fused, kind="stable")
+    if top_k is not None:
+        order = order[:top_k]
+    return unique_ids[order].tolist(), fused[order]
+
+
+def reciprocal_rank_fusion(id_lists: Sequence[Sequence[str]], weights: Optional[Sequence[float]] = None,
+                           k: int = 60, top_k: Optional[int] = None) -> Tuple[List[str], np.ndarray]:
+    """Fuse ranked id lists (best first) with weighted reciprocal rank fusion"""
+    weights = weights if weights is not None else [1.0] * len(id_lists)
+    unique_ids, inverse = _union(id_lists)
+    if unique_ids.size == 0:
+        return [], np.empty(0)
+    contributions = np.concatenate([
+        weight / (k + np.arange(1, len(ids) + 1, dtype=np.float64))
+        for ids, weight in zip(id_lists, weights)
+    ])
+    fused = np.bincount(inverse, weights=contributions, minlength=unique_ids.size)
+    return _ranked(unique_ids, fused, top_k)
+
+
+def weighted_score_fusion(id_lists: Sequence[Sequence[str]], score_lists: Sequence[np.ndarray],
+                          weights: Sequence[float], normalize: Sequence[bool],
+                          top_k: Optional[int] = None) -> Tuple[List[str], np.ndarray]:
+    """Fuse scored id lists as a weighted sum; a candidate missing from a list contributes 0 for it"""
+    unique_ids, inverse = _union(id_lists)
+    if unique_ids.size == 0:
+        return [], np.empty(0)
+    contributions = np.concatenate([
+        weight * (_minmax(np.asarray(scores, dtype=np.float64)) if norm else np.asarray(scores, dtype=np.float64))
+        for scores, weight, norm in zip(score_lists, weights, normalize)
+    ])
+    fused = np.bincount(inverse, weights=contributions, minlength=unique_ids.size)
+    return _ranked(unique_ids, fused, top_k)
+
+
+def fuse_candidates(dense_ids: Sequence[str], dense_scores: np.ndarray,
+                    lexical_ids: Sequence[str], lexical_scores: np.ndarray,
+                    config: FusionConfig, top_k: Optional[int] = None) -> Tuple[List[str], np.ndarray]:
+    """Merge the dense and lexical top-k lists according to `config`"""
+    if config.method == "rrf":
+        return reciprocal_rank_fusion(
+            [dense_ids, lexical_ids],
+            weights=[config.dense_weight, config.lexical_weight],
+            k=config.rrf_k,
+            top_k=top_k
+        )
+    return weighted_score_fusion(
+        [dense_ids, lexical_ids],
+        [dense_scores, lexical_scores],
+        weights=[config.dense_weight, config.lexical_weight],
+        normalize=[False, True],
+        top_k=top_k
+    )
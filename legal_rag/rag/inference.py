@@ -0,0 +1,127 @@
+import os
+import json
+import base64
+import urllib.error
+import urllib.request
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Texts / pairs per HTTP request; larger inputs are split
+DEFAULT_REQUEST_BATCH = 256
+
+
+def encode_array(array: np.ndarray) -> Dict[str, Any]:
+    """float32 matrix as base64 plus shape (far smaller and faster than JSON floats)"""
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"data": base64.b64encode(array.tobytes()).decode("ascii"), "shape": list(array.shape), "dtype": "float32"}
+
+
+def decode_array(payload: Dict[str, Any]) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload["data"]), dtype=np.float32).reshape(payload["shape"])
+
+
+class InferenceError(RuntimeError):
+    """The inference service failed or could not be reached"""
+
+
+class InferenceClient:
+    """HTTP client of the inference sidecar (legal_rag.app.inference_server)"""
+
+    def __init__(self, base_url: str, timeout: float = 30.0, request_batch: int = DEFAULT_REQUEST_BATCH) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.request_batch = request_batch
+        self._info: Optional[Dict[str, Any]] = None
+
+    def _call(self, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode("utf-8", "replace")
+            raise InferenceError(f"{path}: HTTP {e.code}: {detail}") from e
+        except (urllib.error.URLError, OSError) as e:
+            raise InferenceError(f"{path}: {e}") from e
+
+    def info(self) -> Dict[str, Any]:
+        """Model names and embedding dimension reported by the service (fetched once)"""
+        if self._info is None:
+            self._info = self._call("/health")
+        return self._info
+
+    def embed(self, texts: Sequence[str], prompt: Optional[str] = None, normalize: bool = True) -> np.ndarray:
+        """Embeddings of `texts` as a float32 matrix"""
+        parts = [
+            decode_array(self._call("/embed", {
+                "texts": list(texts[start:start + self.request_batch]),
+                "prompt": prompt,
+                "normalize": normalize
+            })["embeddings"])
+            for start in range(0, len(texts), self.request_batch)
+        ]
+        if not parts:
+            return np.zeros((0, int(self.info().get("dimension") or 0)), dtype=np.float32)
+        return np.vstack(parts)
+
+    def rerank(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        """Cross-encoder scores of (query, passage) pairs"""
+        scores: List[float] = []
+        for start in range(0, len(pairs), self.request_batch):
+            batch = [[query, passage] for query, passage in pairs[start:start + self.request_batch]]
+            scores.extend(self._call("/rerank", {"pairs": batch})["scores"])
+        return scores
+
+
+class RemoteEmbeddingModel:
+    """SentenceTransformer stand-in backed by the inference service (encode / dimension only)"""
+
+    def __init__(self, client: InferenceClient) -> None:
+        self.client = client
+
+    def encode(self, sentences: Union[str, Sequence[str]], normalize_embeddings: bool = False,
+               prompt: Optional[str] = None, **_: Any) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.client.embed([sentences], prompt, normalize_embeddings)[0]
+        return self.client.embed(list(sentences), prompt, normalize_embeddings)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.client.info()["dimension"])
+
+
+class RemoteCrossEncoder:
+    """CrossEncoder stand-in backed by the inference service (predict only)"""
+
+    def __init__(self, client: InferenceClient) -> None:
+        self.client = client
+
+    def predict(self, sentences: Sequence[Tuple[str, str]], **_: Any) -> np.ndarray:
+        return np.asarray(self.client.rerank(list(sentences)), dtype=np.float32)
+
+
+def get_inference_client() -> Optional[InferenceClient]:
+    """Client for INFERENCE_URL, or None when models should be loaded in-process"""
+    url = os.getenv("INFERENCE_URL")
+    if not url:
+        return None
+    return InferenceClient(url, timeout=float(os.getenv("INFERENCE_TIMEOUT", 30)))
+
+
+def load_embedding_model(model_name: str) -> Any:
+    """bge-m3 in-process, or its remote stand-in when INFERENCE_URL is set"""
+    client = get_inference_client()
+    if client is not None:
+        return RemoteEmbeddingModel(client)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def load_cross_encoder(model_name: str) -> Any:
+    """Reranker in-process, or its remote stand-in when INFERENCE_URL is set"""
+    client = get_inference_client()
+    if client is not None:
+        return RemoteCrossEncoder(client)
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name)
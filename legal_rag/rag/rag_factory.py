@@ -1,17 +1,31 @@
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional
 
 # Baseline RAG
 from .rag_system import EnhancedRAGSystem
+from .sessions import DEFAULT_SESSION, SessionStore
 
 
 class BaseEngineInterface:
     """Minimal interface for RAG engines used by chat apps."""
 
-    def query(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True) -> Dict[str, Any]:
+    # Conversation turns per session id; chat apps read and extend the history through it
+    sessions: SessionStore
+
+    def query(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True, **options: Any) -> Dict[str, Any]:
         raise NotImplementedError
 
-    def clear_conversation_history(self) -> None:
+    def query_batch(self, questions: List[str], use_hybrid_search: bool = True, use_reranking: bool = True, **options: Any) -> List[Dict[str, Any]]:
+        return [self.query(q, use_hybrid_search=use_hybrid_search, use_reranking=use_reranking, **options) for q in questions]
+
+    def query_stream(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True, **options: Any) -> Iterator[Dict[str, Any]]:
+        """Streaming events (sources, token, done); engines without streaming send the whole answer at once"""
+        result = self.query(user_query, use_hybrid_search=use_hybrid_search, use_reranking=use_reranking, **options)
+        yield {"type": "sources", **{key: value for key, value in result.items() if key != "answer"}}
+        yield {"type": "token", "content": result.get("answer", "")}
+        yield {"type": "done", "result": result, "ttft_ms": None, "total_ms": None}
+
+    def clear_conversation_history(self, session_id: Optional[str] = None) -> None:
         raise NotImplementedError
 
     def get_system_stats(self) -> Dict[str, Any]:
@@ -22,11 +36,21 @@ class BaselineEngine(BaseEngineInterface):
     def __init__(self) -> None:
         self._engine = EnhancedRAGSystem()
 
-    def query(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True) -> Dict[str, Any]:
-        return self._engine.query(user_query, use_hybrid_search=use_hybrid_search, use_reranking=use_reranking)
+    @property
+    def sessions(self) -> SessionStore:
+        return self._engine.sessions
+
+    def query(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True, **options: Any) -> Dict[str, Any]:
+        return self._engine.query(user_query, use_hybrid_search=use_hybrid_search, use_reranking=use_reranking, **options)
+
+    def query_batch(self, questions: List[str], use_hybrid_search: bool = True, use_reranking: bool = True, **options: Any) -> List[Dict[str, Any]]:
+        return self._engine.query_batch(questions, use_hybrid_search=use_hybrid_search, use_reranking=use_reranking, **options)
+
+    def query_stream(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True, **options: Any) -> Iterator[Dict[str, Any]]:
+        return self._engine.query_stream(user_query, use_hybrid_search=use_hybrid_search, use_reranking=use_reranking, **options)
 
-    def clear_conversation_history(self) -> None:
-        self._engine.clear_conversation_history()
+    def clear_conversation_history(self, session_id: Optional[str] = None) -> None:
+        self._engine.clear_conversation_history(session_id)
 
     def get_system_stats(self) -> Dict[str, Any]:
         return self._engine.get_system_stats()
@@ -41,19 +65,22 @@ class GraphRAGEngine(BaseEngineInterface):
                 "GraphRAG is not installed. Please add 'graphrag' to requirements and configure it."
             ) from exc
         # TODO: initialize actual GraphRAG pipeline/graph index here
+        self.sessions = SessionStore.from_env()
         self._not_ready_reason = (
             "GraphRAG adapter is a placeholder. Configure GraphRAG project/index paths and initialization."
         )
 
-    def query(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True) -> Dict[str, Any]:
+    def query(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True, **options: Any) -> Dict[str, Any]:
+        answer = f"GraphRAG is not yet configured. {self._not_ready_reason}"
+        self.sessions.append(options.get("session_id") or DEFAULT_SESSION, user_query, answer)
         return {
-            "answer": f"GraphRAG is not yet configured. {self._not_ready_reason}",
+            "answer": answer,
             "sources": [],
             "search_results": [],
         }
 
-    def clear_conversation_history(self) -> None:
-        return None
+    def clear_conversation_history(self, session_id: Optional[str] = None) -> None:
+        self.sessions.clear(session_id or DEFAULT_SESSION)
 
     def get_system_stats(self) -> Dict[str, Any]:
         return {"engine": "graphrag", "configured": False}
@@ -68,19 +95,22 @@ class LightRAGEngine(BaseEngineInterface):
                 "LightRAG is not installed. Please add 'lightrag' to requirements and configure it."
             ) from exc
         # TODO: initialize actual LightRAG components here
+        self.sessions = SessionStore.from_env()
         self._not_ready_reason = (
             "LightRAG adapter is a placeholder. Configure corpus ingestion and retrieval pipeline."
         )
 
-    def query(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True) -> Dict[str, Any]:
+    def query(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True, **options: Any) -> Dict[str, Any]:
+        answer = f"LightRAG is not yet configured. {self._not_ready_reason}"
+        self.sessions.append(options.get("session_id") or DEFAULT_SESSION, user_query, answer)
         return {
-            "answer": f"LightRAG is not yet configured. {self._not_ready_reason}",
+            "answer": answer,
             "sources": [],
             "search_results": [],
         }
 
-    def clear_conversation_history(self) -> None:
-        return None
+    def clear_conversation_history(self, session_id: Optional[str] = None) -> None:
+        self.sessions.clear(session_id or DEFAULT_SESSION)
 
     def get_system_stats(self) -> Dict[str, Any]:
         return {"engine": "lightrag", "configured": False}
@@ -1,17 +1,64 @@
 import os
+import re
 import json
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from typing import List, Dict, Optional, Tuple, Any
-from dataclasses import dataclass
+from typing import List, Dict, Optional, Tuple, Any, Generator, Iterator
+from dataclasses import dataclass, field, replace
 from datetime import datetime
 import openai
 from dotenv import load_dotenv
 from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer, CrossEncoder
 from rank_bm25 import BM25Okapi
 
+from legal_rag.rag.ann_index import DEFAULT_NPROBE
+from legal_rag.rag.article_lookup import ArticleIndex, load_article_index, parse_article_reference
+from legal_rag.rag.batching import MicroBatcher
+from legal_rag.rag.bm25_index import BM25Index, load_bm25_index, tokenize
+from legal_rag.rag.caches import EmbeddingCache, LRUCache, ResponseCache, ScoreCache, SemanticCache, get_cache_backend, make_key
+from legal_rag.rag.chunk_store import ChunkStore, load_chunk_store
+from legal_rag.rag.compression import CompressionConfig, compress_chunks
+from legal_rag.rag.context_packer import ContextBlock, PackedContext, TokenCounter, pack_context
+from legal_rag.rag.filters import MetadataBitmaps, SearchFilter, detect_search_filter
+from legal_rag.rag.inference import load_cross_encoder, load_embedding_model
+from legal_rag.rag.fusion import FusionConfig, fuse_candidates
+from legal_rag.rag.rerank import RerankDepthConfig, adaptive_rerank_depth, cosine_prefilter, mmr_select, stage_trace
+from legal_rag.rag.sessions import DEFAULT_SESSION, ConversationTurn, SessionStore
+from legal_rag.rag.sparse_bm25 import SparseBM25
+from legal_rag.rag.stages import StageExecutor, StageOutcome, timeout_from_ms
+from legal_rag.rag.vector_store import VectorStore, get_index_dir, get_vector_store, index_version
+
 load_dotenv()
 
+SYSTEM_PROMPT = """Ты — эксперт по законодательству Республики Казахстан.
+
+Обязательно отвечай по шаблону:
+
+1. Краткий ответ на вопрос
+2. Обоснование со ссылками на конкретные статьи
+3. Полная цитата релевантных положений из контекста
+
+Формат цитирования:
+(Источник: [название документа], Статья X, часть Y, пункт Z)
+
+Если информации недостаточно — скажи: "В предоставленном контексте прямого регулирования не найдено."
+
+НЕ придумывай нормы, которых нет в контексте."""
+
+# Part of the response cache key: editing the prompt invalidates cached answers
+SYSTEM_PROMPT_VERSION = make_key(SYSTEM_PROMPT)[:12]
+
+# Fallback answers of generate_response; never cached
+EMPTY_RESPONSE_ANSWER = "Извините, не удалось сгенерировать ответ."
+GENERATION_ERROR_ANSWER = "Извините, произошла ошибка при генерации ответа."
+
+NO_RESULTS_ANSWER = "К сожалению, не удалось найти релевантную информацию по вашему запросу."
+QUERY_ERROR_ANSWER = "Произошла ошибка при обработке запроса."
+
 @dataclass
 class SearchResult:
     """Represents a search result with metadata"""
@@ -22,95 +69,407 @@ class SearchResult:
     source: str
 
 @dataclass
-class ConversationTurn:
-    """Represents a conversation turn"""
+class QueryRequest:
+    """State of one query()/aquery()/query_stream() call: the effective options and what the
+    stages produced. Created per call and never shared, so the engine itself stays read-only."""
     user_query: str
-    retrieved_context: List[SearchResult]
-    generated_response: str
-    timestamp: datetime
+    session_id: str
+    index_version: str
+    history: List[ConversationTurn]
+    use_hybrid_search: bool
+    use_reranking: bool
+    fusion: FusionConfig
+    use_article_lookup: bool
+    search_filter: Optional[SearchFilter]
+    use_semantic_cache: bool
+    rerank_cascade_top_n: int
+    adaptive_rerank: bool
+    compress_context: bool
+    mmr_lambda: Optional[float]
+    retrieval: str = ""
+    rerank_trace: List[Dict[str, Any]] = field(default_factory=list)
+    rerank_depth: Optional[Dict[str, Any]] = None
+    compression: Optional[Dict[str, Any]] = None
+    packed: Optional[PackedContext] = None
+    semantic_key: Optional[Tuple[np.ndarray, str]] = None
+    cache_info: Dict[str, Any] = field(default_factory=dict)
 
 class EnhancedRAGSystem:
     def __init__(self):
         # Initialize clients
         self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.pinecone = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+        self.async_openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         
-        index_name = os.getenv("PINECONE_INDEX_NAME")
-        if not index_name:
-            raise ValueError("PINECONE_INDEX_NAME environment variable is required")
-        self.index = self.pinecone.Index(index_name)
+        # Vector backend: Pinecone (default) or in-process memory-mapped index
+        self.vector_backend = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
+        self.index = None
+        if self.vector_backend != "local":
+            self.pinecone = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+            index_name = os.getenv("PINECONE_INDEX_NAME")
+            if not index_name:
+                raise ValueError("PINECONE_INDEX_NAME environment variable is required")
+            self.index = self.pinecone.Index(index_name)
+        self.vector_store: VectorStore = get_vector_store(self.index, self.vector_backend)
         
-        # Initialize models
+        # Initialize models (in-process, or served by the inference sidecar when INFERENCE_URL is set)
         self.embedding_model_name = os.getenv("EMBEDDING_MODEL_NAME") or "BAAI/bge-m3"
         self.embedding_instruction_query = os.getenv("EMBEDDING_QUERY_PROMPT") or "Represent this query for retrieving relevant documents: "
-        self.embedding_model = SentenceTransformer(self.embedding_model_name)
+        self.embedding_model = load_embedding_model(self.embedding_model_name)
         self.embedding_dimension = self.embedding_model.get_sentence_embedding_dimension()
+        # Query embeddings: in-memory LRU plus optional SQLite tier shared by worker processes
+        self.embedding_cache = EmbeddingCache(
+            self.embedding_model_name,
+            self.embedding_instruction_query,
+            max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", 1024)),
+            persist_path=os.getenv("EMBEDDING_CACHE_PATH") or None
+        )
         # Multilingual reranker aligned with bge-m3 embeddings
-        self.cross_encoder = CrossEncoder('BAAI/bge-reranker-v2-m3')
-        self.bm25 = None  # Will be initialized lazily for hybrid search
+        self.reranker_model_name = 'BAAI/bge-reranker-v2-m3'
+        self.cross_encoder = load_cross_encoder(self.reranker_model_name)
+        # (query, chunk id) pairs recur constantly; only uncached pairs go to the cross-encoder
+        self.score_cache = ScoreCache(self.reranker_model_name, max_entries=int(os.getenv("RERANK_CACHE_SIZE", 20000)))
+        # Rerank cascade: bi-encoder cosine keeps the top N candidates for the cross-encoder (0 = off)
+        self.rerank_cascade_top_n = int(os.getenv("RERANK_CASCADE_TOP_N", 0))
+        self.passage_vectors_cache = LRUCache(int(os.getenv("PASSAGE_VECTOR_CACHE_SIZE", 10000)))
+        # Adaptive rerank depth: fewer (or no) cross-encoder pairs when the retrieval winner is clear
+        self.adaptive_rerank = os.getenv("RERANK_ADAPTIVE", "0").strip().lower() in ("1", "true", "yes")
+        self.rerank_depth_config = RerankDepthConfig(
+            min_depth=int(os.getenv("RERANK_MIN_DEPTH", 5)),
+            max_depth=int(os.getenv("RERANK_MAX_DEPTH", 20)),
+            skip_margin=float(os.getenv("RERANK_SKIP_MARGIN", 0.5)),
+            band=float(os.getenv("RERANK_DEPTH_BAND", 0.5))
+        )
+        # MMR diversification of the reranked pool (lambda 1.0 = relevance only); unset = off
+        self.mmr_lambda: Optional[float] = float(os.getenv("MMR_LAMBDA")) if os.getenv("MMR_LAMBDA") else None
+        self.bm25_backend = os.getenv("BM25_BACKEND", "sparse").strip().lower()  # sparse | okapi
+        # Corpus-wide BM25 index built at ingestion time; None falls back to per-query BM25
+        self.bm25_index: Optional[BM25Index] = load_bm25_index(get_index_dir())
+        # Full chunk texts by vector id; when present, vector queries skip metadata entirely
+        self.chunk_store: Optional[ChunkStore] = load_chunk_store(get_index_dir())
+        # (code, article number) -> chunk ids for the exact-article fast path
+        self.article_index: Optional[ArticleIndex] = load_article_index(get_index_dir())
+        if self.article_index is None and self.chunk_store is not None:
+            self.article_index = ArticleIndex.from_metadata(self.chunk_store.ids, self.chunk_store.metadatas)
+        # Local artifacts are keyed by positional chunk ids; a vector index built from another chunk order must not use them
+        if self.chunk_store is not None and not self.chunk_store_matches_vectors(int(os.getenv("CHUNK_STORE_CHECK_SAMPLE", 32))):
+            self.chunk_store = None
+            self.bm25_index = None
+            self.article_index = None
+        # Per-source / article_type bitmaps over BM25 rows for filter push-down into lexical search
+        self.bm25_bitmaps: Optional[MetadataBitmaps] = None
+        if self.bm25_index is not None and self.chunk_store is not None:
+            self.bm25_bitmaps = MetadataBitmaps([self.chunk_store.get_metadata(doc_id) for doc_id in self.bm25_index.ids])
         
-        # Conversation memory
-        self.conversation_history: List[ConversationTurn] = []
-        self.max_history_length = 10
+        # Conversation memory: a bounded ring buffer of turns per session id
+        self.sessions = SessionStore.from_env()
+        self.history_turns_in_prompt = 3
         
         # Search parameters
         self.top_k_initial = 20
         self.top_k_final = 5
+        # Thread pool size for query_batch retrieval and generation
+        self.batch_workers = int(os.getenv("QUERY_BATCH_WORKERS", 4))
         self.rerank_threshold = 0.5
+        # Infer the target code (ГК/ТК/Конституция) from the query and restrict the search to it
+        self.auto_detect_filter = os.getenv("AUTO_DETECT_CODE", "0").strip().lower() in ("1", "true", "yes")
+        
+        # Dense/lexical fusion defaults (overridable per request in query())
+        self.fusion_config = FusionConfig(
+            method=os.getenv("FUSION_METHOD", "weighted").strip().lower(),
+            dense_weight=float(os.getenv("FUSION_DENSE_WEIGHT", 0.75)),
+            lexical_weight=float(os.getenv("FUSION_LEXICAL_WEIGHT", 0.25))
+        )
         
+        # ANN knobs for the local IVF index (ignored by exact/Pinecone backends)
+        self.ann_nprobe = int(os.getenv("ANN_NPROBE", DEFAULT_NPROBE))
+        self.vector_store.configure(nprobe=self.ann_nprobe)
+        
+        # Semantic answer cache: near-duplicate questions reuse a previous answer (opt-in)
+        self.use_semantic_cache = os.getenv("SEMANTIC_CACHE", "0").strip().lower() in ("1", "true", "yes")
+        self.semantic_cache = SemanticCache(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95)),
+            ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL", 86400)),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", 1000))
+        )
+        # Exact response cache: same query, same context chunks, same history -> no OpenAI call
+        response_backend = get_cache_backend(
+            os.getenv("RESPONSE_CACHE", "memory"),
+            max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", 512)),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", 86400)),
+            path=os.getenv("RESPONSE_CACHE_PATH") or "data/cache/responses.sqlite",
+            url=os.getenv("RESPONSE_CACHE_URL"),
+            table="responses"
+        )
+        self.response_cache: Optional[ResponseCache] = ResponseCache(response_backend) if response_backend is not None else None
+        self.chat_model = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+        # Context is packed to an exact token budget in the chat model's tokenizer
+        self.context_max_tokens = int(os.getenv("CONTEXT_MAX_TOKENS", 4000))
+        self.token_counter = TokenCounter(self.chat_model, max_entries=int(os.getenv("TOKEN_COUNT_CACHE_SIZE", 20000)))
+        # Extractive compression: only the sentences closest to the query (plus article headers) reach the prompt
+        self.compress_context = os.getenv("CONTEXT_COMPRESSION", "0").strip().lower() in ("1", "true", "yes")
+        self.compression_config = CompressionConfig(
+            top_sentences=int(os.getenv("COMPRESSION_TOP_SENTENCES", 4)),
+            min_similarity=float(os.getenv("COMPRESSION_MIN_SIMILARITY", 0.35)),
+            min_sentences=int(os.getenv("COMPRESSION_MIN_SENTENCES", 4))
+        )
+        self.sentence_cache = EmbeddingCache(
+            self.embedding_model_name,
+            "",  # passage side: no query instruction
+            max_entries=int(os.getenv("SENTENCE_CACHE_SIZE", 20000)),
+            persist_path=os.getenv("SENTENCE_CACHE_PATH") or None
+        )
+        self.index_version = ""
+        self.remote_index_stats: Optional[Dict[str, Any]] = None
+        self.refresh_index_version()
+        # Re-index detection: queries re-read the version (local files, Pinecone stats) at most this often; 0 = startup only
+        self.index_version_check_seconds = float(os.getenv("INDEX_VERSION_CHECK_SECONDS", 60))
+        self.next_version_check = time.monotonic() + self.index_version_check_seconds
+        self.version_check_lock = threading.Lock()
+        
+        # Worker threads for CPU-bound stages (model inference, BM25) of async queries
+        self.executor = ThreadPoolExecutor(max_workers=int(os.getenv("ASYNC_EXECUTOR_WORKERS", 4)), thread_name_prefix="rag-worker")
+        # Dense and lexical retrieval run concurrently on their own pool, so their timeouts do not include waiting
+        # behind reranking or other model work; a late or failed side is left out of the merge
+        self.stage_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RETRIEVAL_STAGE_WORKERS", 8)), thread_name_prefix="rag-stage")
+        self.retrieval_stages = StageExecutor(self.stage_executor, timeouts={
+            "dense": timeout_from_ms(os.getenv("DENSE_STAGE_TIMEOUT_MS", 5000)),
+            "lexical": timeout_from_ms(os.getenv("LEXICAL_STAGE_TIMEOUT_MS", 2000))
+        })
+        
+        # Micro-batching: concurrent requests share embedding / cross-encoder forward passes (opt-in)
+        self.embedding_batcher: Optional[MicroBatcher] = None
+        self.rerank_batcher: Optional[MicroBatcher] = None
+        if os.getenv("MICRO_BATCHING", "0").strip().lower() in ("1", "true", "yes"):
+            batch_params = dict(
+                max_wait_ms=float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", 5)),
+                max_queue=int(os.getenv("MICRO_BATCH_QUEUE_DEPTH", 256))
+            )
+            self.embedding_batcher = MicroBatcher(self._encode_batch, name="embedding-batcher",
+                                                  max_batch=int(os.getenv("MICRO_BATCH_MAX_SIZE", 32)), **batch_params)
+            # A query sends top_k_initial (20) pairs at once, so rerank batches are sized in pairs, not requests
+            self.rerank_batcher = MicroBatcher(self.cross_encoder.predict, name="rerank-batcher",
+                                               max_batch=int(os.getenv("MICRO_BATCH_RERANK_MAX_SIZE", 128)), **batch_params)
+        
+    def chunk_store_matches_vectors(self, sample_size: int) -> bool:
+        """Whether a sample of chunk store ids names the same chunks (filename, text length) in the vector store.
+        
+        Chunk ids are positions in load_chunks order, so a vector index built from another order pairs
+        hits with the wrong texts. On a mismatch the local store (and the BM25 and article indexes
+        sharing its ids) must not be used. 0 disables the check; a failed fetch keeps the store.
+        """
+        sample = self.chunk_store.sample_ids(sample_size) if self.chunk_store is not None else []
+        if not sample:
+            return True
+        try:
+            fetched = self.vector_store.fetch(sample)
+        except Exception as e:
+            print(f"Error checking the chunk store against the vector index: {e}")
+            return True
+        mismatched = self.chunk_store.mismatched(fetched)
+        if fetched and not mismatched:
+            return True
+        print(
+            f"Warning: the local chunk store in '{get_index_dir()}' does not match the vector index "
+            f"({len(mismatched)} of {len(sample)} sampled ids point to other chunks, {len(sample) - len(fetched)} are missing, "
+            f"e.g. {(mismatched or sample)[:3]}). Ignoring the chunk store, BM25 and article indexes and using "
+            "vector metadata instead; rebuild them from the chunks the vector index was built from, or re-index."
+        )
+        return False
+    
+    def refresh_index_version(self) -> str:
+        """Recompute the corpus version (INDEX_VERSION overrides) from the local artifacts and fresh
+        Pinecone stats; cached answers and rerank scores are dropped when it changes.
+        Queries call it through check_index_version; call it directly to pick up a re-index at once."""
+        if self.vector_backend != "local":
+            try:
+                self.remote_index_stats = {"index": os.getenv("PINECONE_INDEX_NAME"), **self.vector_store.describe()}
+            except Exception as e:
+                print(f"Error getting index stats: {e}")
+                # Keep the last known stats: an unreachable index must not look like a re-indexed one
+                if self.remote_index_stats is None:
+                    self.remote_index_stats = {"index": os.getenv("PINECONE_INDEX_NAME")}
+        version = os.getenv("INDEX_VERSION") or index_version(get_index_dir(), self.remote_index_stats)
+        self.semantic_cache.set_version(version)
+        self.score_cache.set_version(version)
+        self.index_version = version
+        return version
+    
+    def check_index_version(self) -> None:
+        """refresh_index_version() once INDEX_VERSION_CHECK_SECONDS have passed since the last check.
+        A single thread checks; concurrent queries go on with the current version meanwhile."""
+        if self.index_version_check_seconds <= 0 or time.monotonic() < self.next_version_check:
+            return
+        if not self.version_check_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() >= self.next_version_check:
+                self.next_version_check = time.monotonic() + self.index_version_check_seconds
+                self.refresh_index_version()
+        except Exception as e:
+            print(f"Error checking the index version: {e}")
+        finally:
+            self.version_check_lock.release()
+    
+    def semantic_namespace(self, user_query: str, **options: Any) -> str:
+        """Semantic cache partition: request options plus the numbers in the query
+        ("статья 5" and "статья 6" embed almost identically but need different answers)"""
+        return json.dumps({"numbers": re.findall(r"\d+", user_query), **options}, sort_keys=True, default=str)
+    
+    def semantic_lookup(self, request: QueryRequest, query_embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """Cached result or None; the cache status and the key to store the new answer under go to the request"""
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        namespace = self.request_namespace(request)
+        cached = self.semantic_cache.lookup(query_vector, namespace)
+        if cached is not None:
+            (cached_result, cached_results), similarity = cached
+            self.add_conversation_turn(request.user_query, cached_results, cached_result["answer"], request.session_id)
+            request.cache_info["semantic"] = {"status": "hit", "similarity": similarity}
+            return {**cached_result, "cache": {"semantic": request.cache_info["semantic"]}}
+        request.semantic_key = (query_vector, namespace) if np.any(query_vector) else None
+        request.cache_info["semantic"] = {"status": "miss"}
+        return None
+    
+    def run_blocking(self, fn: Any, *args: Any) -> "asyncio.Future[Any]":
+        """Run a blocking call on the worker pool from async code"""
+        return asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+    
+    def run_stage(self, fn: Any, *args: Any) -> "asyncio.Future[Any]":
+        """run_blocking on the retrieval stage pool"""
+        return asyncio.get_running_loop().run_in_executor(self.stage_executor, functools.partial(fn, *args))
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self.embedding_model.encode(
+            [text.replace("\n", " ") for text in texts],
+            normalize_embeddings=True,
+            prompt=self.embedding_instruction_query
+        )
+    
+    def encode_queries(self, texts: List[str]) -> List[np.ndarray]:
+        """Query embeddings, through the micro-batcher when enabled"""
+        if self.embedding_batcher is not None:
+            return self.embedding_batcher.submit(texts)
+        return list(self._encode_batch(texts))
+    
+    def predict_pairs(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """Cross-encoder scores, through the micro-batcher when enabled"""
+        if self.rerank_batcher is not None:
+            return self.rerank_batcher.submit(pairs)
+        return list(self.cross_encoder.predict(pairs))
+    
     def get_embedding(self, text: str) -> List[float]:
         """Get embedding using multilingual bge-m3 (ru/kz strong)"""
+        cached = self.embedding_cache.get(text)
+        if cached is not None:
+            return cached.tolist()
         try:
-            return self.embedding_model.encode(
-                text.replace("\n", " "),
-                normalize_embeddings=True,
-                prompt=self.embedding_instruction_query
-            ).tolist()
+            embedding = self.encode_queries([text])[0]
+            self.embedding_cache.set(text, embedding)
+            return embedding.tolist()
         except Exception as e:
             print(f"Error getting embedding: {e}")
             # Fallback: return zeros with correct dimension
             return [0.0] * self.embedding_dimension
     
-    def dense_search(self, query: str, top_k: int = 20) -> List[SearchResult]:
-        """Perform dense vector search using Pinecone"""
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings for several queries; cache misses are encoded in one batched forward pass"""
+        embeddings: List[Optional[List[float]]] = []
+        for text in texts:
+            cached = self.embedding_cache.get(text)
+            embeddings.append(cached.tolist() if cached is not None else None)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            try:
+                encoded = self.encode_queries([texts[i] for i in missing])
+                for i, embedding in zip(missing, encoded):
+                    self.embedding_cache.set(texts[i], embedding)
+                    embeddings[i] = embedding.tolist()
+            except Exception as e:
+                print(f"Error getting embeddings: {e}")
+                for i in missing:
+                    embeddings[i] = [0.0] * self.embedding_dimension
+        return embeddings  # type: ignore
+    
+    def set_ann_params(self, nprobe: Optional[int] = None) -> None:
+        """Tune the ANN recall/speed trade-off: more probed lists = higher recall, slower queries"""
+        if nprobe is not None:
+            self.ann_nprobe = nprobe
+        self.vector_store.configure(nprobe=self.ann_nprobe)
+    
+    def dense_search(self, query: str, top_k: int = 20, query_embedding: Optional[List[float]] = None,
+                     search_filter: Optional[SearchFilter] = None) -> List[SearchResult]:
+        """Perform dense vector search using the configured vector store"""
         try:
-            query_embedding = self.get_embedding(query)
+            if query_embedding is None:
+                query_embedding = self.get_embedding(query)
             
-            # Try different Pinecone API formats
-            try:
-                results = self.index.query(
-                    vector=query_embedding,
-                    top_k=top_k,
-                    include_metadata=True
-                )  # type: ignore
-            except TypeError:
-                # Fallback for older Pinecone versions
-                results = self.index.query(
-                    queries=[query_embedding],
-                    top_k=top_k,
-                    include_metadata=True
-                )  # type: ignore
-            
-            search_results = []
-            try:
-                matches = results.matches if hasattr(results, 'matches') else results.get('matches', [])  # type: ignore
-                for match in matches:  # type: ignore
-                    search_results.append(SearchResult(
-                        id=match['id'],
-                        text=match['metadata'].get('text', ''),
-                        score=match['score'],
-                        metadata=match['metadata'],
-                        source=match['metadata'].get('filename', 'Unknown')
-                    ))
-            except (AttributeError, KeyError, TypeError):
-                print("Error processing search results")
-                return []
+            matches = self.vector_store.query(
+                query_embedding,
+                top_k=top_k,
+                include_metadata=self.chunk_store is None,
+                search_filter=search_filter
+            )
+            return self.matches_to_results(matches)
+        except Exception as e:
+            print(f"Error in dense search: {e}")
+            return []
+    
+    async def adense_search(self, query: str, top_k: int = 20, query_embedding: Optional[List[float]] = None,
+                            search_filter: Optional[SearchFilter] = None) -> List[SearchResult]:
+        """Async dense_search: embedding on the worker pool, then an async vector store query"""
+        try:
+            if query_embedding is None:
+                query_embedding = await self.run_blocking(self.get_embedding, query)
             
-            return search_results
+            matches = await self.vector_store.aquery(
+                query_embedding,
+                top_k=top_k,
+                include_metadata=self.chunk_store is None,
+                search_filter=search_filter
+            )
+            return self.matches_to_results(matches)
         except Exception as e:
             print(f"Error in dense search: {e}")
             return []
     
+    def matches_to_results(self, matches: List[Dict[str, Any]]) -> List[SearchResult]:
+        search_results = []
+        try:
+            for match in matches:
+                result = self.make_result(match['id'], match['score'], match['metadata'])
+                if result is not None:
+                    search_results.append(result)
+        except (AttributeError, KeyError, TypeError):
+            print("Error processing search results")
+            return []
+        return search_results
+    
+    def make_result(self, doc_id: str, score: float, metadata: Optional[Dict[str, Any]] = None) -> Optional[SearchResult]:
+        """Build a SearchResult, taking full text and metadata from the chunk store when available.
+        
+        Hits the chunk store does not know (it is older than the vector index) fall back to the
+        metadata text or snippet; a hit without any text is dropped (None). Both cases are logged.
+        """
+        metadata = metadata or {}
+        text = None
+        if self.chunk_store is not None:
+            if doc_id in self.chunk_store:
+                text = self.chunk_store.get_text(doc_id)
+                metadata = {**metadata, **self.chunk_store.get_metadata(doc_id)}
+            else:
+                print(f"Warning: chunk '{doc_id}' is missing from the chunk store; rebuild the local index")
+        if text is None:
+            text = metadata.get('text') or metadata.get('text_preview')
+            if not text:
+                print(f"Warning: no text for search hit '{doc_id}'; dropping it")
+                return None
+        return SearchResult(
+            id=doc_id,
+            text=text,
+            score=score,
+            metadata=metadata,
+            source=metadata.get('filename', 'Unknown')
+        )
+    
     def sparse_search(self, query: str, documents: List[str]) -> List[float]:
         """Perform sparse search using simple keyword matching"""
         # Deprecated: retained for compatibility; hybrid_search now uses BM25
@@ -127,223 +486,1016 @@ class EnhancedRAGSystem:
             print(f"Error in sparse search: {e}")
             return [0.0] * len(documents)
     
-    def initialize_bm25(self, documents: List[str]) -> None:
-        """Initialize BM25 on provided documents."""
-        tokenized_docs = [doc.lower().split() for doc in documents]
-        self.bm25 = BM25Okapi(tokenized_docs)
+    def initialize_bm25(self, documents: List[str]) -> Any:
+        """BM25 scorer over the provided documents (SciPy sparse scorer unless BM25_BACKEND=okapi).
+        Documents are tokenized like the corpus-wide BM25Index and, with the sparse scorer, weighted
+        with its IDF; score queries with `tokenize(query)`. The scorer belongs to the caller."""
+        tokenized_docs = [tokenize(doc) for doc in documents]
+        return BM25Okapi(tokenized_docs) if self.bm25_backend == "okapi" else SparseBM25(tokenized_docs, idf="log1p")
     
-    def hybrid_search(self, query: str, top_k: int = 20) -> List[SearchResult]:
-        """Hybrid search combining dense retrieval with BM25 for better lexical recall."""
-        dense_results = self.dense_search(query, top_k * 2)  # fetch more for rerank fusion
+    def lexical_search(self, query: str, top_k: int = 20, search_filter: Optional[SearchFilter] = None) -> Tuple[List[str], np.ndarray]:
+        """Corpus-wide BM25 candidates as (ids, scores), best first"""
+        if self.bm25_index is None:
+            return [], np.empty(0, dtype=np.float32)
+        allowed = None
+        if search_filter is not None and not search_filter.is_empty() and self.bm25_bitmaps is not None:
+            allowed = self.bm25_bitmaps.mask(search_filter)
+        return self.bm25_index.search(query, top_k, allowed=allowed)
+    
+    def fetch_results(self, ids: List[str]) -> List[SearchResult]:
+        """Load candidates that dense search did not return, by id"""
+        try:
+            if self.chunk_store is not None:
+                results = [self.make_result(doc_id, 0.0) for doc_id in ids]
+            else:
+                results = [self.make_result(item['id'], 0.0, item['metadata']) for item in self.vector_store.fetch(ids)]
+            return [result for result in results if result is not None]
+        except Exception as e:
+            print(f"Error fetching lexical candidates: {e}")
+            return []
+    
+    def article_lookup(self, query: str) -> List[SearchResult]:
+        """Answer explicit references like "статья 1 ГК РК" by direct (code, article) lookup"""
+        if self.article_index is None:
+            return []
+        reference = parse_article_reference(query)
+        if reference is None:
+            return []
+        ids = self.article_index.lookup(reference)
+        return [replace(result, score=1.0) for result in self.fetch_results(ids)] if ids else []
+    
+    def resolve_fusion(self, method: Optional[str] = None, weights: Optional[Tuple[float, float]] = None) -> FusionConfig:
+        """Per-request fusion settings on top of the system defaults"""
+        config = self.fusion_config
+        if method:
+            config = replace(config, method=method.strip().lower())
+        if weights:
+            config = replace(config, dense_weight=float(weights[0]), lexical_weight=float(weights[1]))
+        return config
+    
+    def hybrid_search(self, query: str, top_k: int = 20, fusion: Optional[FusionConfig] = None,
+                      search_filter: Optional[SearchFilter] = None,
+                      query_embedding: Optional[List[float]] = None) -> List[SearchResult]:
+        """Hybrid search: independent dense and BM25 top-k lists merged by the fusion stage.
+        
+        Both lists are retrieved concurrently, each within its stage timeout
+        (DENSE_STAGE_TIMEOUT_MS, LEXICAL_STAGE_TIMEOUT_MS).
+        """
+        fusion = fusion or self.fusion_config
+        if self.bm25_index is None:
+            return self.candidate_hybrid_search(query, top_k, fusion, search_filter, query_embedding)
+        
+        outcomes = self.retrieval_stages.run({
+            "dense": lambda: self.dense_search(query, top_k * 2, query_embedding, search_filter),  # fetch more for rerank fusion
+            "lexical": lambda: self.lexical_search(query, top_k * 2, search_filter)
+        })
+        return self.merge_stages(outcomes, fusion, top_k, search_filter)
+    
+    def merge_stages(self, outcomes: Dict[str, StageOutcome], fusion: FusionConfig, top_k: int,
+                     search_filter: Optional[SearchFilter] = None) -> List[SearchResult]:
+        """merge_hybrid over the retrieval stages that delivered; a failed or late stage counts as empty"""
+        for outcome in outcomes.values():
+            if not outcome.ok:
+                print(f"Retrieval stage '{outcome.name}' {outcome.status}: {outcome.error}")
+        dense, lexical = outcomes["dense"], outcomes["lexical"]
+        dense_results = dense.value if dense.ok else []
+        lexical_ids, lexical_scores = lexical.value if lexical.ok else ([], np.empty(0, dtype=np.float32))
+        return self.merge_hybrid(dense_results, lexical_ids, lexical_scores, fusion, top_k, search_filter)
+    
+    def merge_hybrid(self, dense_results: List[SearchResult], lexical_ids: List[str], lexical_scores: np.ndarray,
+                     fusion: FusionConfig, top_k: int, search_filter: Optional[SearchFilter] = None) -> List[SearchResult]:
+        """Fuse dense results with lexical (id, score) candidates into the top_k hybrid list"""
+        fused_ids, fused_scores = fuse_candidates(
+            [r.id for r in dense_results],
+            np.array([r.score for r in dense_results], dtype=np.float64),
+            lexical_ids,
+            lexical_scores,
+            fusion,
+            top_k=top_k
+        )
+        
+        # Lexical hits that dense search missed are hydrated by id
+        by_id = {r.id: r for r in dense_results}
+        missing = [doc_id for doc_id in fused_ids if doc_id not in by_id]
+        if missing:
+            by_id.update({r.id: r for r in self.fetch_results(missing)})
+        
+        results = [
+            replace(by_id[doc_id], score=float(score))
+            for doc_id, score in zip(fused_ids, fused_scores)
+            if doc_id in by_id
+        ]
+        if search_filter is not None and self.bm25_bitmaps is None:
+            # Lexical search could not be filtered in place; drop hits outside the filter
+            results = [r for r in results if search_filter.matches(r.metadata)]
+        return results
+    
+    def candidate_hybrid_search(self, query: str, top_k: int = 20, fusion: Optional[FusionConfig] = None,
+                                search_filter: Optional[SearchFilter] = None,
+                                query_embedding: Optional[List[float]] = None) -> List[SearchResult]:
+        """Hybrid search that rescores dense candidates with BM25 fitted on those candidates only.
+        
+        Used when no corpus-wide BM25 index has been built.
+        """
+        fusion = fusion or self.fusion_config
+        dense_results = self.dense_search(query, top_k * 2, query_embedding, search_filter)  # fetch more for rerank fusion
         if not dense_results:
             return []
         
         texts = [result.text for result in dense_results]
         
-        # Initialize or refresh BM25 to match current candidate set
-        doc_count = len(getattr(self.bm25, "doc_len", [])) if self.bm25 else 0
-        if self.bm25 is None or doc_count != len(texts):
-            self.initialize_bm25(texts)
+        # Fit BM25 on the current candidate set (a per-request scorer)
+        bm25 = self.initialize_bm25(texts)
         
-        bm25_scores = self.bm25.get_scores(query.lower().split()) if self.bm25 else [0.0] * len(texts)
+        bm25_scores = np.asarray(bm25.get_scores(tokenize(query)), dtype=np.float64)
+        lexical_order = np.argsort(-bm25_scores, kind="stable")
         
-        # Normalize BM25 scores to [0,1] to combine with dense scores
-        bm25_min = float(np.min(bm25_scores)) if len(bm25_scores) else 0.0
-        bm25_max = float(np.max(bm25_scores)) if len(bm25_scores) else 0.0
-        bm25_norm = [
-            (s - bm25_min) / (bm25_max - bm25_min + 1e-8) if bm25_max - bm25_min > 0 else 0.0
-            for s in bm25_scores
-        ]
+        fused_ids, fused_scores = fuse_candidates(
+            [r.id for r in dense_results],
+            np.array([r.score for r in dense_results], dtype=np.float64),
+            [dense_results[i].id for i in lexical_order],
+            bm25_scores[lexical_order],
+            fusion,
+            top_k=top_k
+        )
+        
+        by_id = {r.id: r for r in dense_results}
+        return [replace(by_id[doc_id], score=float(score)) for doc_id, score in zip(fused_ids, fused_scores)]
+    
+    def retrieve(self, user_query: str, use_hybrid_search: bool = True, fusion: Optional[FusionConfig] = None,
+                 use_article_lookup: bool = True, search_filter: Optional[SearchFilter] = None,
+                 query_embedding: Optional[List[float]] = None) -> Tuple[List[SearchResult], str]:
+        """Candidates and the retrieval path used: article_lookup | hybrid | dense"""
+        # Exact article references skip dense search and reranking
+        search_results = self.article_lookup(user_query) if use_article_lookup else []
+        if search_results:
+            return search_results, "article_lookup"
+        if use_hybrid_search:
+            return self.hybrid_search(user_query, self.top_k_initial, fusion, search_filter, query_embedding), "hybrid"
+        return self.dense_search(user_query, self.top_k_initial, query_embedding, search_filter), "dense"
+    
+    async def aretrieve(self, user_query: str, use_hybrid_search: bool = True, fusion: Optional[FusionConfig] = None,
+                        use_article_lookup: bool = True, search_filter: Optional[SearchFilter] = None,
+                        query_embedding: Optional[List[float]] = None) -> Tuple[List[SearchResult], str]:
+        """Async retrieve(): dense (embedding + vector query) and lexical search run concurrently, with stage timeouts"""
+        search_results = await self.run_blocking(self.article_lookup, user_query) if use_article_lookup else []
+        if search_results:
+            return search_results, "article_lookup"
+        if not use_hybrid_search:
+            return await self.adense_search(user_query, self.top_k_initial, query_embedding, search_filter), "dense"
         
-        alpha = 0.75  # weight for dense scores; (1-alpha) for lexical
-        for i, result in enumerate(dense_results):
-            lexical = bm25_norm[i] if i < len(bm25_norm) else 0.0
-            result.score = alpha * result.score + (1 - alpha) * lexical
+        fusion = fusion or self.fusion_config
+        if self.bm25_index is None:
+            candidates = await self.run_blocking(
+                self.candidate_hybrid_search, user_query, self.top_k_initial, fusion, search_filter, query_embedding
+            )
+            return candidates, "hybrid"
         
-        dense_results.sort(key=lambda x: x.score, reverse=True)
-        return dense_results[:top_k]
+        outcomes = await self.retrieval_stages.arun({
+            "dense": self.adense_search(user_query, self.top_k_initial * 2, query_embedding, search_filter),
+            "lexical": self.run_stage(self.lexical_search, user_query, self.top_k_initial * 2, search_filter)
+        })
+        return self.merge_stages(outcomes, fusion, self.top_k_initial, search_filter), "hybrid"
+    
+    def passage_vectors(self, ids: List[str]) -> np.ndarray:
+        """Stored passage embeddings for the ids (zero rows when unavailable), cached by id"""
+        vectors = [self.passage_vectors_cache.get(doc_id) for doc_id in ids]
+        missing = [doc_id for doc_id, vector in zip(ids, vectors) if vector is None]
+        if missing:
+            try:
+                for match in self.vector_store.fetch(missing):
+                    self.passage_vectors_cache.set(match["id"], np.asarray(match["values"], dtype=np.float32))
+            except Exception as e:
+                print(f"Error fetching passage vectors: {e}")
+            vectors = [self.passage_vectors_cache.get(doc_id) if vector is None else vector for doc_id, vector in zip(ids, vectors)]
+        matrix = np.zeros((len(ids), self.embedding_dimension), dtype=np.float32)
+        for row, vector in enumerate(vectors):
+            if vector is not None:
+                matrix[row] = vector
+        return matrix
     
-    def rerank_results(self, query: str, results: List[SearchResult]) -> List[SearchResult]:
-        """Re-rank results using cross-encoder"""
+    def rerank_results(self, query: str, results: List[SearchResult], cascade_top_n: Optional[int] = None,
+                       trace: Optional[List[Dict[str, Any]]] = None, limit: Optional[int] = None) -> List[SearchResult]:
+        """Re-rank results using cross-encoder.
+        
+        With `cascade_top_n` (default: RERANK_CASCADE_TOP_N) a bi-encoder cosine stage over the
+        stored passage vectors first prunes the candidates to the best N. Per-stage candidate
+        counts and latency are appended to `trace` when given. At most `limit` (default:
+        top_k_final) results are returned.
+        """
         if not results:
             return results
         
+        cascade_top_n = self.rerank_cascade_top_n if cascade_top_n is None else cascade_top_n
         try:
-            # Prepare pairs for cross-encoder
-            pairs = [(query, result.text) for result in results]
-            
-            # Get cross-encoder scores
-            scores = self.cross_encoder.predict(pairs)
-            
-            # Update scores and sort
-            for i, result in enumerate(results):
-                result.score = scores[i]
+            results = self.cascade_prefilter(query, results, cascade_top_n, trace)
             
-            results.sort(key=lambda x: x.score, reverse=True)
+            started = time.perf_counter()
+            scores = self.cross_encoder_scores([(query, results)])[0]
+            filtered_results = self.apply_rerank_scores(results, scores, limit)
+            if trace is not None:
+                trace.append(stage_trace("cross_encoder", len(results), len(filtered_results), (time.perf_counter() - started) * 1000))
             
-            # Filter by threshold
-            filtered_results = [r for r in results if r.score > self.rerank_threshold]
-            
-            return filtered_results[:self.top_k_final]
+            return filtered_results
         except Exception as e:
             print(f"Error in re-ranking: {e}")
             return results[:self.top_k_final]
     
-    def build_context(self, results: List[SearchResult], max_tokens: int = 4000) -> str:
+    def cascade_prefilter(self, query: str, results: List[SearchResult], cascade_top_n: int,
+                          trace: Optional[List[Dict[str, Any]]] = None) -> List[SearchResult]:
+        """Bi-encoder stage of the rerank cascade: the `cascade_top_n` results closest to the query
+        by stored passage vectors (all results when there are no more than that, or 0 = off)"""
+        if not cascade_top_n or len(results) <= cascade_top_n:
+            return results
+        started = time.perf_counter()
+        query_vector = np.asarray(self.get_embedding(query), dtype=np.float32)
+        keep = cosine_prefilter(query_vector, self.passage_vectors([result.id for result in results]), cascade_top_n)
+        kept = [results[i] for i in keep.tolist()]
+        if trace is not None:
+            trace.append(stage_trace("bi_encoder", len(results), len(kept), (time.perf_counter() - started) * 1000))
+        return kept
+    
+    def cross_encoder_scores(self, requests: List[Tuple[str, List[SearchResult]]]) -> List[List[float]]:
+        """Cross-encoder scores for several (query, candidates) lists in a single predict call.
+        
+        Cached pairs are taken from the score cache; only the remaining pairs are predicted.
+        """
+        version = self.score_cache.version
+        scores = [self.score_cache.get_many(query, [result.id for result in results]) for query, results in requests]
+        missing = [
+            (request_no, i)
+            for request_no, request_scores in enumerate(scores)
+            for i, score in enumerate(request_scores)
+            if score is None
+        ]
+        if missing:
+            pairs = [(requests[request_no][0], requests[request_no][1][i].text) for request_no, i in missing]
+            predicted = self.predict_pairs(pairs)
+            for (request_no, i), score in zip(missing, predicted):
+                query, results = requests[request_no]
+                self.score_cache.set_many(query, [results[i].id], [score], version)
+                scores[request_no][i] = float(score)
+        return scores  # type: ignore
+    
+    def apply_rerank_scores(self, results: List[SearchResult], scores: List[float],
+                            limit: Optional[int] = None) -> List[SearchResult]:
+        """Copies with cross-encoder scores, sorted, keeping the top_k_final (or `limit`) results above the threshold.
+        The input results are left untouched (they may be shared through caches)."""
+        rescored = sorted(
+            (replace(result, score=float(score)) for result, score in zip(results, scores)),
+            key=lambda x: x.score,
+            reverse=True
+        )
+        return [r for r in rescored if r.score > self.rerank_threshold][:self.top_k_final if limit is None else limit]
+    
+    def diversify_results(self, results: List[SearchResult], mmr_lambda: float,
+                          trace: Optional[List[Dict[str, Any]]] = None) -> List[SearchResult]:
+        """MMR selection of top_k_final results from a relevance-ordered pool, over cached passage vectors"""
+        if len(results) <= self.top_k_final:
+            return results
+        started = time.perf_counter()
+        try:
+            keep = mmr_select([r.score for r in results], self.passage_vectors([r.id for r in results]),
+                              self.top_k_final, mmr_lambda)
+        except Exception as e:
+            print(f"Error in MMR selection: {e}")
+            return results[:self.top_k_final]
+        selected = [results[i] for i in keep.tolist()]
+        if trace is not None:
+            trace.append(stage_trace("mmr", len(results), len(selected), (time.perf_counter() - started) * 1000))
+        return selected
+    
+    def sentence_embeddings(self, sentences: List[str]) -> np.ndarray:
+        """Unit passage-side embeddings of sentences; cache misses are encoded in one batch"""
+        vectors: List[Optional[np.ndarray]] = [self.sentence_cache.get(sentence) for sentence in sentences]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.embedding_model.encode([sentences[i] for i in missing], normalize_embeddings=True, batch_size=64)
+            for i, vector in zip(missing, encoded):
+                self.sentence_cache.set(sentences[i], vector)
+                vectors[i] = vector
+        return np.vstack(vectors).astype(np.float32)
+    
+    def compress_results(self, user_query: str, results: List[SearchResult]) -> Tuple[List[SearchResult], Dict[str, Any]]:
+        """Extractive compression of reranked results: copies holding their article header and
+        the sentences closest to the query; returns (results, compression report)"""
+        start = time.perf_counter()
+        try:
+            query_vector = np.asarray(self.get_embedding(user_query), dtype=np.float32)
+            texts, report = compress_chunks(query_vector, [r.text for r in results], self.sentence_embeddings,
+                                            self.compression_config)
+        except Exception as e:
+            print(f"Error in context compression: {e}")
+            return results, {"status": "error"}
+        tokens_before = sum(self.token_counter.count_cached(r.text) for r in results)
+        tokens_after = sum(self.token_counter.count(text) for text in texts)
+        report.update(
+            status="ok",
+            tokens_before=tokens_before,
+            tokens_after=tokens_after,
+            ratio=round(tokens_after / tokens_before, 3) if tokens_before else 1.0,
+            latency_ms=round((time.perf_counter() - start) * 1000, 2)
+        )
+        return [replace(result, text=text) for result, text in zip(results, texts)], report
+    
+    def build_context(self, results: List[SearchResult], max_tokens: Optional[int] = None) -> str:
         """Build context from search results with token limit"""
-        context_parts = []
-        current_tokens = 0
+        return self.pack_results(results, max_tokens).text
+    
+    def pack_results(self, results: List[SearchResult], max_tokens: Optional[int] = None) -> PackedContext:
+        """Pack results into CONTEXT_MAX_TOKENS (or `max_tokens`) tokens of the chat model's tokenizer"""
+        blocks = [ContextBlock(result.id, f"[Source: {result.source}]", result.text, result.score) for result in results]
+        return pack_context(blocks, self.context_max_tokens if max_tokens is None else max_tokens, self.token_counter)
+    
+    def context_report(self, packed: PackedContext, user_query: str,
+                       conversation_history: Optional[List[ConversationTurn]] = None) -> Dict[str, Any]:
+        """Packing summary plus the exact prompt size of the generation request"""
+        report = packed.report()
+        report["prompt_tokens"] = self.token_counter.count_messages(self.build_messages(user_query, packed.text, conversation_history))
+        report["exact"] = self.token_counter.exact
+        return report
+    
+    def build_messages(self, query: str, context: str, conversation_history: Optional[List[ConversationTurn]] = None) -> List[Dict[str, str]]:
+        """Chat messages: system prompt, recent history and the question with its context"""
+        # Build system prompt
+        system_prompt = SYSTEM_PROMPT
         
-        for result in results:
-            # Simple token estimation (rough approximation)
-            result_tokens = len(result.text.split()) * 1.3
-            
-            if current_tokens + result_tokens > max_tokens:
-                break
-            
-            context_parts.append(f"[Source: {result.source}]\n{result.text}")
-            current_tokens += result_tokens
+        # Build conversation context
+        messages: List[Dict[str, str]] = [{"role": "system", "content": system_prompt}]
+        
+        # Add conversation history if provided
+        if conversation_history:
+            for turn in conversation_history[-self.history_turns_in_prompt:]:
+                messages.append({"role": "user", "content": turn.user_query})
+                messages.append({"role": "assistant", "content": turn.generated_response})
         
-        return "\n\n".join(context_parts)
+        # Add current query with context
+        user_message = f"Контекст:\n{context}\n\nВопрос: {query}"
+        messages.append({"role": "user", "content": user_message})
+        return messages
     
     def generate_response(self, query: str, context: str, conversation_history: Optional[List[ConversationTurn]] = None) -> str:
         """Generate response using OpenAI with conversation history"""
         try:
-            # Build system prompt
-            system_prompt = """Ты — эксперт по законодательству Республики Казахстан.
-
-Обязательно отвечай по шаблону:
-
-1. Краткий ответ на вопрос
-2. Обоснование со ссылками на конкретные статьи
-3. Полная цитата релевантных положений из контекста
-
-Формат цитирования:
-(Источник: [название документа], Статья X, часть Y, пункт Z)
-
-Если информации недостаточно — скажи: "В предоставленном контексте прямого регулирования не найдено."
-
-НЕ придумывай нормы, которых нет в контексте."""
-            
-            # Build conversation context
-            messages: List[Dict[str, str]] = [{"role": "system", "content": system_prompt}]
-            
-            # Add conversation history if provided
-            if conversation_history:
-                for turn in conversation_history[-3:]:  # Last 3 turns
-                    messages.append({"role": "user", "content": turn.user_query})
-                    messages.append({"role": "assistant", "content": turn.generated_response})
-            
-            # Add current query with context
-            user_message = f"Контекст:\n{context}\n\nВопрос: {query}"
-            messages.append({"role": "user", "content": user_message})
+            messages = self.build_messages(query, context, conversation_history)
             
             # Generate response
             response = self.openai_client.chat.completions.create(
-                model=os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini"),
+                model=self.chat_model,
                 messages=messages,  # type: ignore
                 temperature=0.3,
                 max_tokens=1000
             )
             
             response_content = response.choices[0].message.content
-            return response_content if response_content else "Извините, не удалось сгенерировать ответ."
+            return response_content if response_content else EMPTY_RESPONSE_ANSWER
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            return GENERATION_ERROR_ANSWER
+    
+    async def agenerate_response(self, query: str, context: str, conversation_history: Optional[List[ConversationTurn]] = None) -> str:
+        """generate_response with the async OpenAI client"""
+        try:
+            response = await self.async_openai_client.chat.completions.create(
+                model=self.chat_model,
+                messages=self.build_messages(query, context, conversation_history),  # type: ignore
+                temperature=0.3,
+                max_tokens=1000
+            )
+            response_content = response.choices[0].message.content
+            return response_content if response_content else EMPTY_RESPONSE_ANSWER
         except Exception as e:
             print(f"Error generating response: {e}")
-            return "Извините, произошла ошибка при генерации ответа."
+            return GENERATION_ERROR_ANSWER
     
-    def query(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True) -> Dict[str, Any]:
-        """Main query method"""
+    def stream_response(self, query: str, context: str, conversation_history: Optional[List[ConversationTurn]] = None
+                        ) -> Generator[str, None, Tuple[str, bool]]:
+        """generate_response as a stream of text pieces; returns (full answer, completed)"""
+        parts: List[str] = []
         try:
+            stream = self.openai_client.chat.completions.create(
+                model=self.chat_model,
+                messages=self.build_messages(query, context, conversation_history),  # type: ignore
+                temperature=0.3,
+                max_tokens=1000,
+                stream=True
+            )
+            for chunk in stream:
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if piece:
+                    parts.append(piece)
+                    yield piece
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            # Pieces already sent stay on screen; the notice is appended after them
+            fallback = f"\n\n{GENERATION_ERROR_ANSWER}" if parts else GENERATION_ERROR_ANSWER
+            yield fallback
+            return "".join(parts) + fallback, False
+        if not parts:
+            yield EMPTY_RESPONSE_ANSWER
+            return EMPTY_RESPONSE_ANSWER, False
+        return "".join(parts), True
+    
+    def query(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True,
+              fusion_method: Optional[str] = None, fusion_weights: Optional[Tuple[float, float]] = None,
+              use_article_lookup: bool = True, search_filter: Optional[SearchFilter] = None,
+              detect_filter: Optional[bool] = None, use_semantic_cache: Optional[bool] = None,
+              rerank_cascade_top_n: Optional[int] = None, adaptive_rerank: Optional[bool] = None,
+              compress_context: Optional[bool] = None, mmr_lambda: Optional[float] = None,
+              session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Main query method.
+        
+        `fusion_method` ("weighted" | "rrf") and `fusion_weights` (dense, lexical) override
+        the hybrid fusion defaults for this request only. Explicit article references
+        ("статья 1 ГК РК") are resolved by direct lookup unless `use_article_lookup` is False.
+        `search_filter` restricts retrieval by source/article_type; with `detect_filter`
+        (default: AUTO_DETECT_CODE) the target code is inferred from the query text.
+        With `use_semantic_cache` (default: SEMANTIC_CACHE) a near-duplicate of an already
+        answered question returns the cached answer without retrieval or generation.
+        `rerank_cascade_top_n` overrides RERANK_CASCADE_TOP_N; the per-stage rerank trace is
+        returned under "rerank". With `adaptive_rerank` (default: RERANK_ADAPTIVE) the number of
+        reranked candidates follows the retrieval score margins; the chosen depth is returned
+        under "rerank_depth". With `compress_context` (default: CONTEXT_COMPRESSION) only the
+        sentences of each chunk closest to the query are kept; see "compression" in the result.
+        `mmr_lambda` (default: MMR_LAMBDA, unset = off) picks the final top_k_final reranked
+        results by maximal marginal relevance; lower values favour diverse content.
+        `session_id` selects the conversation whose history is used and extended
+        (default: a single shared "default" session).
+        
+        Safe to call from many threads at once: per-call state lives in a QueryRequest,
+        models, indexes and settings are only read, caches and sessions are locked.
+        """
+        try:
+            request = self.new_request(user_query, use_hybrid_search, use_reranking, fusion_method, fusion_weights,
+                                       use_article_lookup, search_filter, detect_filter, use_semantic_cache,
+                                       rerank_cascade_top_n, adaptive_rerank, compress_context, mmr_lambda, session_id)
+            
+            if request.use_semantic_cache:
+                cached = self.semantic_lookup(request, self.get_embedding(user_query))
+                if cached is not None:
+                    return cached
+            
             # Perform search
-            if use_hybrid_search:
-                search_results = self.hybrid_search(user_query, self.top_k_initial)
-            else:
-                search_results = self.dense_search(user_query, self.top_k_initial)
+            search_results = self.retrieve_stage(request)
             
             if not search_results:
-                return {
-                    "answer": "К сожалению, не удалось найти релевантную информацию по вашему запросу.",
-                    "sources": [],
-                    "search_results": []
-                }
+                return self.empty_query_result(NO_RESULTS_ANSWER)
             
             # Re-rank if enabled
-            if use_reranking:
-                search_results = self.rerank_results(user_query, search_results)
+            search_results = self.rerank_stage(request, search_results)
+            
+            if request.compress_context:
+                search_results, request.compression = self.compress_results(user_query, search_results)
             
             # Build context
-            context = self.build_context(search_results)
+            request.packed = self.pack_results(search_results)
+            context = request.packed.text
             
-            # Generate response
-            response = self.generate_response(user_query, context, self.conversation_history)
-            
-            # Update conversation history
-            conversation_turn = ConversationTurn(
-                user_query=user_query,
-                retrieved_context=search_results,
-                generated_response=response,
-                timestamp=datetime.now()
+            # Generate response (or reuse the answer for an identical query, context and history)
+            response, request.cache_info["response"] = self.cached_generate_response(
+                user_query, search_results, context, request.history
             )
             
-            self.conversation_history.append(conversation_turn)
+            return self.finish_query(request, response, search_results, context)
             
-            # Keep history within limit
-            if len(self.conversation_history) > self.max_history_length:
-                self.conversation_history = self.conversation_history[-self.max_history_length:]
+        except Exception as e:
+            print(f"Error in query: {e}")
+            return self.empty_query_result(QUERY_ERROR_ANSWER)
+    
+    async def aquery(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True,
+                     fusion_method: Optional[str] = None, fusion_weights: Optional[Tuple[float, float]] = None,
+                     use_article_lookup: bool = True, search_filter: Optional[SearchFilter] = None,
+                     detect_filter: Optional[bool] = None, use_semantic_cache: Optional[bool] = None,
+                     rerank_cascade_top_n: Optional[int] = None, adaptive_rerank: Optional[bool] = None,
+                     compress_context: Optional[bool] = None, mmr_lambda: Optional[float] = None,
+                     session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Async query(): same options, stages and result dict, without blocking the event loop.
+        
+        Model inference, index lookups and cache backends run on the worker pool
+        (ASYNC_EXECUTOR_WORKERS), dense and lexical retrieval run concurrently (BM25 on the
+        RETRIEVAL_STAGE_WORKERS pool) and the answer is generated with the async OpenAI client.
+        """
+        try:
+            request = self.new_request(user_query, use_hybrid_search, use_reranking, fusion_method, fusion_weights,
+                                       use_article_lookup, search_filter, detect_filter, use_semantic_cache,
+                                       rerank_cascade_top_n, adaptive_rerank, compress_context, mmr_lambda, session_id)
             
-            return {
-                "answer": response,
-                "sources": [result.source for result in search_results],
-                "search_results": [
-                    {
-                        "id": result.id,
-                        "text": result.text[:200] + "..." if len(result.text) > 200 else result.text,
-                        "score": result.score,
-                        "source": result.source
-                    }
-                    for result in search_results
-                ],
-                "context_length": len(context),
-                "results_count": len(search_results)
-            }
+            query_embedding: Optional[List[float]] = None
+            if request.use_semantic_cache:
+                query_embedding = await self.run_blocking(self.get_embedding, user_query)
+                cached = await self.run_blocking(self.semantic_lookup, request, query_embedding)
+                if cached is not None:
+                    return cached
+            
+            search_results, request.retrieval = await self.aretrieve(
+                user_query,
+                request.use_hybrid_search,
+                request.fusion,
+                request.use_article_lookup,
+                request.search_filter,
+                query_embedding
+            )
+            
+            if not search_results:
+                return self.empty_query_result(NO_RESULTS_ANSWER)
+            
+            search_results = await self.run_blocking(self.rerank_stage, request, search_results)
+            
+            if request.compress_context:
+                search_results, request.compression = await self.run_blocking(self.compress_results, user_query, search_results)
+            
+            request.packed = self.pack_results(search_results)
+            context = request.packed.text
+            
+            response, request.cache_info["response"] = await self.acached_generate_response(
+                user_query, search_results, context, request.history
+            )
+            
+            return self.finish_query(request, response, search_results, context)
             
         except Exception as e:
             print(f"Error in query: {e}")
-            return {
-                "answer": "Произошла ошибка при обработке запроса.",
-                "sources": [],
-                "search_results": []
-            }
+            return self.empty_query_result(QUERY_ERROR_ANSWER)
+    
+    def query_stream(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True,
+                     fusion_method: Optional[str] = None, fusion_weights: Optional[Tuple[float, float]] = None,
+                     use_article_lookup: bool = True, search_filter: Optional[SearchFilter] = None,
+                     detect_filter: Optional[bool] = None, use_semantic_cache: Optional[bool] = None,
+                     rerank_cascade_top_n: Optional[int] = None, adaptive_rerank: Optional[bool] = None,
+                     compress_context: Optional[bool] = None, mmr_lambda: Optional[float] = None,
+                     session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Streaming query(): same options, yields events while the answer is produced.
+        
+        {"type": "sources", ...} comes as soon as retrieval and reranking are done (the result
+        dict of query() without "answer"), then {"type": "token", "content": ...} pieces from the
+        chat model and finally {"type": "done", "result": <query() result>, "ttft_ms", "total_ms"}.
+        Cached answers and fallbacks arrive as a single token.
+        """
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        try:
+            request = self.new_request(user_query, use_hybrid_search, use_reranking, fusion_method, fusion_weights,
+                                       use_article_lookup, search_filter, detect_filter, use_semantic_cache,
+                                       rerank_cascade_top_n, adaptive_rerank, compress_context, mmr_lambda, session_id)
+            
+            if request.use_semantic_cache:
+                cached = self.semantic_lookup(request, self.get_embedding(user_query))
+                if cached is not None:
+                    yield from self.answer_events(cached, start)
+                    return
+            
+            search_results = self.retrieve_stage(request)
+            
+            if not search_results:
+                yield from self.answer_events(self.empty_query_result(NO_RESULTS_ANSWER), start)
+                return
+            
+            search_results = self.rerank_stage(request, search_results)
+            if request.compress_context:
+                search_results, request.compression = self.compress_results(user_query, search_results)
+            request.packed = self.pack_results(search_results)
+            context = request.packed.text
+            yield self.sources_event(self.build_query_result("", search_results, context, request.retrieval, request.search_filter))
+            
+            pieces = self.cached_stream_response(user_query, search_results, context, request.history)
+            response, request.cache_info["response"] = yield from self.token_events(pieces, start, timings)
+            
+            yield self.done_event(self.finish_query(request, response, search_results, context), start, timings)
+            
+        except Exception as e:
+            print(f"Error in query: {e}")
+            yield from self.answer_events(self.empty_query_result(QUERY_ERROR_ANSWER), start)
+    
+    @staticmethod
+    def sources_event(query_result: Dict[str, Any]) -> Dict[str, Any]:
+        """First query_stream event: everything but the answer"""
+        event = {key: value for key, value in query_result.items() if key != "answer"}
+        event["type"] = "sources"
+        return event
+    
+    @staticmethod
+    def token_events(pieces: Iterator[str], start: float, timings: Dict[str, float]) -> Generator[Dict[str, Any], None, Any]:
+        """Wrap text pieces as token events; returns the wrapped generator's return value"""
+        while True:
+            try:
+                piece = next(pieces)
+            except StopIteration as stop:
+                return stop.value
+            if "ttft_ms" not in timings:
+                timings["ttft_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            yield {"type": "token", "content": piece}
+    
+    @staticmethod
+    def done_event(query_result: Dict[str, Any], start: float, timings: Dict[str, float]) -> Dict[str, Any]:
+        return {
+            "type": "done",
+            "result": query_result,
+            "ttft_ms": timings.get("ttft_ms"),
+            "total_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+    
+    def answer_events(self, query_result: Dict[str, Any], start: float) -> Iterator[Dict[str, Any]]:
+        """query_stream events for an answer that is already complete"""
+        timings: Dict[str, float] = {}
+        yield self.sources_event(query_result)
+        yield from self.token_events(iter([query_result["answer"]]), start, timings)
+        yield self.done_event(query_result, start, timings)
+    
+    def resolve_filter(self, user_query: str, search_filter: Optional[SearchFilter] = None,
+                       detect_filter: Optional[bool] = None) -> Optional[SearchFilter]:
+        """Explicit filter, or the code detected from the query when detection is on"""
+        if search_filter is None and (self.auto_detect_filter if detect_filter is None else detect_filter):
+            return detect_search_filter(user_query)
+        return search_filter
+    
+    def new_request(self, user_query: str, use_hybrid_search: bool = True, use_reranking: bool = True,
+                    fusion_method: Optional[str] = None, fusion_weights: Optional[Tuple[float, float]] = None,
+                    use_article_lookup: bool = True, search_filter: Optional[SearchFilter] = None,
+                    detect_filter: Optional[bool] = None, use_semantic_cache: Optional[bool] = None,
+                    rerank_cascade_top_n: Optional[int] = None, adaptive_rerank: Optional[bool] = None,
+                    compress_context: Optional[bool] = None, mmr_lambda: Optional[float] = None,
+                    session_id: Optional[str] = None, history: Optional[List[ConversationTurn]] = None) -> QueryRequest:
+        """Per-call state with the system defaults filled in and a snapshot of the session history
+        (or the given `history`, in which case the session store is not read)"""
+        self.check_index_version()
+        session_id = session_id or DEFAULT_SESSION
+        return QueryRequest(
+            user_query=user_query,
+            session_id=session_id,
+            index_version=self.index_version,
+            history=self.sessions.history(session_id) if history is None else history,
+            use_hybrid_search=use_hybrid_search,
+            use_reranking=use_reranking,
+            fusion=self.resolve_fusion(fusion_method, fusion_weights),
+            use_article_lookup=use_article_lookup,
+            search_filter=self.resolve_filter(user_query, search_filter, detect_filter),
+            use_semantic_cache=self.use_semantic_cache if use_semantic_cache is None else use_semantic_cache,
+            rerank_cascade_top_n=self.rerank_cascade_top_n if rerank_cascade_top_n is None else rerank_cascade_top_n,
+            adaptive_rerank=self.adaptive_rerank if adaptive_rerank is None else adaptive_rerank,
+            compress_context=self.compress_context if compress_context is None else compress_context,
+            mmr_lambda=self.mmr_lambda if mmr_lambda is None else mmr_lambda
+        )
+    
+    def request_namespace(self, request: QueryRequest) -> str:
+        """Semantic cache namespace for the effective request options and the history in the prompt
+        (a follow-up question is only answered from the cache within the same conversation)"""
+        return self.semantic_namespace(
+            request.user_query,
+            history=self.history_digest(request.history),
+            hybrid=request.use_hybrid_search,
+            reranking=request.use_reranking,
+            cascade=request.rerank_cascade_top_n,
+            adaptive=request.adaptive_rerank,
+            fusion=request.fusion,
+            article_lookup=request.use_article_lookup,
+            filter=request.search_filter.to_pinecone() if request.search_filter is not None else None,
+            compress=request.compress_context,
+            mmr=request.mmr_lambda
+        )
+    
+    def retrieve_stage(self, request: QueryRequest) -> List[SearchResult]:
+        """Retrieval step of query(); records the retrieval path on the request"""
+        search_results, request.retrieval = self.retrieve(
+            request.user_query,
+            request.use_hybrid_search,
+            request.fusion,
+            request.use_article_lookup,
+            request.search_filter
+        )
+        return search_results
+    
+    def rerank_stage(self, request: QueryRequest, search_results: List[SearchResult]) -> List[SearchResult]:
+        """Reranking step of query(); the per-stage trace and adaptive depth info go to the request"""
+        if not self.reranks(request):
+            return search_results
+        
+        ordered, candidates = self.rerank_candidates(request, search_results)
+        if not candidates:
+            return self.select_results(request, ordered)
+        started = time.perf_counter()
+        try:
+            scores = self.cross_encoder_scores([(request.user_query, candidates)])[0]
+        except Exception as e:
+            print(f"Error in re-ranking: {e}")
+            return self.select_results(request, candidates[:self.top_k_final])
+        return self.rescore_stage(request, candidates, scores, started)
+    
+    @staticmethod
+    def reranks(request: QueryRequest) -> bool:
+        """Whether rerank_stage touches the results (exact article hits are kept as they are)"""
+        return request.use_reranking and request.retrieval != "article_lookup"
+    
+    def rerank_candidates(self, request: QueryRequest,
+                          search_results: List[SearchResult]) -> Tuple[List[SearchResult], List[SearchResult]]:
+        """Adaptive depth and bi-encoder cascade of rerank_stage: (results in retrieval order,
+        candidates for the cross-encoder); no candidates when the cross-encoder is skipped"""
+        depth = len(search_results)
+        if request.adaptive_rerank:
+            depth, margin = adaptive_rerank_depth([result.score for result in search_results], self.rerank_depth_config)
+            request.rerank_depth = {"candidates": len(search_results), "depth": depth, "margin": round(margin, 4)}
+        ordered = sorted(search_results, key=lambda r: r.score, reverse=True)
+        if depth == 0:
+            # Obvious winner: keep the retrieval order, no cross-encoder call
+            return ordered, []
+        try:
+            return ordered, self.cascade_prefilter(request.user_query, ordered[:depth], request.rerank_cascade_top_n,
+                                                   request.rerank_trace)
+        except Exception as e:
+            print(f"Error in re-ranking: {e}")
+            return ordered[:self.top_k_final], []
+    
+    def rescore_stage(self, request: QueryRequest, candidates: List[SearchResult], scores: List[float],
+                      started: float) -> List[SearchResult]:
+        """Cross-encoder scores (computed since `started`) applied to the candidates, then the final selection"""
+        # With MMR the whole reranked pool is kept for the diversification step
+        pool = self.apply_rerank_scores(candidates, scores, None if request.mmr_lambda is None else len(candidates))
+        request.rerank_trace.append(stage_trace("cross_encoder", len(candidates), len(pool), (time.perf_counter() - started) * 1000))
+        return self.select_results(request, pool)
+    
+    def select_results(self, request: QueryRequest, pool: List[SearchResult]) -> List[SearchResult]:
+        """The top_k_final results of a relevance-ordered pool, by MMR when the request enables it"""
+        if request.mmr_lambda is None:
+            return pool[:self.top_k_final]
+        return self.diversify_results(pool, request.mmr_lambda, request.rerank_trace)
+    
+    def finish_query(self, request: QueryRequest, response: str, search_results: List[SearchResult],
+                     context: str) -> Dict[str, Any]:
+        """Record the turn, build the result dict and remember it in the semantic cache"""
+        query_result = self.request_result(request, response, search_results, context)
+        
+        # Update conversation history
+        self.add_conversation_turn(request.user_query, search_results, response, request.session_id)
+        
+        if request.semantic_key is not None and response not in (EMPTY_RESPONSE_ANSWER, GENERATION_ERROR_ANSWER):
+            self.semantic_cache.store(request.semantic_key[0], (dict(query_result), search_results), request.semantic_key[1],
+                                      request.index_version)
+        query_result["cache"] = request.cache_info
+        return query_result
+    
+    def request_result(self, request: QueryRequest, response: str, search_results: List[SearchResult],
+                       context: str) -> Dict[str, Any]:
+        """Result dict with the context, rerank and compression reports of the request"""
+        query_result = self.build_query_result(response, search_results, context, request.retrieval, request.search_filter)
+        if request.packed is not None:
+            query_result["context"] = self.context_report(request.packed, request.user_query, request.history)
+        query_result["rerank"] = request.rerank_trace
+        query_result["rerank_depth"] = request.rerank_depth
+        query_result["compression"] = request.compression
+        return query_result
+    
+    def query_batch(self, questions: List[str], use_hybrid_search: bool = True, use_reranking: bool = True,
+                    fusion_method: Optional[str] = None, fusion_weights: Optional[Tuple[float, float]] = None,
+                    use_article_lookup: bool = True, search_filter: Optional[SearchFilter] = None,
+                    detect_filter: Optional[bool] = None, rerank_cascade_top_n: Optional[int] = None,
+                    adaptive_rerank: Optional[bool] = None, compress_context: Optional[bool] = None,
+                    mmr_lambda: Optional[float] = None, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Answer many independent questions; one result dict per question, in input order.
+        
+        Each question goes through the stages of query() with the same options (cascade,
+        adaptive depth, MMR, compression), but queries are embedded in one batched forward
+        pass, retrieval runs concurrently, the surviving (question, candidate) pairs of all
+        questions are scored in a single cross-encoder call and compression and generation
+        run on a pool of at most `max_workers` (default: QUERY_BATCH_WORKERS).
+        Questions are standalone: conversation history is neither used nor updated.
+        """
+        if not questions:
+            return []
+        workers = max(1, max_workers or self.batch_workers)
+        try:
+            requests = [
+                self.new_request(question, use_hybrid_search, use_reranking, fusion_method, fusion_weights,
+                                 use_article_lookup, search_filter, detect_filter, False, rerank_cascade_top_n,
+                                 adaptive_rerank, compress_context, mmr_lambda, history=[])
+                for question in questions
+            ]
+            embeddings = self.get_embeddings(questions)
+            
+            def retrieve(i: int) -> List[SearchResult]:
+                request = requests[i]
+                search_results, request.retrieval = self.retrieve(
+                    request.user_query, request.use_hybrid_search, request.fusion, request.use_article_lookup,
+                    request.search_filter, embeddings[i]
+                )
+                return search_results
+            
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                final_results = list(pool.map(retrieve, range(len(questions))))
+            
+            # Depth and cascade per question, then one cross-encoder call for every remaining candidate
+            candidates: Dict[int, List[SearchResult]] = {}
+            for i, request in enumerate(requests):
+                if final_results[i] and self.reranks(request):
+                    ordered, candidates[i] = self.rerank_candidates(request, final_results[i])
+                    if not candidates[i]:
+                        final_results[i] = self.select_results(request, ordered)
+            to_score = [i for i, question_candidates in candidates.items() if question_candidates]
+            started = time.perf_counter()
+            try:
+                scores = self.cross_encoder_scores([(questions[i], candidates[i]) for i in to_score])
+            except Exception as e:
+                print(f"Error in re-ranking: {e}")
+                scores = None
+            for n, i in enumerate(to_score):
+                if scores is None:
+                    final_results[i] = self.select_results(requests[i], candidates[i][:self.top_k_final])
+                else:
+                    final_results[i] = self.rescore_stage(requests[i], candidates[i], scores[n], started)
+        except Exception as e:
+            print(f"Error in batch query: {e}")
+            return [self.empty_query_result(QUERY_ERROR_ANSWER) for _ in questions]
+        
+        def answer(i: int) -> Dict[str, Any]:
+            try:
+                request, search_results = requests[i], final_results[i]
+                if not search_results:
+                    return self.empty_query_result(NO_RESULTS_ANSWER)
+                if request.compress_context:
+                    search_results, request.compression = self.compress_results(request.user_query, search_results)
+                request.packed = self.pack_results(search_results)
+                context = request.packed.text
+                response, request.cache_info["response"] = self.cached_generate_response(
+                    request.user_query, search_results, context, request.history
+                )
+                query_result = self.request_result(request, response, search_results, context)
+                query_result["cache"] = request.cache_info
+                return query_result
+            except Exception as e:
+                print(f"Error in batch query: {e}")
+                return self.empty_query_result(QUERY_ERROR_ANSWER)
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(answer, range(len(questions))))
+    
+    def build_query_result(self, response: str, search_results: List[SearchResult], context: str,
+                           retrieval: str, search_filter: Optional[SearchFilter]) -> Dict[str, Any]:
+        """Result dict returned by query() and query_batch()"""
+        return {
+            "answer": response,
+            "sources": [result.source for result in search_results],
+            "search_results": [
+                {
+                    "id": result.id,
+                    "text": result.text[:200] + "..." if len(result.text) > 200 else result.text,
+                    "score": result.score,
+                    "source": result.source
+                }
+                for result in search_results
+            ],
+            "context_length": len(context),
+            "results_count": len(search_results),
+            "retrieval": retrieval,
+            "filter": search_filter.to_pinecone() if search_filter is not None else None
+        }
+    
+    @staticmethod
+    def empty_query_result(answer: str) -> Dict[str, Any]:
+        return {
+            "answer": answer,
+            "sources": [],
+            "search_results": []
+        }
+    
+    def history_digest(self, conversation_history: List[ConversationTurn]) -> str:
+        """Digest of the turns generate_response puts into the prompt"""
+        turns = conversation_history[-self.history_turns_in_prompt:] if conversation_history else []
+        return make_key(*(f"{turn.user_query}\x1e{turn.generated_response}" for turn in turns))
+    
+    def cached_generate_response(self, user_query: str, search_results: List[SearchResult], context: str,
+                                 conversation_history: List[ConversationTurn]) -> Tuple[str, Dict[str, Any]]:
+        """generate_response behind the exact response cache; returns (answer, cache status)"""
+        if self.response_cache is None:
+            return self.generate_response(user_query, context, conversation_history), {"status": "disabled"}
+        key = self.response_cache_key(user_query, search_results, conversation_history)
+        cached = self.read_response_cache(key)
+        if cached is not None:
+            return cached, {"status": "hit"}
+        response = self.generate_response(user_query, context, conversation_history)
+        self.write_response_cache(key, response)
+        return response, {"status": "miss"}
+    
+    async def acached_generate_response(self, user_query: str, search_results: List[SearchResult], context: str,
+                                        conversation_history: List[ConversationTurn]) -> Tuple[str, Dict[str, Any]]:
+        """Async cached_generate_response; cache backends (SQLite/Redis) are used from the worker pool"""
+        if self.response_cache is None:
+            return await self.agenerate_response(user_query, context, conversation_history), {"status": "disabled"}
+        key = self.response_cache_key(user_query, search_results, conversation_history)
+        cached = await self.run_blocking(self.read_response_cache, key)
+        if cached is not None:
+            return cached, {"status": "hit"}
+        response = await self.agenerate_response(user_query, context, conversation_history)
+        await self.run_blocking(self.write_response_cache, key, response)
+        return response, {"status": "miss"}
+    
+    def cached_stream_response(self, user_query: str, search_results: List[SearchResult], context: str,
+                               conversation_history: List[ConversationTurn]) -> Generator[str, None, Tuple[str, Dict[str, Any]]]:
+        """stream_response behind the exact response cache; a hit is yielded in one piece.
+        Returns (answer, cache status); only completed streams are cached."""
+        if self.response_cache is None:
+            response, _ = yield from self.stream_response(user_query, context, conversation_history)
+            return response, {"status": "disabled"}
+        key = self.response_cache_key(user_query, search_results, conversation_history)
+        cached = self.read_response_cache(key)
+        if cached is not None:
+            yield cached
+            return cached, {"status": "hit"}
+        response, completed = yield from self.stream_response(user_query, context, conversation_history)
+        if completed:
+            self.write_response_cache(key, response)
+        return response, {"status": "miss"}
+    
+    def response_cache_key(self, user_query: str, search_results: List[SearchResult],
+                           conversation_history: List[ConversationTurn]) -> str:
+        """Key over the chunks as they go into the prompt: ids plus a text digest, so a
+        compressed and a full context never share an answer"""
+        return ResponseCache.key(
+            user_query,
+            [f"{result.id}#{make_key(result.text)[:12]}" for result in search_results],
+            SYSTEM_PROMPT_VERSION,
+            self.chat_model,
+            self.history_digest(conversation_history),
+            self.index_version
+        )
+    
+    def read_response_cache(self, key: str) -> Optional[str]:
+        try:
+            return self.response_cache.get(key) if self.response_cache is not None else None
+        except Exception as e:
+            print(f"Error reading response cache: {e}")
+            return None
+    
+    def write_response_cache(self, key: str, response: str) -> None:
+        """Store a generated answer; generation fallbacks are never cached"""
+        if self.response_cache is None or response in (EMPTY_RESPONSE_ANSWER, GENERATION_ERROR_ANSWER):
+            return
+        try:
+            self.response_cache.set(key, response)
+        except Exception as e:
+            print(f"Error writing response cache: {e}")
+    
+    def add_conversation_turn(self, user_query: str, search_results: List[SearchResult], response: str,
+                              session_id: Optional[str] = None) -> None:
+        """Append a turn to the session; only chunk ids and sources are kept, not the chunk texts"""
+        self.sessions.append(
+            session_id or DEFAULT_SESSION,
+            user_query,
+            response,
+            [result.id for result in search_results],
+            [result.source for result in search_results]
+        )
+    
+    @property
+    def conversation_history(self) -> List[ConversationTurn]:
+        """Turns of the default session"""
+        return self.sessions.history(DEFAULT_SESSION)
     
-    def get_conversation_history(self) -> List[Dict[str, Any]]:
+    def get_conversation_history(self, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get conversation history"""
         return [
             {
                 "user_query": turn.user_query,
                 "response": turn.generated_response,
-                "timestamp": turn.timestamp.isoformat(),
-                "sources": [r.source for r in turn.retrieved_context]
+                "timestamp": datetime.fromtimestamp(turn.timestamp).isoformat(),
+                "sources": list(turn.sources)
             }
-            for turn in self.conversation_history
+            for turn in self.sessions.history(session_id or DEFAULT_SESSION)
         ]
     
-    def clear_conversation_history(self):
+    def clear_conversation_history(self, session_id: Optional[str] = None):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.sessions.clear(session_id or DEFAULT_SESSION)
     
     def get_system_stats(self) -> Dict[str, Any]:
         """Get system statistics"""
         try:
-            index_stats = self.index.describe_index_stats()
+            index_stats = self.vector_store.describe()
             return {
                 "total_vectors": index_stats.get("total_vector_count", 0),
                 "index_dimension": index_stats.get("dimension", 0),
+                "vector_backend": index_stats.get("backend", self.vector_backend),
+                "vector_index": index_stats.get("index", {}),
+                "bm25_index": self.bm25_index.describe() if self.bm25_index is not None else None,
+                "chunk_store": self.chunk_store.describe() if self.chunk_store is not None else None,
+                "article_index": self.article_index.describe() if self.article_index is not None else None,
                 "conversation_history_length": len(self.conversation_history),
+                "sessions": self.sessions.stats(),
+                "caches": {
+                    "embedding": self.embedding_cache.stats(),
+                    "semantic": self.semantic_cache.stats(),
+                    "response": self.response_cache.stats() if self.response_cache is not None else None,
+                    "rerank_scores": self.score_cache.stats(),
+                    "token_counts": self.token_counter.stats(),
+                    "sentence_embeddings": self.sentence_cache.stats()
+                },
+                "batching": {
+                    "embedding": self.embedding_batcher.stats(),
+                    "rerank": self.rerank_batcher.stats()
+                } if self.embedding_batcher is not None and self.rerank_batcher is not None else None,
+                "retrieval_stages": self.retrieval_stages.stats(),
                 "models": {
                     "embedding": self.embedding_model_name,
-                    "cross_encoder": "BAAI/bge-reranker-v2-m3",
-                    "generation": os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+                    "cross_encoder": self.reranker_model_name,
+                    "generation": self.chat_model,
+                    "inference_url": os.getenv("INFERENCE_URL")
                 }
             }
         except Exception as e:
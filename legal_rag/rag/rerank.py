@@ -0,0 +1,114 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Dict, Any, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class RerankDepthConfig:
+    """Bounds for adaptive rerank depth chosen from the retrieval score distribution.
+
+    Reranking is skipped when the top hit beats the runner-up by `skip_margin` (relative);
+    otherwise every candidate within `band` (relative) of the top score is reranked,
+    clipped to [min_depth, max_depth].
+    """
+    min_depth: int = 5
+    max_depth: int = 20
+    skip_margin: float = 0.5
+    band: float = 0.5
+
+    def __post_init__(self) -> None:
+        if not 0 < self.min_depth <= self.max_depth:
+            raise ValueError("Expected 0 < min_depth <= max_depth")
+
+
+def adaptive_rerank_depth(scores: Sequence[float], config: RerankDepthConfig) -> Tuple[int, float]:
+    """(depth, top-vs-runner-up margin) for retrieval scores; depth 0 means skip reranking"""
+    ordered = np.sort(np.asarray(scores, dtype=np.float64))[::-1]
+    if ordered.size == 0:
+        return 0, 0.0
+    top = float(ordered[0])
+    if ordered.size == 1 or top <= 0:
+        return min(config.max_depth, int(ordered.size)), 0.0
+
+    margin = (top - float(ordered[1])) / top
+    if margin >= config.skip_margin:
+        return 0, margin
+    contenders = int(np.count_nonzero(ordered >= top * (1 - config.band)))
+    depth = max(config.min_depth, min(config.max_depth, contenders))
+    return min(depth, int(ordered.size)), margin
+
+
+def cosine_prefilter(query_vector: np.ndarray, passage_vectors: np.ndarray, top_n: int) -> np.ndarray:
+    """Indices of the `top_n` passages closest to the query (unit vectors), best first.
+
+    Rows that are all zeros (vector unavailable) rank first so they are never pruned
+    for lack of data; the expensive stage decides about them.
+    """
+    scores = passage_vectors @ query_vector
+    scores[~passage_vectors.any(axis=1)] = np.inf
+    if top_n >= scores.shape[0]:
+        return np.argsort(-scores, kind="stable")
+    keep = np.argpartition(-scores, top_n - 1)[:top_n]
+    return keep[np.argsort(-scores[keep], kind="stable")]
+
+
+def stage_recall(reference_ids: Sequence[str], kept_ids: Sequence[str]) -> float:
+    """Share of the reference (full rerank) ids that survived a pruning stage"""
+    if not reference_ids:
+        return 1.0
+    kept = set(kept_ids)
+    return sum(1 for doc_id in reference_ids if doc_id in kept) / len(reference_ids)
+
+
+def stage_trace(stage: str, candidates: int, kept: int, latency_ms: float) -> Dict[str, Any]:
+    """Per-stage entry of the rerank trace reported by query()"""
+    return {"stage": stage, "candidates": candidates, "kept": kept, "latency_ms": round(latency_ms, 2)}
+
+
+def summarize_stages(traces: List[List[Dict[str, Any]]]) -> Dict[str, Dict[str, float]]:
+    """Mean latency and kept counts per stage over many requests"""
+    summary: Dict[str, Dict[str, float]] = {}
+    for trace in traces:
+        for entry in trace:
+            stage = summary.setdefault(entry["stage"], {"requests": 0, "latency_ms": 0.0, "kept": 0.0})
+            stage["requests"] += 1
+            stage["latency_ms"] += entry["latency_ms"]
+            stage["kept"] += entry["kept"]
+    for stage in summary.values():
+        stage["latency_ms"] /= stage["requests"]
+        stage["kept"] /= stage["requests"]
+    return summary
+
+
+def mmr_select(relevance: Sequence[float], vectors: np.ndarray, k: int, lambda_: float) -> np.ndarray:
+    """Indices of `k` items chosen by maximal marginal relevance, in selection order.
+
+    Each step takes the item maximising lambda * relevance - (1 - lambda) * max cosine to the
+    items already chosen. Relevance is min-max scaled to [0, 1] to match the cosine range;
+    all-zero vector rows (embedding unavailable) count as similar to nothing.
+    """
+    if not 0.0 <= lambda_ <= 1.0:
+        raise ValueError("Expected 0 <= lambda <= 1")
+    relevance = np.asarray(relevance, dtype=np.float64)
+    n = relevance.size
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones(n)
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = np.divide(vectors, norms, out=np.zeros(vectors.shape, dtype=np.float64), where=norms > 0)
+    similarity = unit @ unit.T
+
+    selected = np.empty(k, dtype=np.int64)
+    chosen = np.zeros(n, dtype=bool)
+    redundancy = np.zeros(n)  # max similarity to the chosen set
+    for step in range(k):
+        scores = lambda_ * relevance - (1.0 - lambda_) * redundancy
+        scores[chosen] = -np.inf
+        best = int(np.argmax(scores))
+        selected[step] = best
+        chosen[best] = True
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
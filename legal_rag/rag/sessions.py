@@ -0,0 +1,148 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import List, Dict, Any, Deque, Optional, Sequence, Tuple
+
+DEFAULT_SESSION = "default"
+
+# Rough per-turn bookkeeping cost on top of the stored strings
+TURN_OVERHEAD_BYTES = 256
+
+
+@dataclass(frozen=True)
+class ConversationTurn:
+    """One compact conversation turn: texts plus the ids (not the texts) of the chunks used"""
+    user_query: str
+    generated_response: str
+    chunk_ids: Tuple[str, ...]
+    sources: Tuple[str, ...]
+    timestamp: float
+
+    @property
+    def size(self) -> int:
+        """Approximate memory footprint in bytes"""
+        strings = (self.user_query, self.generated_response, *self.chunk_ids, *self.sources)
+        return TURN_OVERHEAD_BYTES + sum(len(s.encode("utf-8")) for s in strings)
+
+
+class _Session:
+    __slots__ = ("turns", "size", "last_access")
+
+    def __init__(self, max_turns: int) -> None:
+        self.turns: Deque[ConversationTurn] = deque(maxlen=max_turns)
+        self.size = 0
+        self.last_access = time.monotonic()
+
+
+class SessionStore:
+    """Per-session conversation history with bounded memory; safe for concurrent use.
+
+    Every session is a ring buffer of at most `max_turns` turns and `max_session_bytes`
+    bytes (oldest turns go first; an oversized single answer is truncated). Across sessions
+    at most `max_sessions` sessions and `max_total_bytes` bytes are kept: the least recently
+    used sessions are evicted, as are sessions idle for longer than `idle_ttl_seconds`.
+    """
+
+    def __init__(self, max_turns: int = 10, max_session_bytes: int = 64 * 1024,
+                 max_total_bytes: int = 64 * 1024 * 1024, max_sessions: int = 10000,
+                 idle_ttl_seconds: Optional[float] = 3600) -> None:
+        self.max_turns = max_turns
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.evicted_sessions = 0
+        self.dropped_turns = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        """Limits from SESSION_MAX_TURNS, SESSION_MAX_BYTES, SESSIONS_MAX_BYTES, SESSIONS_MAX, SESSION_IDLE_TTL"""
+        return cls(
+            max_turns=int(os.getenv("SESSION_MAX_TURNS", 10)),
+            max_session_bytes=int(os.getenv("SESSION_MAX_BYTES", 64 * 1024)),
+            max_total_bytes=int(os.getenv("SESSIONS_MAX_BYTES", 64 * 1024 * 1024)),
+            max_sessions=int(os.getenv("SESSIONS_MAX", 10000)),
+            idle_ttl_seconds=float(os.getenv("SESSION_IDLE_TTL", 3600))
+        )
+
+    def history(self, session_id: str = DEFAULT_SESSION) -> List[ConversationTurn]:
+        """Turns of a session, oldest first (a snapshot; empty for unknown sessions)"""
+        with self._lock:
+            session = self._touch(session_id, create=False)
+            return list(session.turns) if session is not None else []
+
+    def append(self, session_id: str, user_query: str, response: str,
+               chunk_ids: Sequence[str] = (), sources: Sequence[str] = ()) -> ConversationTurn:
+        turn = ConversationTurn(user_query, response, tuple(chunk_ids), tuple(dict.fromkeys(sources)), time.time())
+        if turn.size > self.max_session_bytes:
+            # Keep the turn, cut the answer so that it fits the session budget on its own
+            room = max(0, len(response) - (turn.size - self.max_session_bytes))
+            turn = ConversationTurn(user_query, response[:room], turn.chunk_ids, turn.sources, turn.timestamp)
+        with self._lock:
+            session = self._touch(session_id, create=True)
+            if len(session.turns) == session.turns.maxlen:
+                self._drop_oldest(session)
+            session.turns.append(turn)
+            session.size += turn.size
+            self.total_bytes += turn.size
+            while session.size > self.max_session_bytes and len(session.turns) > 1:
+                self._drop_oldest(session)
+            self._evict(keep=session_id)
+        return turn
+
+    def clear(self, session_id: str = DEFAULT_SESSION) -> None:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self.total_bytes -= session.size
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _touch(self, session_id: str, create: bool) -> Optional[_Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[session_id] = _Session(self.max_turns)
+        self._sessions.move_to_end(session_id)
+        session.last_access = time.monotonic()
+        return session
+
+    def _drop_oldest(self, session: _Session) -> None:
+        turn = session.turns.popleft()
+        session.size -= turn.size
+        self.total_bytes -= turn.size
+        self.dropped_turns += 1
+
+    def _evict(self, keep: str) -> None:
+        """Drop idle and least recently used sessions until the global caps hold"""
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session_id == keep:
+                break  # the LRU end reached the session being written
+            idle = self.idle_ttl_seconds is not None and now - session.last_access > self.idle_ttl_seconds
+            if not (idle or len(self._sessions) > self.max_sessions or self.total_bytes > self.max_total_bytes):
+                break
+            del self._sessions[session_id]
+            self.total_bytes -= session.size
+            self.evicted_sessions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self.total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_total_bytes": self.max_total_bytes,
+                "max_session_bytes": self.max_session_bytes,
+                "max_turns": self.max_turns,
+                "evicted_sessions": self.evicted_sessions,
+                "dropped_turns": self.dropped_turns
+            }
@@ -0,0 +1,82 @@
+import numpy as np
+from collections import Counter
+from typing import List, Dict, Any
+
+from scipy import sparse
+
+from legal_rag.rag.bm25_index import bm25_idf
+
+
+class SparseBM25:
+    """Drop-in replacement for `rank_bm25.BM25Okapi` backed by a SciPy sparse matrix.
+
+    BM25 weights idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)) are
+    precomputed for every (document, term) pair at construction time. The
+    docs x vocab weight matrix is held transposed as CSR, so scoring a query is
+    one sparse row-gather over the query terms followed by a weighted sum.
+    With idf="okapi" IDF follows BM25Okapi, including the epsilon floor for negative IDF;
+    idf="log1p" uses the non-negative IDF of the corpus-wide BM25Index, so scores match it.
+    """
+
+    def __init__(self, corpus: List[List[str]], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+                 idf: str = "okapi") -> None:
+        if idf not in ("okapi", "log1p"):
+            raise ValueError(f"Unknown IDF '{idf}' (expected okapi or log1p)")
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.corpus_size = len(corpus)
+        self.vocab: Dict[str, int] = {}
+
+        rows: List[int] = []
+        cols: List[int] = []
+        tfs: List[float] = []
+        for doc_index, document in enumerate(corpus):
+            for term, tf in Counter(document).items():
+                rows.append(self.vocab.setdefault(term, len(self.vocab)))
+                cols.append(doc_index)
+                tfs.append(tf)
+
+        self.doc_len = np.array([len(document) for document in corpus], dtype=np.float64)
+        self.avgdl = float(self.doc_len.mean()) if self.corpus_size else 0.0
+
+        term_ids = np.asarray(rows, dtype=np.int64)
+        doc_ids = np.asarray(cols, dtype=np.int64)
+        tf_values = np.asarray(tfs, dtype=np.float64)
+
+        doc_freq = np.bincount(term_ids, minlength=len(self.vocab)).astype(np.float64)
+        if idf == "log1p":
+            idf_values = bm25_idf(self.corpus_size, doc_freq)
+            self.average_idf = float(idf_values.mean()) if idf_values.size else 0.0
+        else:
+            idf_values = np.log(self.corpus_size - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+            self.average_idf = float(idf_values.mean()) if idf_values.size else 0.0
+            idf_values[idf_values < 0] = self.epsilon * self.average_idf
+        self.idf = idf_values
+
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / max(self.avgdl, 1e-8))
+        weights = idf_values[term_ids] * tf_values * (self.k1 + 1) / (tf_values + norm[doc_ids])
+        self.term_weights = sparse.csr_matrix(
+            (weights, (term_ids, doc_ids)),
+            shape=(len(self.vocab), self.corpus_size)
+        )
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        """BM25 score of every document; repeated query terms count repeatedly, as in BM25Okapi"""
+        counts = Counter(term for term in query if term in self.vocab)
+        if not counts:
+            return np.zeros(self.corpus_size)
+        # Row gather straight from the CSR arrays: SciPy fancy indexing costs more than
+        # the arithmetic itself on small candidate sets
+        indptr = self.term_weights.indptr
+        rows = [(indptr[self.vocab[term]], indptr[self.vocab[term] + 1], count) for term, count in counts.items()]
+        doc_ids = np.concatenate([self.term_weights.indices[start:end] for start, end, _ in rows])
+        weights = np.concatenate([self.term_weights.data[start:end] * count for start, end, count in rows])
+        return np.bincount(doc_ids, weights=weights, minlength=self.corpus_size)
+
+    def get_batch_scores(self, query: List[str], doc_ids: List[int]) -> List[float]:
+        """Scores for a subset of documents, mirroring BM25Okapi.get_batch_scores"""
+        return self.get_scores(query)[doc_ids].tolist()
+
+    def describe(self) -> Dict[str, Any]:
+        return {"documents": self.corpus_size, "terms": len(self.vocab), "nnz": int(self.term_weights.nnz)}
@@ -0,0 +1,106 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Dict, Any, Awaitable, Callable, Optional, Tuple
+
+
+@dataclass
+class StageOutcome:
+    """Result of one pipeline stage: the value when it succeeded, otherwise why it did not"""
+    name: str
+    status: str  # ok | error | timeout
+    value: Any = None
+    error: Optional[str] = None
+    latency_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+def timeout_from_ms(value: Any) -> Optional[float]:
+    """Stage timeout in seconds from a millisecond setting; 0 or less means no timeout"""
+    ms = float(value)
+    return ms / 1000.0 if ms > 0 else None
+
+
+class StageExecutor:
+    """Runs independent pipeline stages concurrently on a shared executor.
+
+    Each stage has its own timeout (seconds, None = no limit) counted from the moment the
+    stages are submitted, so time spent queued for a pool thread counts too. A stage that
+    raises or overruns is reported in its outcome rather than raised, and the caller merges
+    whatever arrived. Overrunning stages cannot be interrupted; they finish in the
+    background and their results are dropped.
+    """
+
+    def __init__(self, executor: Executor, timeouts: Optional[Dict[str, Optional[float]]] = None) -> None:
+        self.executor = executor
+        self.timeouts: Dict[str, Optional[float]] = dict(timeouts or {})
+        self._lock = threading.Lock()
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+    def run(self, stages: Dict[str, Callable[[], Any]]) -> Dict[str, StageOutcome]:
+        """Outcome of every stage, keyed like `stages`; blocks at most until the longest timeout"""
+        start = time.perf_counter()
+        futures = {name: self.executor.submit(self._timed, fn) for name, fn in stages.items()}
+        outcomes: Dict[str, StageOutcome] = {}
+        for name, future in futures.items():
+            timeout = self.timeouts.get(name)
+            remaining = None if timeout is None else max(0.0, start + timeout - time.perf_counter())
+            try:
+                value, latency_ms = future.result(timeout=remaining)
+                outcomes[name] = StageOutcome(name, "ok", value, latency_ms=latency_ms)
+            except Exception as e:
+                if future.done():
+                    outcomes[name] = StageOutcome(name, "error", error=repr(e),
+                                                  latency_ms=(time.perf_counter() - start) * 1000)
+                else:
+                    future.cancel()  # drops it if it never left the queue
+                    outcomes[name] = self._timeout(name, timeout)
+        self._record(outcomes)
+        return outcomes
+
+    async def arun(self, stages: Dict[str, Awaitable[Any]]) -> Dict[str, StageOutcome]:
+        """Async run(): awaits all stages concurrently, each under its own timeout"""
+        async def run_stage(name: str, awaitable: Awaitable[Any]) -> StageOutcome:
+            start = time.perf_counter()
+            timeout = self.timeouts.get(name)
+            try:
+                value = await asyncio.wait_for(awaitable, timeout)
+            except asyncio.TimeoutError:
+                return self._timeout(name, timeout)
+            except Exception as e:
+                return StageOutcome(name, "error", error=repr(e), latency_ms=(time.perf_counter() - start) * 1000)
+            return StageOutcome(name, "ok", value, latency_ms=(time.perf_counter() - start) * 1000)
+
+        results = await asyncio.gather(*(run_stage(name, awaitable) for name, awaitable in stages.items()))
+        outcomes = {outcome.name: outcome for outcome in results}
+        self._record(outcomes)
+        return outcomes
+
+    @staticmethod
+    def _timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+        start = time.perf_counter()
+        value = fn()
+        return value, (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    def _timeout(name: str, timeout: Optional[float]) -> StageOutcome:
+        return StageOutcome(name, "timeout", error=f"no result within {timeout:.3f}s",
+                            latency_ms=(timeout or 0.0) * 1000)
+
+    def _record(self, outcomes: Dict[str, StageOutcome]) -> None:
+        with self._lock:
+            for outcome in outcomes.values():
+                counts = self.counts.setdefault(outcome.name, {"ok": 0, "error": 0, "timeout": 0})
+                counts[outcome.status] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "timeouts_ms": {name: None if t is None else t * 1000 for name, t in self.timeouts.items()},
+                "outcomes": {name: dict(counts) for name, counts in self.counts.items()}
+            }
@@ -0,0 +1,292 @@
+import os
+import json
+import asyncio
+import hashlib
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+
+from legal_rag.rag.ann_index import DEFAULT_NPROBE, IVFIndex
+from legal_rag.rag.filters import MetadataBitmaps, SearchFilter
+
+DEFAULT_INDEX_DIR = "data/index"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.json"
+# Written with the flat index: a content fingerprint that derived indexes (IVF) record and are checked against
+MANIFEST_FILE = "manifest.json"
+
+
+def get_index_dir() -> str:
+    """Directory holding the local retrieval artifacts"""
+    return os.getenv("LOCAL_INDEX_DIR") or DEFAULT_INDEX_DIR
+
+
+class VectorStore:
+    """Minimal interface for dense vector backends used by EnhancedRAGSystem."""
+
+    def query(self, vector: List[float], top_k: int, include_metadata: bool = True,
+              search_filter: Optional[SearchFilter] = None) -> List[Dict[str, Any]]:
+        """Return matches as dicts with `id`, `score` and `metadata`, best first"""
+        raise NotImplementedError
+
+    async def aquery(self, vector: List[float], top_k: int, include_metadata: bool = True,
+                     search_filter: Optional[SearchFilter] = None) -> List[Dict[str, Any]]:
+        """Async query; the blocking client call runs in a worker thread unless a backend overrides it"""
+        return await asyncio.to_thread(self.query, vector, top_k, include_metadata, search_filter)
+
+    def fetch(self, ids: List[str]) -> List[Dict[str, Any]]:
+        """Return stored vectors by id as dicts with `id`, `values` and `metadata`; unknown ids are skipped"""
+        raise NotImplementedError
+
+    def describe(self) -> Dict[str, Any]:
+        """Return `total_vector_count` and `dimension` of the backend"""
+        raise NotImplementedError
+
+    def configure(self, **params: Any) -> None:
+        """Apply backend-specific search knobs; unknown knobs are ignored"""
+        return None
+
+
+class PineconeVectorStore(VectorStore):
+    def __init__(self, index: Any) -> None:
+        self.index = index
+
+    def query(self, vector: List[float], top_k: int, include_metadata: bool = True,
+              search_filter: Optional[SearchFilter] = None) -> List[Dict[str, Any]]:
+        options: Dict[str, Any] = {"top_k": top_k, "include_metadata": include_metadata}
+        if search_filter is not None and not search_filter.is_empty():
+            options["filter"] = search_filter.to_pinecone()
+
+        # Try different Pinecone API formats
+        try:
+            results = self.index.query(vector=vector, **options)  # type: ignore
+        except TypeError:
+            # Fallback for older Pinecone versions
+            results = self.index.query(queries=[vector], **options)  # type: ignore
+
+        matches = results.matches if hasattr(results, 'matches') else results.get('matches', [])  # type: ignore
+        return [
+            {
+                "id": match['id'],
+                "score": float(match['score']),
+                "metadata": match['metadata'] or {}
+            }
+            for match in matches  # type: ignore
+        ]
+
+    def fetch(self, ids: List[str]) -> List[Dict[str, Any]]:
+        if not ids:
+            return []
+        response = self.index.fetch(ids=ids)
+        vectors = response.vectors if hasattr(response, 'vectors') else response.get('vectors', {})  # type: ignore
+        fetched = []
+        for vector_id in ids:
+            vector = vectors.get(vector_id)
+            if vector is None:
+                continue
+            fetched.append({
+                "id": vector_id,
+                "values": vector['values'],
+                "metadata": vector['metadata'] or {}
+            })
+        return fetched
+
+    def describe(self) -> Dict[str, Any]:
+        index_stats = self.index.describe_index_stats()
+        return {
+            "total_vector_count": index_stats.get("total_vector_count", 0),
+            "dimension": index_stats.get("dimension", 0),
+            "backend": "pinecone"
+        }
+
+
+class LocalVectorStore(VectorStore):
+    """In-process search over a memory-mapped float32 matrix of normalized embeddings.
+
+    `index_type` selects exact search ("flat"), the IVF ANN index ("ivf"), or the
+    IVF index when it has been built and flat search otherwise ("auto").
+    """
+
+    def __init__(self, index_dir: Optional[str] = None, index_type: Optional[str] = None) -> None:
+        self.index_dir = index_dir or get_index_dir()
+        vectors_path = os.path.join(self.index_dir, VECTORS_FILE)
+        chunks_path = os.path.join(self.index_dir, CHUNKS_FILE)
+        if not os.path.exists(vectors_path) or not os.path.exists(chunks_path):
+            raise FileNotFoundError(
+                f"Local index not found in '{self.index_dir}'. "
+                "Build it with: python -m legal_rag.pipelines.build_local_index"
+            )
+
+        self.vectors = np.load(vectors_path, mmap_mode="r")
+        with open(chunks_path, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        self.ids: List[str] = [chunk["id"] for chunk in chunks]
+        self.metadatas: List[Dict[str, Any]] = [chunk.get("metadata", {}) for chunk in chunks]
+        self.id_to_row = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self.bitmaps = MetadataBitmaps(self.metadatas)
+
+        if self.vectors.shape[0] != len(self.ids):
+            raise ValueError(
+                f"Local index is inconsistent: {self.vectors.shape[0]} vectors for {len(self.ids)} ids"
+            )
+
+        self.index_type = (index_type or os.getenv("LOCAL_INDEX_TYPE", "auto")).strip().lower()
+        self.ann: Optional[IVFIndex] = None
+        if self.index_type == "ivf" or (self.index_type == "auto" and IVFIndex.exists(self.index_dir)):
+            if not IVFIndex.exists(self.index_dir):
+                raise FileNotFoundError(
+                    f"IVF index not found in '{self.index_dir}'. "
+                    "Build it with: python -m legal_rag.pipelines.build_ann_index"
+                )
+            self.ann = IVFIndex.load(self.index_dir)
+            fingerprint = read_manifest(self.index_dir).get("fingerprint")
+            if self.ann.rows.shape[0] != len(self.ids) or (fingerprint is not None and self.ann.source_fingerprint != fingerprint):
+                raise ValueError(
+                    f"IVF index in '{self.index_dir}' is stale (built from {self.ann.rows.shape[0]} vectors, "
+                    f"fingerprint {self.ann.source_fingerprint}; the flat index has {len(self.ids)}, fingerprint {fingerprint}). "
+                    "Rebuild it with: python -m legal_rag.pipelines.build_ann_index"
+                )
+            self.ann.nprobe = int(os.getenv("ANN_NPROBE", DEFAULT_NPROBE))
+
+    def _to_matches(self, rows: np.ndarray, scores: np.ndarray, include_metadata: bool) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": self.ids[row],
+                "score": float(score),
+                "metadata": self.metadatas[row] if include_metadata else {}
+            }
+            for row, score in zip(rows.tolist(), scores.tolist())
+        ]
+
+    def _partition(self, search_filter: Optional[SearchFilter]) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """Rows allowed by the filter (None = all) and the matching slice of the vector matrix"""
+        if search_filter is None or search_filter.is_empty():
+            return None, self.vectors
+        rows = self.bitmaps.rows(search_filter)
+        if rows.size and rows[-1] - rows[0] + 1 == rows.size:
+            # Chunks are stored grouped by source, so most partitions are a contiguous, copy-free slice
+            return rows, self.vectors[rows[0]:rows[-1] + 1]
+        return rows, self.vectors[rows]
+
+    def query(self, vector: List[float], top_k: int, include_metadata: bool = True,
+              search_filter: Optional[SearchFilter] = None) -> List[Dict[str, Any]]:
+        if top_k <= 0 or not self.ids:
+            return []
+        query_vector = np.asarray(vector, dtype=np.float32)
+        if self.ann is not None:
+            allowed = self.bitmaps.mask(search_filter) if search_filter is not None and not search_filter.is_empty() else None
+            rows, row_scores = self.ann.search(query_vector, top_k, allowed=allowed)
+            return self._to_matches(rows, row_scores, include_metadata)
+
+        rows, vectors = self._partition(search_filter)
+        if vectors.shape[0] == 0:
+            return []
+        scores = vectors @ query_vector  # cosine similarity: rows are L2-normalized
+
+        k = min(top_k, scores.shape[0])
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return self._to_matches(rows[top] if rows is not None else top, scores[top], include_metadata)
+
+    def fetch(self, ids: List[str]) -> List[Dict[str, Any]]:
+        rows = [self.id_to_row[vector_id] for vector_id in ids if vector_id in self.id_to_row]
+        return [
+            {"id": self.ids[row], "values": self.vectors[row], "metadata": self.metadatas[row]}
+            for row in rows
+        ]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "total_vector_count": int(self.vectors.shape[0]),
+            "dimension": int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0,
+            "backend": "local",
+            "index": self.ann.describe() if self.ann is not None else {"type": "flat"}
+        }
+
+    def configure(self, **params: Any) -> None:
+        """Supported knobs: `nprobe` (IVF lists probed per query; higher = better recall, slower)"""
+        if self.ann is not None and params.get("nprobe"):
+            self.ann.nprobe = max(1, min(int(params["nprobe"]), self.ann.nlist))
+
+
+def save_local_index(index_dir: str, vectors: np.ndarray, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    """Persist embeddings and chunk metadata in the layout read by LocalVectorStore, plus the manifest"""
+    if len(ids) != len(metadatas) or vectors.shape[0] != len(ids):
+        raise ValueError("vectors, ids and metadatas must have the same length")
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, VECTORS_FILE), np.ascontiguousarray(vectors, dtype=np.float32))
+    with open(os.path.join(index_dir, CHUNKS_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            [{"id": chunk_id, "metadata": metadata} for chunk_id, metadata in zip(ids, metadatas)],
+            f,
+            ensure_ascii=False
+        )
+    write_manifest(index_dir, vectors, ids)
+
+
+def flat_fingerprint(vectors: np.ndarray, ids: List[str], block_rows: int = 8192) -> str:
+    """Content hash of the flat index: ids in order plus the float32 vector bytes"""
+    digest = hashlib.sha256("\x1e".join(ids).encode("utf-8"))
+    for start in range(0, vectors.shape[0], block_rows):
+        digest.update(np.ascontiguousarray(vectors[start:start + block_rows], dtype=np.float32).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def write_manifest(index_dir: str, vectors: np.ndarray, ids: List[str]) -> Dict[str, Any]:
+    manifest = {
+        "fingerprint": flat_fingerprint(vectors, ids),
+        "n_vectors": int(vectors.shape[0]),
+        "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0
+    }
+    with open(os.path.join(index_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def read_manifest(index_dir: str) -> Dict[str, Any]:
+    """Manifest of the flat index; empty for indexes built before manifests were written"""
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ensure_manifest(index_dir: str) -> Dict[str, Any]:
+    """Manifest of the flat index in `index_dir`, computed from its files and written when missing"""
+    manifest = read_manifest(index_dir)
+    if manifest:
+        return manifest
+    with open(os.path.join(index_dir, CHUNKS_FILE), "r", encoding="utf-8") as f:
+        ids = [chunk["id"] for chunk in json.load(f)]
+    return write_manifest(index_dir, np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r"), ids)
+
+
+def get_vector_store(index: Any = None, backend: Optional[str] = None) -> VectorStore:
+    """Create the vector backend selected by `VECTOR_BACKEND` (pinecone | local)"""
+    backend = (backend or os.getenv("VECTOR_BACKEND", "pinecone")).strip().lower()
+    if backend == "local":
+        return LocalVectorStore()
+    if index is None:
+        raise ValueError("A Pinecone index is required for the 'pinecone' vector backend")
+    return PineconeVectorStore(index)
+
+
+def index_version(index_dir: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> str:
+    """Fingerprint of the searchable corpus: local artifact files (name, size, mtime) plus `extra` stats.
+
+    Changes whenever the local index is rebuilt; pass Pinecone stats in `extra` for the remote backend.
+    """
+    index_dir = index_dir or get_index_dir()
+    digest = hashlib.sha256()
+    if os.path.isdir(index_dir):
+        for name in sorted(os.listdir(index_dir)):
+            path = os.path.join(index_dir, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    if extra:
+        digest.update(json.dumps(extra, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
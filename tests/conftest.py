@@ -0,0 +1,236 @@
+"""EnhancedRAGSystem over a small local index, with deterministic stand-ins for the model and API clients.
+
+The `rag` fixture builds the index in a temp directory (VECTOR_BACKEND=local) and stubs
+OpenAI, the embedding model and the cross-encoder; pinecone and dotenv are only stubbed
+when they are not installed (neither is used with the local backend).
+"""
+import re
+import sys
+import json
+import types
+import zlib
+import hashlib
+import threading
+import importlib.util
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from legal_rag.pipelines.chunks import chunk_id, index_metadata
+from legal_rag.rag.article_lookup import ArticleIndex
+from legal_rag.rag.bm25_index import BM25Index
+from legal_rag.rag.chunk_store import ChunkStore
+from legal_rag.rag.vector_store import save_local_index
+
+DIMENSION = 64
+TOPICS = {
+    "civil_code_kz.txt": [
+        "договор купли продажи имущества заключается в письменной форме",
+        "сделка признается недействительной по решению суда",
+        "срок исковой давности составляет три года",
+        "наследство принимается наследниками в течение шести месяцев",
+        "аренда имущества оформляется договором аренды",
+        "собственник владеет пользуется и распоряжается имуществом",
+        "обязательство исполняется надлежащим образом в установленный срок",
+        "неустойка штраф пеня взыскивается при нарушении обязательства",
+        "залог имущества обеспечивает исполнение обязательства",
+        "дарение имущества совершается безвозмездно",
+    ],
+    "labor_code_kz.txt": [
+        "трудовой договор заключается между работником и работодателем",
+        "испытательный срок при приеме на работу не более трех месяцев",
+        "работник имеет право на ежегодный оплачиваемый отпуск",
+        "расторжение трудового договора по инициативе работодателя",
+        "заработная плата выплачивается не реже одного раза в месяц",
+        "продолжительность рабочего времени не более сорока часов в неделю",
+        "работодатель обеспечивает безопасные условия труда",
+        "дисциплинарное взыскание налагается работодателем на работника",
+        "сверхурочная работа оплачивается в повышенном размере",
+        "трудовой спор рассматривается согласительной комиссией или судом",
+    ],
+}
+QUESTIONS = [
+    "Как заключается трудовой договор с работником?",
+    "Какой срок исковой давности?",
+    "Когда выплачивается заработная плата?",
+    "Как принять наследство?",
+    "Что такое неустойка за нарушение обязательства?",
+    "Сколько длится испытательный срок при приеме на работу?",
+    "Статья 3 ТК РК",
+    "Как оформить аренду имущества?",
+]
+# Environment that would change what the engine computes; cleared for every test
+ENGINE_ENV = [
+    "INFERENCE_URL", "INDEX_VERSION", "SEMANTIC_CACHE", "MICRO_BATCHING", "RESPONSE_CACHE", "AUTO_DETECT_CODE",
+    "RERANK_CASCADE_TOP_N", "RERANK_ADAPTIVE", "MMR_LAMBDA", "CONTEXT_COMPRESSION", "EMBEDDING_CACHE_PATH",
+    "SENTENCE_CACHE_PATH", "BM25_BACKEND", "LOCAL_INDEX_TYPE", "FUSION_METHOD", "INDEX_VERSION_CHECK_SECONDS",
+    "CHUNK_STORE_CHECK_SAMPLE",
+]
+
+
+def words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+class FakeEmbedder:
+    """Hashed bag of words, L2-normalized; counts encode calls"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+    def vector(self, text):
+        vector = np.zeros(DIMENSION, dtype=np.float32)
+        for word in words(text):
+            vector[zlib.crc32(word.encode("utf-8")) % DIMENSION] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences, normalize_embeddings=False, prompt=None, batch_size=32, **_):
+        if isinstance(sentences, str):
+            return self.encode([sentences])[0]
+        with self._lock:
+            self.calls.append(len(sentences))
+        return np.array([self.vector(text) for text in sentences], dtype=np.float32).reshape(len(sentences), DIMENSION)
+
+
+class FakeCrossEncoder:
+    """Score = shared words between query and passage; counts predict calls"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def predict(self, pairs, batch_size=32, **_):
+        with self._lock:
+            self.calls.append(len(pairs))
+        return np.array([len(set(words(query)) & set(words(passage))) for query, passage in pairs], dtype=np.float32)
+
+
+def completion_text(messages):
+    """Deterministic answer naming the question and digesting the whole prompt"""
+    question = messages[-1]["content"].rsplit("Вопрос: ", 1)[-1]
+    digest = hashlib.sha1(json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"Ответ на вопрос «{question}» [{digest}], реплик в истории: {len(messages) - 2}"
+
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def stream_chunks(content):
+    for piece in re.findall(r"\S+\s*", content):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+
+class FakeLLM:
+    """chat.completions of the sync and async OpenAI clients; `fail` makes every call raise"""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def respond(self, messages, stream=False):
+        with self._lock:
+            self.calls += 1
+        if self.fail:
+            raise RuntimeError("OpenAI is unavailable")
+        content = completion_text(messages)
+        return stream_chunks(content) if stream else completion(content)
+
+    def client(self):
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            create=lambda model, messages, stream=False, **_: self.respond(messages, stream)
+        )))
+
+    def async_client(self):
+        async def create(model, messages, **_):
+            return self.respond(messages)
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def build_index(index_dir, embedder):
+    """Local index layout of build_local_index: vectors, chunk store, BM25 and article index"""
+    ids, texts, metadatas = [], [], []
+    for source, topics in TOPICS.items():
+        for number, topic in enumerate(topics, start=1):
+            text = f"Статья {number}. {topic.capitalize()}."
+            meta = {"text": text, "filename": source, "source": source, "article_number": str(number), "article_type": "article"}
+            ids.append(chunk_id(len(ids)))
+            texts.append(text)
+            metadatas.append(index_metadata(text, meta, "fake-embedder"))
+    save_local_index(index_dir, embedder.encode(texts), ids, metadatas)
+    ChunkStore.build(index_dir, ids, texts, metadatas)
+    BM25Index.build(texts, ids).save(index_dir)
+    ArticleIndex.from_metadata(ids, metadatas).save(index_dir)
+
+
+def install_missing_modules(monkeypatch):
+    stubs = {
+        "openai": dict(OpenAI=None, AsyncOpenAI=None),
+        "pinecone": dict(Pinecone=None),
+        "dotenv": dict(load_dotenv=lambda *args, **kwargs: False),
+    }
+    for name, attributes in stubs.items():
+        if name in sys.modules or importlib.util.find_spec(name) is not None:
+            continue
+        module = types.ModuleType(name)
+        for attribute, value in attributes.items():
+            setattr(module, attribute, value)
+        monkeypatch.setitem(sys.modules, name, module)
+
+
+@pytest.fixture()
+def rag(tmp_path, monkeypatch):
+    """Factory: rag(**env) -> (engine, fakes) with fakes.embedder / .cross_encoder / .llm"""
+    from legal_rag.rag import inference
+
+    fakes = SimpleNamespace(embedder=FakeEmbedder(), cross_encoder=FakeCrossEncoder(), llm=FakeLLM())
+    index_dir = tmp_path / "index"
+    build_index(str(index_dir), fakes.embedder)
+    fakes.embedder.calls.clear()
+
+    for name in ENGINE_ENV:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("VECTOR_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_INDEX_DIR", str(index_dir))
+    # Every answer comes from the (fake) chat model unless a test enables the response cache
+    monkeypatch.setenv("RESPONSE_CACHE", "none")
+
+    clients = SimpleNamespace(OpenAI=lambda **_: fakes.llm.client(), AsyncOpenAI=lambda **_: fakes.llm.async_client())
+    load_embedding_model = lambda name: fakes.embedder
+    load_cross_encoder = lambda name: fakes.cross_encoder
+    # The first import of rag_system builds its module-level instance, so the stand-ins go in first
+    install_missing_modules(monkeypatch)
+    import openai
+    monkeypatch.setattr(openai, "OpenAI", clients.OpenAI, raising=False)
+    monkeypatch.setattr(openai, "AsyncOpenAI", clients.AsyncOpenAI, raising=False)
+    monkeypatch.setattr(inference, "load_embedding_model", load_embedding_model)
+    monkeypatch.setattr(inference, "load_cross_encoder", load_cross_encoder)
+    from legal_rag.rag import rag_system
+
+    monkeypatch.setattr(rag_system, "openai", clients)
+    monkeypatch.setattr(rag_system, "load_embedding_model", load_embedding_model)
+    monkeypatch.setattr(rag_system, "load_cross_encoder", load_cross_encoder)
+
+    engines = []
+
+    def make(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        engine = rag_system.EnhancedRAGSystem()
+        engines.append(engine)
+        return engine, fakes
+
+    yield make
+    for engine in engines:
+        for batcher in (engine.embedding_batcher, engine.rerank_batcher):
+            if batcher is not None:
+                batcher.close()
+        engine.executor.shutdown(wait=True)
+        engine.stage_executor.shutdown(wait=True)
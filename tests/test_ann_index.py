@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from legal_rag.rag.ann_index import IVFIndex
+from legal_rag.rag.vector_store import MANIFEST_FILE, LocalVectorStore, ensure_manifest, read_manifest, save_local_index
+
+
+def _clustered_vectors(n: int = 600, dim: int = 32, clusters: int = 12) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def test_ivf_recall_and_full_probe_is_exact():
+    vectors = _clustered_vectors()
+    index = IVFIndex.build(vectors, nlist=16)
+
+    hits = 0
+    for row in range(0, 600, 30):
+        exact = np.argsort(-(vectors @ vectors[row]))[:10]
+        approx, _ = index.search(vectors[row], 10, nprobe=4)
+        hits += len(set(exact) & set(approx))
+        full, _ = index.search(vectors[row], 10, nprobe=index.nlist)
+        assert full.tolist() == exact.tolist()
+    assert hits / (20 * 10) >= 0.8
+
+
+def test_local_store_uses_persisted_ivf(tmp_path):
+    vectors = _clustered_vectors(n=200)
+    ids = [f"doc-{i}" for i in range(200)]
+    save_local_index(str(tmp_path), vectors, ids, [{} for _ in ids])
+    index = IVFIndex.build(vectors, nlist=8)
+    index.source_fingerprint = read_manifest(str(tmp_path))["fingerprint"]
+    index.save(str(tmp_path))
+
+    store = LocalVectorStore(str(tmp_path))
+    assert store.describe()["index"]["type"] == "ivf"
+    store.configure(nprobe=8)
+    matches = store.query(vectors[5].tolist(), top_k=3)
+    assert matches[0]["id"] == "doc-5"
+
+    assert LocalVectorStore(str(tmp_path), index_type="flat").ann is None
+
+
+def test_stale_ivf_index_is_rejected(tmp_path):
+    vectors = _clustered_vectors(n=100)
+    IVFIndex.build(vectors, nlist=4).save(str(tmp_path))
+    save_local_index(str(tmp_path), vectors[:50], [f"doc-{i}" for i in range(50)], [{}] * 50)
+    with pytest.raises(ValueError):
+        LocalVectorStore(str(tmp_path))
+
+
+def test_ivf_index_is_tied_to_the_flat_index_fingerprint(tmp_path):
+    vectors = _clustered_vectors(n=100)
+    ids = [f"doc-{i}" for i in range(100)]
+    save_local_index(str(tmp_path), vectors, ids, [{}] * 100)
+    index = IVFIndex.build(vectors, nlist=4)
+    index.source_fingerprint = read_manifest(str(tmp_path))["fingerprint"]
+    index.save(str(tmp_path))
+    assert LocalVectorStore(str(tmp_path)).ann is not None
+
+    # Same row count, different content: re-embedded vectors, then reordered ids
+    save_local_index(str(tmp_path), _clustered_vectors(n=100)[::-1].copy(), ids, [{}] * 100)
+    with pytest.raises(ValueError, match="stale"):
+        LocalVectorStore(str(tmp_path))
+    save_local_index(str(tmp_path), vectors, ids[::-1], [{}] * 100)
+    with pytest.raises(ValueError, match="stale"):
+        LocalVectorStore(str(tmp_path))
+
+    save_local_index(str(tmp_path), vectors, ids, [{}] * 100)
+    assert LocalVectorStore(str(tmp_path)).ann is not None
+
+
+def test_ensure_manifest_for_indexes_without_one(tmp_path):
+    vectors = _clustered_vectors(n=20)
+    ids = [f"doc-{i}" for i in range(20)]
+    save_local_index(str(tmp_path), vectors, ids, [{}] * 20)
+    expected = read_manifest(str(tmp_path))
+    (tmp_path / MANIFEST_FILE).unlink()
+
+    assert read_manifest(str(tmp_path)) == {}
+    assert ensure_manifest(str(tmp_path)) == expected == read_manifest(str(tmp_path))
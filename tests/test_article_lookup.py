@@ -0,0 +1,36 @@
+from legal_rag.pipelines.chunks import chunk_id, load_chunks
+from legal_rag.rag.article_lookup import ArticleIndex, ArticleReference, load_article_index, parse_article_reference
+
+
+def test_parse_article_references():
+    assert parse_article_reference("Что говорит статья 1 ГК РК?") == ArticleReference("civil_code_kz.txt", ("1",))
+    assert parse_article_reference("ст. 128-1 Гражданского кодекса") == ArticleReference("civil_code_kz.txt", ("128-1",))
+    assert parse_article_reference("Статьи 5 и 7 Трудового кодекса") == ArticleReference("labor_code_kz.txt", ("5", "7"))
+    assert parse_article_reference("Конституцияның 12-бабы") is None
+    assert parse_article_reference("Конституция 12-бап") == ArticleReference("constitution_kz.txt", ("12",))
+    assert parse_article_reference("Что говорит статья 1?") is None
+    assert parse_article_reference("Какие права имеет собственник по ГК?") is None
+
+
+def test_index_groups_article_parts():
+    ids = ["doc-0", "doc-1", "doc-2", "doc-3"]
+    metadatas = [
+        {"source": "labor_code_kz.txt", "article_number": "1-part1", "article_type": "article_part"},
+        {"source": "labor_code_kz.txt", "article_number": "1-part2", "article_type": "article_part"},
+        {"source": "civil_code_kz.txt", "article_number": "1", "article_type": "article"},
+        {"source": "civil_code_kz.txt", "article_number": "128-1", "article_type": "article"},
+    ]
+    index = ArticleIndex.from_metadata(ids, metadatas)
+    assert index.lookup(ArticleReference("labor_code_kz.txt", ("1",))) == ["doc-0", "doc-1"]
+    assert index.lookup(ArticleReference("civil_code_kz.txt", ("128-1", "404"))) == ["doc-3"]
+
+
+def test_lookup_against_chunk_corpus(tmp_path):
+    texts, metadatas = load_chunks()
+    ids = [chunk_id(i) for i in range(len(texts))]
+    ArticleIndex.from_metadata(ids, metadatas).save(str(tmp_path))
+    index = load_article_index(str(tmp_path))
+
+    found = index.lookup(parse_article_reference("Что говорит статья 1 ГК РК?"))
+    assert len(found) == 1
+    assert metadatas[ids.index(found[0])]["filename"] == "civil_code_kz_article_1.txt"
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from legal_rag.rag.batching import MicroBatcher
+
+
+def test_concurrent_calls_share_batches():
+    calls = []
+
+    def double(items):
+        calls.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch=64, max_wait_ms=50)
+    results = {}
+
+    def worker(n):
+        results[n] = batcher.submit([n, n + 100])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert results == {n: [2 * n, 2 * (n + 100)] for n in range(8)}
+    assert len(calls) < 8 and sum(calls) == 16
+    stats = batcher.stats()
+    assert stats["items"] == 16 and stats["batches"] == len(calls)
+    assert sum(stats["batch_size_histogram"].values()) == len(calls)
+
+
+def test_max_batch_splits_work():
+    calls = []
+
+    def identity(items):
+        calls.append(len(items))
+        return items
+
+    batcher = MicroBatcher(identity, max_batch=4, max_wait_ms=50)
+    threads = [threading.Thread(target=batcher.submit, args=([n, n],)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+    assert max(calls) <= 4 and sum(calls) == 12
+
+
+def test_errors_reach_every_caller_and_queue_is_bounded():
+    def fail(items):
+        raise ValueError("model failed")
+
+    batcher = MicroBatcher(fail, max_wait_ms=1)
+    with pytest.raises(ValueError):
+        batcher.submit(["a"])
+    batcher.close()
+
+    release = threading.Event()
+
+    def slow(items):
+        release.wait(2)
+        return items
+
+    blocked = MicroBatcher(slow, max_batch=1, max_wait_ms=0, max_queue=1)
+    first = threading.Thread(target=blocked.submit, args=(["running"],))
+    first.start()
+    time.sleep(0.05)  # worker is now busy with the first request
+    second = threading.Thread(target=blocked.submit, args=(["queued"],))
+    second.start()
+    time.sleep(0.05)
+    with pytest.raises(RuntimeError):
+        blocked.submit(["rejected"])
+    release.set()
+    first.join()
+    second.join()
+    assert blocked.stats()["rejected"] == 1
+    blocked.close()
+
+
+def test_engine_coalesces_rerank_requests(rag):
+    engine, fakes = rag(MICRO_BATCHING=1, MICRO_BATCH_MAX_WAIT_MS=200)
+    assert engine.rerank_batcher.max_batch >= 128
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def worker(n):
+        pairs = [(f"вопрос {n}", f"статья {i + 10} вопрос") for i in range(20)]
+        barrier.wait()
+        results[n] = engine.predict_pairs(pairs)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Two 20-pair requests, one cross-encoder call
+    assert fakes.cross_encoder.calls == [40]
+    assert results[0] == results[1] == [1.0] * 20
@@ -0,0 +1,52 @@
+import math
+
+import numpy as np
+
+from legal_rag.rag.bm25_index import BM25Index, load_bm25_index, tokenize
+
+DOCS = [
+    "Статья 1. Отношения, регулируемые гражданским законодательством",
+    "Собственник имущества вправе владеть, пользоваться и распоряжаться имуществом",
+    "Трудовой договор заключается в письменной форме",
+    "Работник вправе расторгнуть трудовой договор по своей инициативе",
+]
+IDS = [f"doc-{i}" for i in range(len(DOCS))]
+
+
+def _reference_scores(query, k1=1.5, b=0.75):
+    tokenized = [tokenize(doc) for doc in DOCS]
+    avgdl = sum(len(doc) for doc in tokenized) / len(tokenized)
+    scores = []
+    for doc in tokenized:
+        score = 0.0
+        for term in tokenize(query):
+            n = sum(1 for d in tokenized if term in d)
+            if n == 0:
+                continue
+            idf = math.log(1 + (len(tokenized) - n + 0.5) / (n + 0.5))
+            tf = doc.count(term)
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avgdl))
+        scores.append(score)
+    return np.array(scores)
+
+
+def test_scores_match_reference_bm25():
+    index = BM25Index.build(DOCS, IDS)
+    query = "трудовой договор работник"
+    np.testing.assert_allclose(index.get_scores(tokenize(query)), _reference_scores(query), rtol=1e-5)
+
+
+def test_search_returns_only_matching_documents():
+    index = BM25Index.build(DOCS, IDS)
+    ids, scores = index.search("Трудовой договор?", top_k=10)
+    assert set(ids) == {"doc-2", "doc-3"}
+    assert scores[0] >= scores[1]
+    assert index.search("несуществующее слово", top_k=5)[0] == []
+
+
+def test_roundtrip_through_disk(tmp_path):
+    BM25Index.build(DOCS, IDS).save(str(tmp_path))
+    loaded = load_bm25_index(str(tmp_path))
+    assert loaded is not None
+    assert loaded.search("имущества", top_k=1)[0] == ["doc-1"]
+    assert load_bm25_index(str(tmp_path / "missing")) is None
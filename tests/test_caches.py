@@ -0,0 +1,260 @@
+import numpy as np
+import pytest
+
+from legal_rag.rag.caches import (
+    EmbeddingCache, LRUCache, RedisCache, ResponseCache, SQLiteCache, ScoreCache, SemanticCache, get_cache_backend,
+    normalize_query
+)
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1)
+
+
+def test_lru_ttl_expiry():
+    cache = LRUCache(max_entries=4, ttl_seconds=-1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_sqlite_cache_shared_between_connections(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    writer = SQLiteCache(path, max_entries=2)
+    writer.set("a", b"1")
+    writer.set("b", b"2")
+    writer.set("c", b"3")
+
+    reader = SQLiteCache(path, max_entries=2)
+    assert len(reader) == 2
+    assert reader.get("c") == b"3"
+
+
+def test_embedding_cache_normalizes_and_persists(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    vector = np.array([0.6, 0.8], dtype=np.float32)
+    cache = EmbeddingCache("bge-m3", "query: ", persist_path=path)
+    cache.set("Что такое  сделка?", vector)
+
+    assert normalize_query("  Что такое\nсделка? ") == "что такое сделка?"
+    assert np.array_equal(cache.get("что такое сделка?"), vector)
+
+    # A fresh process sees the vector through the SQLite tier; other prompts/models do not
+    restarted = EmbeddingCache("bge-m3", "query: ", persist_path=path)
+    assert np.array_equal(restarted.get("Что такое сделка?"), vector)
+    assert EmbeddingCache("bge-m3", "passage: ", persist_path=path).get("Что такое сделка?") is None
+    assert restarted.stats()["persistent"]["hits"] == 1
+
+
+def _unit(values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_semantic_cache_threshold_and_namespace():
+    cache = SemanticCache(threshold=0.9, max_entries=4, version="v1")
+    cache.store(_unit([1.0, 0.0, 0.0]), "owner rights", namespace="hybrid")
+
+    payload, similarity = cache.lookup(_unit([1.0, 0.2, 0.0]), namespace="hybrid")
+    assert payload == "owner rights" and similarity > 0.9
+    assert cache.lookup(_unit([1.0, 0.2, 0.0]), namespace="dense") is None
+    assert cache.lookup(_unit([0.0, 1.0, 0.0]), namespace="hybrid") is None
+
+
+def test_semantic_cache_ttl_eviction_and_version():
+    cache = SemanticCache(threshold=0.9, max_entries=2, version="v1")
+    cache.store(_unit([1.0, 0.0]), "a")
+    cache.store(_unit([0.0, 1.0]), "b")
+    cache.lookup(_unit([0.0, 1.0]))
+    cache.store(_unit([1.0, 1.0]), "c")  # overwrites the least recently used entry "a"
+    assert cache.lookup(_unit([1.0, 0.0])) is None
+    assert cache.lookup(_unit([0.0, 1.0]))[0] == "b"
+
+    cache.set_version("v2")
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1
+
+    expired = SemanticCache(threshold=0.9, ttl_seconds=-1)
+    expired.store(_unit([1.0, 0.0]), "a")
+    assert expired.lookup(_unit([1.0, 0.0])) is None
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_response_cache_backends(tmp_path, backend):
+    cache = ResponseCache(get_cache_backend(backend, max_entries=8, path=str(tmp_path / "responses.sqlite")))
+    key = ResponseCache.key("Что такое сделка?", ["doc-1", "doc-2"], "p1", "gpt-4o-mini", "h0", "v1")
+    cache.set(key, "Ответ")
+
+    assert cache.get(ResponseCache.key("что такое  сделка?", ["doc-1", "doc-2"], "p1", "gpt-4o-mini", "h0", "v1")) == "Ответ"
+    # Any change in context order, prompt, model or history is a different key
+    assert key != ResponseCache.key("Что такое сделка?", ["doc-2", "doc-1"], "p1", "gpt-4o-mini", "h0", "v1")
+    assert key != ResponseCache.key("Что такое сделка?", ["doc-1", "doc-2"], "p2", "gpt-4o-mini", "h0", "v1")
+    assert key != ResponseCache.key("Что такое сделка?", ["doc-1", "doc-2"], "p1", "gpt-4o", "h0", "v1")
+    assert key != ResponseCache.key("Что такое сделка?", ["doc-1", "doc-2"], "p1", "gpt-4o-mini", "h1", "v1")
+    assert cache.stats()["hits"] == 1
+
+
+class FakeRedis:
+    """The subset of redis.Redis used by RedisCache, over dicts (expiry is recorded, not enforced)"""
+
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+        self.sorted_sets = {}
+
+    @staticmethod
+    def _key(key):
+        return key.encode("utf-8") if isinstance(key, str) else key
+
+    def get(self, key):
+        return self.values.get(self._key(key))
+
+    def set(self, key, value, ex=None):
+        self.values[self._key(key)] = value
+        self.expiry[self._key(key)] = ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(self._key(key), None)
+            self.sorted_sets.pop(self._key(key), None)
+
+    def zadd(self, name, mapping):
+        self.sorted_sets.setdefault(self._key(name), {}).update({self._key(k): v for k, v in mapping.items()})
+
+    def zcard(self, name):
+        return len(self.sorted_sets.get(self._key(name), {}))
+
+    def zrange(self, name, start, end):
+        members = sorted(self.sorted_sets.get(self._key(name), {}).items(), key=lambda item: item[1])
+        return [member for member, _ in members[start:end + 1]]
+
+    def zrem(self, name, *members):
+        for member in members:
+            self.sorted_sets.get(self._key(name), {}).pop(self._key(member), None)
+
+    def scan_iter(self, match):
+        prefix = self._key(match.rstrip("*"))
+        return [key for key in [*self.values, *self.sorted_sets] if key.startswith(prefix)]
+
+    def pipeline(self):
+        client, calls = self, []
+
+        class Pipeline:
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: calls.append((name, args, kwargs))
+
+            def execute(self):
+                return [getattr(client, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+        return Pipeline()
+
+
+def test_redis_cache_bounds_its_size_by_last_access(monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("legal_rag.rag.caches.time.time", lambda: next(clock))
+    client = FakeRedis()
+    cache = RedisCache(client=client, prefix="t:", ttl_seconds=60, max_entries=2)
+
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.set("c", b"3")
+
+    # "b" was used least recently
+    assert cache.get("b") is None and cache.get("a") == b"1" and cache.get("c") == b"3"
+    assert len(cache) == 2 and set(client.values) == {b"t:a", b"t:c"}
+    assert client.expiry[b"t:c"] == 60
+    assert cache.stats()["entries"] == 2 and cache.stats()["max_entries"] == 2
+
+    cache.delete("a")
+    assert len(cache) == 1
+    cache.clear()
+    assert client.values == {} and len(cache) == 0
+
+
+def test_cache_backend_selection():
+    assert get_cache_backend("none") is None
+    assert isinstance(get_cache_backend("memory", max_entries=4), LRUCache)
+    with pytest.raises(ValueError):
+        get_cache_backend("sqlite")
+    with pytest.raises(ValueError):
+        get_cache_backend("memcached")
+
+
+def test_score_cache_per_query_model_and_version():
+    cache = ScoreCache("bge-reranker-v2-m3", version="v1")
+    cache.set_many("Права собственника", ["doc-1", "doc-2"], np.array([0.9, 0.1], dtype=np.float32))
+
+    assert cache.get_many("права  собственника", ["doc-2", "doc-3", "doc-1"]) == [pytest.approx(0.1), None, pytest.approx(0.9)]
+    assert ScoreCache("other-reranker").query_hash("q") != cache.query_hash("q")
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+    cache.set_version("v2")
+    assert cache.get_many("Права собственника", ["doc-1"]) == [None]
+
+
+def test_semantic_cache_is_partitioned_by_history(rag):
+    engine, fakes = rag(SEMANTIC_CACHE=1)
+    question = "Какой срок исковой давности?"
+
+    first = engine.query(question, session_id="a")
+    assert first["cache"]["semantic"]["status"] == "miss"
+    # A fresh session has the same (empty) history: the answer is shared
+    assert engine.query(question, session_id="b")["cache"]["semantic"]["status"] == "hit"
+
+    engine.query("Как принять наследство?", session_id="c")
+    follow_up = engine.query(question, session_id="c")
+    assert follow_up["cache"]["semantic"]["status"] == "miss"
+    assert follow_up["answer"] != first["answer"]
+
+
+def test_queries_pick_up_a_remote_reindex(rag):
+    engine, _ = rag(SEMANTIC_CACHE=1, INDEX_VERSION_CHECK_SECONDS=60)
+    question = "Какой срок исковой давности?"
+    # A Pinecone-backed engine: the version follows describe_index_stats
+    stats = {"total_vector_count": 20, "dimension": 64}
+    engine.vector_backend = "pinecone"
+    engine.vector_store.describe = lambda: dict(stats)
+    version = engine.refresh_index_version()
+
+    def semantic_status(session_id):
+        return engine.query(question, session_id=session_id)["cache"]["semantic"]["status"]
+
+    assert semantic_status("a") == "miss" and semantic_status("b") == "hit"
+
+    stats["total_vector_count"] = 21
+    # Not checked again before INDEX_VERSION_CHECK_SECONDS
+    assert semantic_status("c") == "hit" and engine.index_version == version
+
+    engine.next_version_check = 0
+    assert semantic_status("d") == "miss"
+    assert engine.index_version != version
+    assert engine.semantic_cache.version == engine.score_cache.version == engine.index_version
+
+    # An unreachable index keeps the version (and the cache)
+    def unreachable():
+        raise ConnectionError("pinecone is down")
+
+    version = engine.index_version
+    engine.vector_store.describe = unreachable
+    engine.next_version_check = 0
+    assert semantic_status("e") == "hit" and engine.index_version == version
+
+
+def test_stale_writes_are_not_cached():
+    semantic = SemanticCache(threshold=0.9, version="v2")
+    semantic.store(_unit([1.0, 0.0]), "old", version="v1")
+    assert semantic.lookup(_unit([1.0, 0.0])) is None
+
+    scores = ScoreCache("bge-reranker-v2-m3", version="v2")
+    scores.set_many("q", ["doc-1"], [0.5], version="v1")
+    scores.set_many("q", ["doc-2"], [0.7], version="v2")
+    assert scores.get_many("q", ["doc-1", "doc-2"]) == [None, pytest.approx(0.7)]
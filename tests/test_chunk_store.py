@@ -0,0 +1,27 @@
+from legal_rag.rag.chunk_store import ChunkStore, load_chunk_store
+
+TEXTS = ["Статья 1. Отношения", "", "Статья 2. Гражданское законодательство — «полный» текст"]
+IDS = ["doc-0", "doc-1", "doc-2"]
+METADATA = [
+    {"filename": f"civil_code_kz_article_{i}.txt", "text": "preview", "source": "civil_code_kz.txt"}
+    for i in range(3)
+]
+
+
+def test_full_text_roundtrip(tmp_path):
+    ChunkStore.build(str(tmp_path), IDS, TEXTS, METADATA)
+    store = load_chunk_store(str(tmp_path))
+
+    assert store is not None and len(store) == 3
+    assert store.get_text("doc-2") == TEXTS[2]
+    assert store.get_text("doc-1") == ""
+    assert isinstance(store.get_bytes("doc-0"), memoryview)
+    assert store.get_text("doc-9") is None
+
+
+def test_metadata_drops_previews(tmp_path):
+    ChunkStore.build(str(tmp_path), IDS, TEXTS, METADATA)
+    store = ChunkStore(str(tmp_path))
+    assert store.get_metadata("doc-0") == {"filename": "civil_code_kz_article_0.txt", "source": "civil_code_kz.txt"}
+    assert store.get_metadata("missing") == {}
+    assert load_chunk_store(str(tmp_path / "missing")) is None
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from legal_rag.rag.compression import CompressionConfig, compress_chunks, select_sentences, split_header
+
+VOCABULARY = ["договор", "работник", "налог", "брак", "суд", "срок"]
+
+
+def embed(sentences):
+    """Unit bag-of-words vectors over a tiny vocabulary"""
+    vectors = np.array([[s.lower().count(word) for word in VOCABULARY] for s in sentences], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def query(*words):
+    vector = np.array([1.0 if word in words else 0.0 for word in VOCABULARY], dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_split_header():
+    assert split_header("Статья 12. Трудовой договор\n\nТекст.") == ("Статья 12. Трудовой договор", "\nТекст.")
+    assert split_header("Просто текст.\nЕщё.") == ("", "Просто текст.\nЕщё.")
+
+
+def test_select_sentences_per_chunk():
+    scores = np.array([0.1, 0.9, 0.5, 0.2, 0.05, 0.01])
+    owners = np.array([0, 0, 0, 0, 1, 1])
+    keep = select_sentences(scores, owners, CompressionConfig(top_sentences=2, min_similarity=0.3))
+    # Chunk 0: its two best; chunk 1: nothing reaches the floor, so only its best survives
+    assert keep.tolist() == [False, True, True, False, True, False]
+
+
+def test_keeps_header_and_relevant_sentences():
+    text = ("Статья 33. Трудовой договор\n"
+            "Работник заключает договор. Брак регистрируется в органах. Налог платится ежегодно. "
+            "Договор с работником заключается письменно. Суд рассматривает споры.")
+    short = "Статья 1. Общие положения\nДоговор заключается."
+    compressed, stats = compress_chunks(query("договор", "работник"), [text, short], embed,
+                                        CompressionConfig(top_sentences=2, min_similarity=0.3, min_sentences=3))
+
+    assert compressed[0] == ("Статья 33. Трудовой договор\n"
+                             "Работник заключает договор. … Договор с работником заключается письменно.")
+    assert compressed[1] == short  # too short to compress
+    assert stats == {"chunks": 2, "compressed_chunks": 1, "sentences": 5, "kept_sentences": 2}
+
+
+def test_zero_query_vector_leaves_chunks_alone():
+    texts = ["Один. Два. Три. Четыре."]
+    assert compress_chunks(np.zeros(len(VOCABULARY)), texts, embed, CompressionConfig())[0] == texts
+
+
+def test_config_validation():
+    with pytest.raises(ValueError):
+        CompressionConfig(top_sentences=0)
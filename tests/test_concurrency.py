@@ -0,0 +1,94 @@
+"""Concurrent query()/aquery() calls on one EnhancedRAGSystem give the same results as a sequential run."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import QUESTIONS
+
+# Every session asks every question, each session driven by one client at a time
+SESSIONS = [f"session-{n}" for n in range(6)]
+RESULT_KEYS = ("answer", "sources", "search_results", "retrieval", "results_count", "context_length", "filter")
+
+
+def comparable(result):
+    """Result fields that do not depend on timing (the rerank trace carries latencies)"""
+    return {key: result.get(key) for key in RESULT_KEYS}
+
+
+def turns(engine, session_id):
+    return [(turn["user_query"], turn["response"], turn["sources"]) for turn in engine.get_conversation_history(session_id)]
+
+
+def sequential_run(rag):
+    engine, _ = rag()
+    answers = {session_id: [comparable(engine.query(question, session_id=session_id)) for question in QUESTIONS]
+               for session_id in SESSIONS}
+    return answers, {session_id: turns(engine, session_id) for session_id in SESSIONS}
+
+
+def test_threads_match_sequential(rag):
+    expected, expected_turns = sequential_run(rag)
+    engine, _ = rag()
+
+    def client(session_id):
+        return [comparable(engine.query(question, session_id=session_id)) for question in QUESTIONS]
+
+    with ThreadPoolExecutor(max_workers=len(SESSIONS)) as pool:
+        answers = dict(zip(SESSIONS, pool.map(client, SESSIONS)))
+
+    assert answers == expected
+    assert {session_id: turns(engine, session_id) for session_id in SESSIONS} == expected_turns
+
+
+def test_async_tasks_match_sequential(rag):
+    expected, expected_turns = sequential_run(rag)
+    engine, _ = rag()
+
+    async def client(session_id):
+        return [comparable(await engine.aquery(question, session_id=session_id)) for question in QUESTIONS]
+
+    async def main():
+        return await asyncio.gather(*(client(session_id) for session_id in SESSIONS))
+
+    answers = dict(zip(SESSIONS, asyncio.run(main())))
+
+    assert answers == expected
+    assert {session_id: turns(engine, session_id) for session_id in SESSIONS} == expected_turns
+
+
+def test_threads_and_event_loops_share_one_engine(rag):
+    expected, expected_turns = sequential_run(rag)
+    engine, _ = rag(MICRO_BATCHING=1)
+
+    def sync_client(session_id):
+        return [comparable(engine.query(question, session_id=session_id)) for question in QUESTIONS]
+
+    def async_client(session_id):
+        async def run():
+            return [comparable(await engine.aquery(question, session_id=session_id)) for question in QUESTIONS]
+        return asyncio.run(run())
+
+    with ThreadPoolExecutor(max_workers=len(SESSIONS)) as pool:
+        futures = {
+            session_id: pool.submit(sync_client if n % 2 else async_client, session_id)
+            for n, session_id in enumerate(SESSIONS)
+        }
+        answers = {session_id: future.result() for session_id, future in futures.items()}
+
+    assert answers == expected
+    assert {session_id: turns(engine, session_id) for session_id in SESSIONS} == expected_turns
+
+
+def test_queries_leave_the_index_version_alone(rag):
+    engine, _ = rag(SEMANTIC_CACHE=1)
+    version = engine.index_version
+
+    def refresh():
+        raise AssertionError("the query path must not refresh the index version")
+
+    engine.refresh_index_version = refresh
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda n: engine.query(QUESTIONS[n % len(QUESTIONS)], session_id=f"s-{n}"),
+                                range(2 * len(QUESTIONS))))
+
+    assert engine.index_version == version and engine.semantic_cache.version == version
+    assert sum(result["cache"]["semantic"]["status"] == "hit" for result in results) > 0
@@ -0,0 +1,66 @@
+import re
+
+from legal_rag.rag.context_packer import ContextBlock, TokenCounter, pack_context, sentence_ends, split_sentences
+
+
+def word_tokens(text):
+    return re.findall(r"\w+|[^\w\s]", text)
+
+
+def counter():
+    return TokenCounter("test-model", encode=word_tokens)
+
+
+def block(doc_id, body, relevance=1.0):
+    return ContextBlock(doc_id, f"[Source: {doc_id}]", body, relevance)
+
+
+def test_sentence_boundaries():
+    text = "Первое предложение. Второе!\n1) пункт;\n2) пункт"
+    assert split_sentences(text) == ["Первое предложение.", "Второе!", "1) пункт;", "2) пункт"]
+    assert [text[:end] for end in sentence_ends(text)][-1] == text
+
+
+def test_everything_fits_in_rank_order():
+    tokens = counter()
+    blocks = [block("a", "Один два три."), block("b", "Четыре пять.", 0.5)]
+    packed = pack_context(blocks, budget=100, counter=tokens)
+
+    assert packed.included == ["a", "b"] and packed.dropped == [] and packed.trimmed is None
+    assert packed.text == "[Source: a]\nОдин два три.\n\n[Source: b]\nЧетыре пять."
+    assert packed.tokens == tokens.count(packed.text)
+
+
+def test_last_block_is_trimmed_at_sentence_boundary():
+    tokens = counter()
+    long_body = " ".join(f"Предложение номер {i}." for i in range(20))
+    blocks = [block("a", "Короткий ответ."), block("b", long_body, 0.9)]
+    packed = pack_context(blocks, budget=40, counter=tokens, min_trim_tokens=8)
+
+    assert packed.included == ["a", "b"] and packed.trimmed == "b"
+    assert packed.text.startswith("[Source: a]\nКороткий ответ.\n\n[Source: b]\nПредложение номер 0.")
+    assert packed.text.endswith(".")
+    assert packed.tokens <= 40
+
+
+def test_relevance_per_token_and_top_block_first():
+    tokens = counter()
+    blocks = [
+        block("top", "Главная статья.", 0.1),
+        block("long", " ".join(["слово"] * 30), 0.8),
+        block("dense", "Точный ответ.", 0.6),
+    ]
+    packed = pack_context(blocks, budget=20, counter=tokens, min_trim_tokens=100)
+
+    # The short, relevant block beats the long one per token; the top block is always kept
+    assert packed.included == ["top", "dense"]
+    assert packed.dropped == ["long"]
+
+
+def test_chunk_counts_are_cached():
+    tokens = counter()
+    blocks = [block("a", "Один два три.")]
+    pack_context(blocks, budget=100, counter=tokens)
+    pack_context(blocks, budget=100, counter=tokens)
+    assert tokens.stats()["hits"] == 1
+    assert tokens.count_messages([{"role": "user", "content": "Один два"}]) == 3 + 2 + 3
@@ -0,0 +1,71 @@
+import numpy as np
+
+from legal_rag.rag.ann_index import IVFIndex
+from legal_rag.rag.bm25_index import BM25Index
+from legal_rag.rag.filters import MetadataBitmaps, SearchFilter, detect_search_filter
+from legal_rag.rag.vector_store import LocalVectorStore, save_local_index
+
+SOURCES = ["civil_code_kz.txt"] * 30 + ["constitution_kz.txt"] * 10 + ["labor_code_kz.txt"] * 20
+
+
+def _metadatas():
+    return [
+        {"source": source, "article_type": "article_part" if i % 7 == 0 else "article"}
+        for i, source in enumerate(SOURCES)
+    ]
+
+
+def _vectors():
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(len(SOURCES), 8)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_filter_expressions_and_matching():
+    search_filter = SearchFilter.from_dict({"source": "labor_code_kz.txt", "article_types": ["article"]})
+    assert search_filter.to_pinecone() == {
+        "source": {"$in": ["labor_code_kz.txt"]},
+        "article_type": {"$in": ["article"]},
+    }
+    assert search_filter.matches({"source": "labor_code_kz.txt", "article_type": "article"})
+    assert not search_filter.matches({"source": "civil_code_kz.txt", "article_type": "article"})
+    assert SearchFilter().is_empty()
+
+
+def test_bitmaps_combine_fields():
+    bitmaps = MetadataBitmaps(_metadatas())
+    rows = bitmaps.rows(SearchFilter(sources=("constitution_kz.txt",), article_types=("article",)))
+    assert rows.tolist() == [i for i in range(30, 40) if i % 7 != 0]
+    assert not bitmaps.mask(SearchFilter(sources=("unknown.txt",))).any()
+
+
+def test_local_store_searches_only_the_partition(tmp_path):
+    vectors = _vectors()
+    ids = [f"doc-{i}" for i in range(len(SOURCES))]
+    save_local_index(str(tmp_path), vectors, ids, _metadatas())
+    store = LocalVectorStore(str(tmp_path), index_type="flat")
+
+    labor = SearchFilter(sources=("labor_code_kz.txt",))
+    matches = store.query(vectors[3].tolist(), top_k=5, search_filter=labor)
+    assert len(matches) == 5
+    assert all(m["metadata"]["source"] == "labor_code_kz.txt" for m in matches)
+
+    expected = 40 + np.argsort(-(vectors[40:] @ vectors[3]))[:5]
+    assert [m["id"] for m in matches] == [f"doc-{i}" for i in expected]
+
+
+def test_ivf_and_bm25_respect_allowed_rows():
+    vectors = _vectors()
+    allowed = MetadataBitmaps(_metadatas()).mask(SearchFilter(sources=("constitution_kz.txt",)))
+
+    rows, _ = IVFIndex.build(vectors, nlist=6).search(vectors[0], top_k=4, nprobe=1, allowed=allowed)
+    assert len(rows) == 4 and all(30 <= row < 40 for row in rows)
+
+    texts = ["право собственности"] * len(SOURCES)
+    ids, _ = BM25Index.build(texts, [f"doc-{i}" for i in range(len(SOURCES))]).search("право", 50, allowed=allowed)
+    assert ids == [f"doc-{i}" for i in range(30, 40)]
+
+
+def test_code_detection():
+    assert detect_search_filter("Какой срок испытания по ТК РК?") == SearchFilter(sources=("labor_code_kz.txt",))
+    assert detect_search_filter("Что такое гражданское право?") is None
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from legal_rag.rag.fusion import FusionConfig, fuse_candidates, reciprocal_rank_fusion
+
+
+def test_rrf_rewards_agreement_between_lists():
+    ids, scores = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d", "a"]], k=60)
+    assert ids[0] == "a"
+    assert set(ids) == {"a", "b", "c", "d"}
+    assert scores[0] == pytest.approx(1 / 61 + 1 / 63)
+
+
+def test_weighted_fusion_matches_previous_alpha_formula():
+    dense_ids = ["a", "b", "c"]
+    dense_scores = np.array([0.9, 0.8, 0.7])
+    bm25 = np.array([1.0, 5.0, 3.0])
+    order = np.argsort(-bm25)
+
+    ids, scores = fuse_candidates(dense_ids, dense_scores, [dense_ids[i] for i in order], bm25[order], FusionConfig())
+
+    expected = 0.75 * dense_scores + 0.25 * (bm25 - bm25.min()) / (bm25.max() - bm25.min() + 1e-8)
+    assert dict(zip(ids, scores)) == pytest.approx(dict(zip(dense_ids, expected)))
+    assert ids == ["b", "a", "c"]
+
+
+def test_lexical_only_candidates_survive_fusion():
+    ids, _ = fuse_candidates(["a"], np.array([0.5]), ["z", "a"], np.array([10.0, 1.0]),
+                             FusionConfig(method="rrf"), top_k=5)
+    assert set(ids) == {"a", "z"}
+    assert fuse_candidates([], np.empty(0), [], np.empty(0), FusionConfig())[0] == []
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        FusionConfig(method="max")
@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+import pytest
+
+from legal_rag.app.inference_server import InferenceService, make_server
+from legal_rag.rag.inference import InferenceClient, InferenceError, RemoteCrossEncoder, RemoteEmbeddingModel
+
+
+class FakeEmbedder:
+    """Deterministic 4-d vectors: text length, prompt length, vowel count, 1"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+    def encode(self, texts, normalize_embeddings=False, prompt=None, batch_size=32):
+        self.calls.append(len(texts))
+        vectors = np.array([[len(t), len(prompt or ""), sum(c in "аеиоуыэюя" for c in t), 1.0] for t in texts],
+                           dtype=np.float32)
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+class FakeCrossEncoder:
+    def predict(self, pairs, batch_size=32):
+        return np.array([len(set(query.split()) & set(passage.split())) for query, passage in pairs], dtype=np.float32)
+
+
+@pytest.fixture()
+def service():
+    embedder = FakeEmbedder()
+    service = InferenceService(embedder, FakeCrossEncoder(), "fake-embedder", "fake-reranker", max_batch=64, max_wait_ms=50)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = InferenceClient(f"http://127.0.0.1:{server.server_address[1]}", timeout=5)
+    yield service, embedder, client
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def test_embed_matches_local_model(service):
+    _, embedder, client = service
+    texts = ["договор аренды", "брак", ""]
+    expected = FakeEmbedder().encode(texts, normalize_embeddings=True, prompt="query: ")
+
+    model = RemoteEmbeddingModel(client)
+    np.testing.assert_allclose(model.encode(texts, normalize_embeddings=True, prompt="query: "), expected, rtol=1e-6)
+    np.testing.assert_allclose(model.encode("брак", normalize_embeddings=True, prompt="query: "), expected[1], rtol=1e-6)
+    assert model.get_sentence_embedding_dimension() == 4
+    assert client.info()["embedding_model"] == "fake-embedder"
+
+
+def test_rerank_scores(service):
+    _, _, client = service
+    scores = RemoteCrossEncoder(client).predict([("трудовой договор", "договор заключается"), ("брак", "налог")])
+    assert scores.tolist() == [1.0, 0.0]
+
+
+def test_concurrent_requests_are_coalesced(service):
+    _, embedder, client = service
+    results = {}
+
+    def worker(n):
+        results[n] = client.embed([f"текст {n}", f"ещё {n}"], prompt="query: ")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for n in range(8):
+        np.testing.assert_allclose(
+            results[n], FakeEmbedder().encode([f"текст {n}", f"ещё {n}"], normalize_embeddings=True, prompt="query: "), rtol=1e-6
+        )
+    # Eight HTTP requests, fewer forward passes
+    assert len(embedder.calls) < 8 and sum(embedder.calls) == 16
+
+
+def test_mixed_prompts_in_one_batch(service):
+    inference, embedder, _ = service
+    vectors = inference._encode_items([("a", "query: ", True), ("b", None, True), ("c", "query: ", True)])
+    assert embedder.calls == [2, 1]
+    assert vectors[1][1] == 0.0 and vectors[0][1] > 0
+
+
+def test_bad_requests(service):
+    _, _, client = service
+    with pytest.raises(InferenceError, match="400"):
+        client._call("/rerank", {"pairs": [["only query"]]})
+    with pytest.raises(InferenceError, match="404"):
+        client._call("/missing", {})
+    with pytest.raises(InferenceError):
+        InferenceClient("http://127.0.0.1:9", timeout=1).embed(["x"])
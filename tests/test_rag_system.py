@@ -0,0 +1,166 @@
+"""EnhancedRAGSystem entry points over a stubbed index and models (see conftest.py)."""
+import asyncio
+
+import pytest
+
+from conftest import QUESTIONS
+
+RESULT_KEYS = ("answer", "sources", "search_results", "retrieval", "results_count", "context_length", "filter", "context")
+
+
+def comparable(result):
+    """Result fields shared by every entry point and independent of timing"""
+    return {key: result.get(key) for key in RESULT_KEYS}
+
+
+def fresh_queries(engine, questions):
+    """query() for each question in its own empty session"""
+    return [engine.query(question, session_id=f"fresh-{n}") for n, question in enumerate(questions)]
+
+
+class SessionSpy:
+    """Records every use of the session store"""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.used = []
+
+    def __getattr__(self, name):
+        self.used.append(name)
+        return getattr(self.sessions, name)
+
+
+def stage_reports(result):
+    """Rerank trace, rerank depth and compression report without their latencies"""
+    def untimed(report):
+        return {key: value for key, value in report.items() if key != "latency_ms"} if report else report
+    return [untimed(stage) for stage in result.get("rerank") or []], result.get("rerank_depth"), untimed(result.get("compression"))
+
+
+BATCH_SETTINGS = [
+    {},
+    {"RERANK_CASCADE_TOP_N": 3},
+    {"RERANK_ADAPTIVE": 1},
+    {"MMR_LAMBDA": 0.3},
+    {"CONTEXT_COMPRESSION": 1},
+    {"RERANK_CASCADE_TOP_N": 8, "RERANK_ADAPTIVE": 1, "MMR_LAMBDA": 0.5, "CONTEXT_COMPRESSION": 1},
+]
+
+
+@pytest.mark.parametrize("env", BATCH_SETTINGS, ids=lambda env: ",".join(env) or "defaults")
+def test_query_batch_matches_query(rag, env):
+    reference, fakes = rag(**env)
+    expected = fresh_queries(reference, QUESTIONS)
+
+    engine, _ = rag(**env)
+    spy = engine.sessions = SessionSpy(engine.sessions)
+    fakes.embedder.calls.clear()
+    fakes.cross_encoder.calls.clear()
+    fakes.llm.calls = 0
+
+    results = engine.query_batch(QUESTIONS)
+
+    assert [comparable(result) for result in results] == [comparable(result) for result in expected]
+    assert [stage_reports(result) for result in results] == [stage_reports(result) for result in expected]
+    # One cross-encoder call for all the questions, one generation per question
+    assert len(fakes.cross_encoder.calls) == 1
+    assert fakes.llm.calls == len(QUESTIONS)
+    if not env:
+        # ... and one forward pass for all the query embeddings
+        assert fakes.embedder.calls == [len(QUESTIONS)]
+    # Questions are standalone: history is neither read nor written
+    assert spy.used == []
+
+
+def test_query_stream_events_and_result_match_query(rag):
+    question = QUESTIONS[0]
+    reference, _ = rag()
+    reference.query(QUESTIONS[1], session_id="s")
+    expected = reference.query(question, session_id="s")
+
+    engine, _ = rag()
+    engine.query(QUESTIONS[1], session_id="s")
+    events = list(engine.query_stream(question, session_id="s"))
+
+    kinds = [event["type"] for event in events]
+    assert kinds[0] == "sources" and kinds[-1] == "done"
+    assert len(kinds) > 3 and set(kinds[1:-1]) == {"token"}
+    result = events[-1]["result"]
+    assert comparable(result) == comparable(expected)
+    assert "".join(event["content"] for event in events[1:-1]) == result["answer"]
+    assert events[0]["sources"] == result["sources"] and events[0]["search_results"] == result["search_results"]
+    # The streamed turn is recorded like a query() turn
+    assert engine.get_conversation_history("s")[-1]["response"] == result["answer"]
+
+
+def test_query_stream_generation_failure(rag):
+    from legal_rag.rag.rag_system import GENERATION_ERROR_ANSWER
+
+    engine, fakes = rag()
+    fakes.llm.fail = True
+    events = list(engine.query_stream(QUESTIONS[0]))
+
+    assert [event["type"] for event in events] == ["sources", "token", "done"]
+    assert events[1]["content"] == events[-1]["result"]["answer"] == GENERATION_ERROR_ANSWER
+
+
+def test_gathered_aqueries_match_query(rag):
+    reference, _ = rag()
+    expected = [comparable(result) for result in fresh_queries(reference, QUESTIONS)]
+
+    engine, _ = rag()
+    # Generation must go through the async client
+    engine.openai_client = None
+
+    async def main():
+        return await asyncio.gather(*(engine.aquery(question, session_id=f"fresh-{n}") for n, question in enumerate(QUESTIONS)))
+
+    results = asyncio.run(main())
+
+    assert [comparable(result) for result in results] == expected
+    assert all(result["cache"]["response"]["status"] == "disabled" for result in results)
+    assert engine.retrieval_stages.stats()["outcomes"]["lexical"]["ok"] > 0
+
+
+def test_hits_missing_from_the_chunk_store(rag, tmp_path, capsys):
+    from legal_rag.rag.chunk_store import ChunkStore, load_chunk_store
+
+    engine, _ = rag()
+    missing = engine.query(QUESTIONS[0], session_id="full")["search_results"][0]["id"]
+    store = engine.chunk_store
+    kept = [doc_id for doc_id in store.ids if doc_id != missing]
+    ChunkStore.build(str(tmp_path / "older"), kept, [store.get_text(doc_id) for doc_id in kept],
+                     [store.get_metadata(doc_id) for doc_id in kept])
+    engine.chunk_store = load_chunk_store(str(tmp_path / "older"))
+    capsys.readouterr()
+
+    assert engine.make_result(missing, 0.5, {"text_preview": "Статья 1. Фрагмент"}).text == "Статья 1. Фрагмент"
+    assert engine.make_result(missing, 0.5) is None
+    assert capsys.readouterr().out.count(missing) == 3
+
+    result = engine.query(QUESTIONS[0], session_id="older")
+    assert result["results_count"] > 0 and missing not in [hit["id"] for hit in result["search_results"]]
+    assert all(hit["text"] for hit in result["search_results"])
+
+
+def test_chunk_store_from_another_chunk_order_is_refused(rag, tmp_path, capsys):
+    from legal_rag.rag.chunk_store import ChunkStore, load_chunk_store
+
+    reference, _ = rag()
+    assert reference.chunk_store is not None and reference.bm25_index is not None
+    # Same positional ids over a different file order, like a store rebuilt after load_chunks started sorting
+    index_dir = str(tmp_path / "index")
+    store = load_chunk_store(index_dir)
+    ids = store.ids
+    ChunkStore.build(index_dir, ids, [store.get_text(doc_id) for doc_id in reversed(ids)],
+                     [store.get_metadata(doc_id) for doc_id in reversed(ids)])
+    capsys.readouterr()
+
+    engine, _ = rag()
+
+    assert "does not match the vector index" in capsys.readouterr().out
+    assert engine.chunk_store is None and engine.bm25_index is None and engine.article_index is None
+    result = engine.query(QUESTIONS[1], session_id="s")
+    vectors = engine.vector_store
+    assert result["results_count"] > 0
+    assert all(hit["text"] == vectors.metadatas[vectors.id_to_row[hit["id"]]]["text"] for hit in result["search_results"])
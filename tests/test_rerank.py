@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from legal_rag.rag.rerank import (
+    RerankDepthConfig, adaptive_rerank_depth, cosine_prefilter, mmr_select, stage_recall, stage_trace, summarize_stages
+)
+
+
+def test_cosine_prefilter_keeps_best_and_unknown_rows():
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    passages = np.array([[0.0, 1.0], [1.0, 0.0], [0.0, 0.0], [0.6, 0.8]], dtype=np.float32)
+
+    assert cosine_prefilter(query, passages.copy(), 2).tolist() == [2, 1]
+    assert cosine_prefilter(query, passages.copy(), 10).tolist() == [2, 1, 3, 0]
+
+
+def test_stage_recall_and_summary():
+    assert stage_recall(["a", "b"], ["b", "c"]) == 0.5
+    assert stage_recall([], ["a"]) == 1.0
+
+    traces = [
+        [stage_trace("bi_encoder", 20, 8, 1.0), stage_trace("cross_encoder", 8, 5, 30.0)],
+        [stage_trace("bi_encoder", 20, 8, 3.0), stage_trace("cross_encoder", 8, 3, 50.0)],
+    ]
+    summary = summarize_stages(traces)
+    assert summary["bi_encoder"]["latency_ms"] == 2.0
+    assert summary["cross_encoder"] == {"requests": 2, "latency_ms": 40.0, "kept": 4.0}
+
+
+def test_adaptive_depth_skips_obvious_winner():
+    config = RerankDepthConfig(min_depth=2, max_depth=6, skip_margin=0.5, band=0.3)
+    depth, margin = adaptive_rerank_depth([0.9, 0.3, 0.2, 0.1], config)
+    assert depth == 0 and margin == pytest.approx(2 / 3)
+
+
+def test_adaptive_depth_follows_contenders_within_bounds():
+    config = RerankDepthConfig(min_depth=2, max_depth=6, skip_margin=0.5, band=0.3)
+    assert adaptive_rerank_depth([0.8, 0.75, 0.1, 0.05], config)[0] == 2  # clipped up to min_depth
+    assert adaptive_rerank_depth([0.8, 0.79, 0.78, 0.2], config)[0] == 3
+    assert adaptive_rerank_depth([0.8] * 10, config)[0] == 6  # clipped down to max_depth
+    assert adaptive_rerank_depth([0.0, 0.0, 0.0], config)[0] == 3
+    with pytest.raises(ValueError):
+        RerankDepthConfig(min_depth=5, max_depth=2)
+
+
+def test_mmr_skips_near_duplicates():
+    vectors = np.array([[1.0, 0.0, 0.0], [0.99, 0.14, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+    relevance = [0.9, 0.88, 0.6, 0.1]
+
+    assert mmr_select(relevance, vectors, 3, 1.0).tolist() == [0, 1, 2]
+    # The second article part is almost the first one; diversity pushes it out
+    assert mmr_select(relevance, vectors, 3, 0.5).tolist() == [0, 2, 3]
+
+
+def test_mmr_edge_cases():
+    vectors = np.zeros((3, 4), dtype=np.float32)  # vectors unavailable: relevance order
+    assert mmr_select([0.2, 0.9, 0.5], vectors, 5, 0.3).tolist() == [1, 2, 0]
+    assert mmr_select([], np.zeros((0, 4)), 3, 0.5).tolist() == []
+    with pytest.raises(ValueError):
+        mmr_select([1.0], np.ones((1, 4)), 1, 1.5)
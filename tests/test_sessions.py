@@ -0,0 +1,84 @@
+import threading
+import time
+
+from legal_rag.rag.sessions import ConversationTurn, SessionStore
+
+
+def test_ring_buffer_keeps_last_turns():
+    store = SessionStore(max_turns=3)
+    for i in range(5):
+        store.append("a", f"вопрос {i}", f"ответ {i}", chunk_ids=[f"doc-{i}"], sources=["ГК РК", "ГК РК"])
+
+    turns = store.history("a")
+    assert [turn.user_query for turn in turns] == ["вопрос 2", "вопрос 3", "вопрос 4"]
+    assert turns[-1].chunk_ids == ("doc-4",) and turns[-1].sources == ("ГК РК",)
+    assert store.history("unknown") == []
+    assert store.total_bytes == sum(turn.size for turn in turns)
+
+
+def test_sessions_are_isolated():
+    store = SessionStore()
+    store.append("a", "вопрос a", "ответ a")
+    store.append("b", "вопрос b", "ответ b")
+    store.clear("a")
+
+    assert store.history("a") == []
+    assert [turn.user_query for turn in store.history("b")] == ["вопрос b"]
+    assert store.total_bytes == store.history("b")[0].size
+
+
+def test_session_byte_cap_drops_oldest_and_truncates():
+    empty = ConversationTurn("q", "", (), (), 0.0).size
+    store = SessionStore(max_session_bytes=empty + 100)
+    store.append("a", "q", "x" * 60)
+    store.append("a", "q", "y" * 60)
+
+    # Two turns do not fit: only the newest survives
+    assert [turn.generated_response for turn in store.history("a")] == ["y" * 60]
+
+    turn = store.append("a", "q", "z" * 500)
+    assert turn.size <= store.max_session_bytes and turn.generated_response == "z" * 100
+
+
+def test_lru_eviction_over_session_and_byte_caps():
+    store = SessionStore(max_sessions=2)
+    store.append("a", "q", "r")
+    store.append("b", "q", "r")
+    store.history("a")  # "a" becomes the most recently used
+    store.append("c", "q", "r")
+
+    assert store.history("b") == [] and len(store) == 2
+    assert store.stats()["evicted_sessions"] == 1
+
+    size = store.history("a")[0].size
+    store = SessionStore(max_total_bytes=2 * size)
+    for session_id in ("a", "b", "c"):
+        store.append(session_id, "q", "r")
+    assert store.history("a") == [] and store.total_bytes == 2 * size
+
+
+def test_idle_sessions_expire():
+    store = SessionStore(idle_ttl_seconds=0.01)
+    store.append("a", "q", "r")
+    time.sleep(0.02)
+    store.append("b", "q", "r")
+    assert store.history("a") == [] and len(store) == 1
+
+
+def test_concurrent_appends():
+    store = SessionStore(max_turns=50)
+
+    def worker(n):
+        for i in range(50):
+            store.append(f"s{n % 4}", f"q{n}-{i}", "r")
+            store.history(f"s{(n + 1) % 4}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store) == 4
+    assert all(len(store.history(f"s{n}")) == 50 for n in range(4))
+    assert store.total_bytes == sum(turn.size for n in range(4) for turn in store.history(f"s{n}"))
@@ -0,0 +1,35 @@
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from legal_rag.rag.bm25_index import BM25Index, tokenize
+from legal_rag.rag.sparse_bm25 import SparseBM25
+
+CORPUS = [
+    "статья 1 отношения регулируемые гражданским законодательством".split(),
+    "собственник имущества вправе владеть пользоваться и распоряжаться имуществом".split(),
+    "трудовой договор заключается в письменной форме".split(),
+    "работник вправе расторгнуть трудовой договор".split(),
+    "трудовой договор трудовой кодекс".split(),
+]
+
+
+def test_scores_match_bm25okapi():
+    okapi = BM25Okapi(CORPUS)
+    sparse_bm25 = SparseBM25(CORPUS)
+    for query in (["трудовой", "договор"], ["вправе", "вправе", "имуществом"], ["отсутствует"]):
+        np.testing.assert_allclose(sparse_bm25.get_scores(query), okapi.get_scores(query), atol=1e-12)
+
+
+def test_batch_scores_and_doc_len_interface():
+    sparse_bm25 = SparseBM25(CORPUS)
+    assert len(sparse_bm25.doc_len) == len(CORPUS)
+    full = sparse_bm25.get_scores(["договор"])
+    assert sparse_bm25.get_batch_scores(["договор"], [2, 4]) == [full[2], full[4]]
+
+
+def test_log1p_idf_matches_corpus_index():
+    texts = [" ".join(document).capitalize() + "." for document in CORPUS]
+    index = BM25Index.build(texts, [f"doc-{i}" for i in range(len(texts))])
+    sparse_bm25 = SparseBM25([tokenize(text) for text in texts], idf="log1p")
+    for query in ("Трудовой договор?", "вправе, вправе имуществом", "Статья 1.", "отсутствует"):
+        np.testing.assert_allclose(sparse_bm25.get_scores(tokenize(query)), index.get_scores(tokenize(query)), rtol=1e-5)
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from legal_rag.rag.stages import StageExecutor, timeout_from_ms
+
+
+@pytest.fixture
+def pool():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_stages_run_concurrently(pool):
+    barrier = threading.Barrier(2, timeout=1.0)
+
+    def stage(value):
+        barrier.wait()  # only passes when both stages are running at once
+        return value
+
+    outcomes = StageExecutor(pool).run({"dense": lambda: stage("d"), "lexical": lambda: stage("l")})
+
+    assert outcomes["dense"].ok and outcomes["dense"].value == "d"
+    assert outcomes["lexical"].ok and outcomes["lexical"].value == "l"
+
+
+def test_failed_and_late_stages_degrade(pool):
+    release = threading.Event()
+
+    def slow():
+        release.wait(1.0)
+        return "late"
+
+    def broken():
+        raise RuntimeError("index unavailable")
+
+    stages = StageExecutor(pool, timeouts={"dense": 0.05, "lexical": None, "other": 1.0})
+    start = time.perf_counter()
+    outcomes = stages.run({"dense": slow, "lexical": lambda: "ok", "other": broken})
+    release.set()
+
+    assert time.perf_counter() - start < 0.5
+    assert outcomes["dense"].status == "timeout" and outcomes["dense"].value is None
+    assert outcomes["lexical"].ok and outcomes["lexical"].value == "ok"
+    assert outcomes["other"].status == "error" and "index unavailable" in outcomes["other"].error
+    assert stages.stats()["outcomes"]["dense"] == {"ok": 0, "error": 0, "timeout": 1}
+    assert stages.stats()["timeouts_ms"]["dense"] == 50.0
+
+
+def test_async_stages(pool):
+    async def fast():
+        return [1, 2]
+
+    async def slow():
+        await asyncio.sleep(1.0)
+        return []
+
+    stages = StageExecutor(pool, timeouts={"lexical": 0.05})
+    outcomes = asyncio.run(stages.arun({"dense": fast(), "lexical": slow()}))
+
+    assert outcomes["dense"].ok and outcomes["dense"].value == [1, 2]
+    assert outcomes["lexical"].status == "timeout"
+
+
+def test_timeout_from_ms():
+    assert timeout_from_ms("1500") == 1.5
+    assert timeout_from_ms(0) is None
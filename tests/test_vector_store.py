@@ -0,0 +1,66 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from legal_rag.rag.vector_store import LocalVectorStore, get_vector_store, index_version, save_local_index
+
+
+def _build_index(tmp_path, n: int = 50, dim: int = 16):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"doc-{i}" for i in range(n)]
+    metadatas = [{"filename": f"chunk_{i}.txt", "text": f"text {i}"} for i in range(n)]
+    save_local_index(str(tmp_path), vectors, ids, metadatas)
+    return vectors
+
+
+def test_local_store_exact_top_k(tmp_path):
+    vectors = _build_index(tmp_path)
+    store = LocalVectorStore(str(tmp_path))
+
+    query = vectors[7] + 0.01
+    matches = store.query(query.tolist(), top_k=5)
+
+    expected = np.argsort(-(vectors @ query))[:5]
+    assert [m["id"] for m in matches] == [f"doc-{i}" for i in expected]
+    assert matches[0]["metadata"]["filename"] == "chunk_7.txt"
+    assert all(a["score"] >= b["score"] for a, b in zip(matches, matches[1:]))
+
+
+def test_local_store_top_k_larger_than_corpus(tmp_path):
+    _build_index(tmp_path, n=3)
+    store = LocalVectorStore(str(tmp_path))
+    assert len(store.query([1.0] * 16, top_k=10)) == 3
+    stats = store.describe()
+    assert (stats["total_vector_count"], stats["dimension"], stats["backend"]) == (3, 16, "local")
+
+
+def test_vector_backend_selection(tmp_path, monkeypatch):
+    _build_index(tmp_path, n=3)
+    monkeypatch.setenv("LOCAL_INDEX_DIR", str(tmp_path))
+    assert isinstance(get_vector_store(backend="local"), LocalVectorStore)
+    with pytest.raises(ValueError):
+        get_vector_store(index=None, backend="pinecone")
+
+
+def test_index_version_tracks_rebuilds(tmp_path):
+    _build_index(tmp_path)
+    version = index_version(str(tmp_path))
+    assert version == index_version(str(tmp_path))
+    assert version != index_version(str(tmp_path), {"total_vector_count": 50})
+
+    _build_index(tmp_path, n=60)
+    assert version != index_version(str(tmp_path))
+
+
+def test_async_query_matches_sync(tmp_path):
+    vectors = _build_index(tmp_path)
+    store = LocalVectorStore(str(tmp_path))
+
+    async def run():
+        return await asyncio.gather(*(store.aquery(vectors[i].tolist(), top_k=3) for i in range(4)))
+
+    for i, matches in enumerate(asyncio.run(run())):
+        assert matches == store.query(vectors[i].tolist(), top_k=3)
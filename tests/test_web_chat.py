@@ -0,0 +1,90 @@
+"""Web chat over a stubbed EnhancedRAGSystem (see conftest.py)."""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("flask")
+
+
+@pytest.fixture()
+def web(rag, monkeypatch):
+    """(web_legal_chat module, its chatbot over a fresh engine, engine, fakes)"""
+    engine, fakes = rag()
+    from legal_rag.app import web_legal_chat
+    from legal_rag.rag.rag_factory import BaselineEngine
+
+    baseline = BaselineEngine.__new__(BaselineEngine)
+    baseline._engine = engine
+    monkeypatch.setattr(web_legal_chat, "openai", SimpleNamespace(OpenAI=lambda **_: fakes.llm.client()))
+    monkeypatch.setattr(web_legal_chat, "get_rag_engine", lambda: baseline)
+    chatbot = web_legal_chat.WebLegalChatBot()
+    monkeypatch.setattr(web_legal_chat, "chatbot", chatbot)
+    return web_legal_chat, chatbot, engine, fakes
+
+
+def test_turns_are_stored_once_in_the_engine_sessions(web):
+    _, chatbot, engine, _ = web
+    chatbot.chat("Какой срок исковой давности?", use_rag=True, session_id="a")
+    chatbot.chat("Привет!", use_rag=False, session_id="a")
+    list(chatbot.chat_stream("Как принять наследство?", use_rag=True, session_id="a"))
+
+    history = engine.sessions.history("a")
+    assert [turn.user_query for turn in history] == ["Какой срок исковой давности?", "Привет!", "Как принять наследство?"]
+    assert [message["content"] for message in chatbot.get_history("a")][::2] == [turn.user_query for turn in history]
+    assert engine.sessions.history("b") == []
+
+    chatbot.clear_history("a")
+    assert engine.sessions.history("a") == [] and chatbot.get_history("a") == []
+
+
+def test_interrupted_stream_keeps_the_partial_answer(web):
+    _, chatbot, engine, _ = web
+    events = chatbot.chat_stream("Как принять наследство?", use_rag=True, session_id="a")
+    assert next(events)["type"] == "sources"
+    first = next(events)
+    events.close()
+
+    (turn,) = engine.sessions.history("a")
+    assert turn.generated_response == first["content"]
+
+
+def sse_events(response):
+    """Decoded `data:` frames of an SSE body; every frame must be one line followed by a blank line"""
+    body = response.get_data(as_text=True)
+    assert body.endswith("\n\n")
+    frames = body[:-2].split("\n\n")
+    assert all(frame.startswith("data: ") and "\n" not in frame for frame in frames)
+    return [json.loads(frame[len("data: "):]) for frame in frames]
+
+
+def test_chat_stream_endpoint(web):
+    web_legal_chat, _, engine, _ = web
+    question = "Какой срок исковой давности?"
+    response = web_legal_chat.app.test_client().post("/chat/stream", json={"message": question, "mode": "legal"})
+
+    assert response.status_code == 200 and response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    session_id = response.headers["X-Session-Id"]
+    events = sse_events(response)
+    kinds = [event["type"] for event in events]
+    assert kinds[0] == "sources" and kinds[-1] == "done" and set(kinds[1:-1]) == {"token"}
+    assert events[0]["mode"] == "legal_rag" and events[0]["requested_mode"] == "legal"
+    assert "".join(event["content"] for event in events[1:-1]) == events[-1]["answer"]
+    assert [turn.generated_response for turn in engine.sessions.history(session_id)] == [events[-1]["answer"]]
+
+
+def test_chat_stream_endpoint_reports_errors_in_band(web, monkeypatch):
+    web_legal_chat, chatbot, _, _ = web
+
+    def broken_stream(message, use_rag=True, session_id=None):
+        yield {"type": "sources", "sources": [], "search_results": []}
+        raise RuntimeError("engine failed")
+
+    monkeypatch.setattr(chatbot, "chat_stream", broken_stream)
+    client = web_legal_chat.app.test_client()
+    response = client.post("/chat/stream", json={"message": "Договор аренды", "mode": "legal"})
+
+    assert response.status_code == 200
+    assert sse_events(response)[-1] == {"type": "error", "error": "engine failed"}
+    assert client.post("/chat/stream", json={"message": "  "}).status_code == 400